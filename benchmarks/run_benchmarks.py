@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from synthetic_feed import SCALES, generate_feed  # noqa: E402
+
+BASELINES_PATH = os.path.join(BENCHMARK_DIR, 'baselines.json')
+
+# In run order: the cold load builds the network cache the later steps load from
+BENCHMARKS = [
+    'load_gtfs_data (cold)',
+    'load_gtfs_data (cached)',
+    'build_network',
+    'build_network (2 workers)',
+    'build_network (4 workers)',
+    'add_walking_connections',
+    'find_path',
+    'find_fastest_path',
+    'find_fastest_path (random pairs)',
+    'find_pareto_paths',
+    'generate_stylish_route_pages',
+]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _queries(planner, n_queries: int, seed: int) -> List[Tuple[str, str, int]]:
+    """Deterministic (start, end, time) queries between stops a few hops apart"""
+    rng = random.Random(seed)
+    stop_ids = sorted(planner.stop_position)
+    queries = []
+    while len(queries) < n_queries:
+        start = end = rng.choice(stop_ids)
+        for _ in range(rng.randint(2, 6)):
+            neighbors = sorted(planner.direct_connections[end]) if end in planner.direct_connections else []
+            if not neighbors:
+                break
+            end = str(rng.choice(neighbors))
+        if end != start:
+            queries.append((start, end, rng.randrange(6 * 3600, 20 * 3600)))
+    return queries
+
+
+def _random_queries(planner, n_queries: int, seed: int) -> List[Tuple[str, str, int]]:
+    """Deterministic (start, end, time) queries between random stops anywhere in the feed"""
+    rng = random.Random(seed)
+    stop_ids = sorted(planner.stop_position)
+    queries = []
+    while len(queries) < n_queries:
+        start, end = rng.choice(stop_ids), rng.choice(stop_ids)
+        if end != start:
+            queries.append((start, end, rng.randrange(6 * 3600, 20 * 3600)))
+    return queries
+
+
+def _run_benchmark(name: str, feed_dir: str, work_dir: str, n_queries: int, seed: int) -> Dict:
+    """
+    Run one benchmark in this (fresh) process and measure it.
+
+    Returns:
+        Dict: wall_seconds of the measured step and peak_rss_mb of the whole process
+    """
+    os.chdir(work_dir)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        from plan import GTFSPlanner
+
+        if name == 'load_gtfs_data (cold)':
+            shutil.rmtree('cache', ignore_errors=True)
+        if name.startswith('load_gtfs_data'):
+            start = time.perf_counter()
+            GTFSPlanner(feed_dir)
+            elapsed = time.perf_counter() - start
+
+        elif name == 'generate_stylish_route_pages':
+            import gen
+            shutil.rmtree('docs', ignore_errors=True)
+            os.makedirs(os.path.join('docs', 'route_pages'))
+            start = time.perf_counter()
+            gen.generate_stylish_route_pages(feed_dir)
+            elapsed = time.perf_counter() - start
+
+        else:
+            planner = GTFSPlanner(feed_dir)
+            if name.startswith('build_network'):
+                planner.build_workers = build_workers(name)
+                start = time.perf_counter()
+                planner.build_network()
+                elapsed = time.perf_counter() - start
+            elif name == 'add_walking_connections':
+                planner._edge_parts = []
+                start = time.perf_counter()
+                planner.add_walking_connections()
+                elapsed = time.perf_counter() - start
+                del planner._edge_parts
+            else:
+                make_queries = _random_queries if name.endswith('(random pairs)') else _queries
+                queries = make_queries(planner, n_queries, seed)
+                search = {'find_path': planner.find_path,
+                          'find_pareto_paths': planner.find_pareto_paths}.get(name, planner.find_fastest_path)
+                start = time.perf_counter()
+                for start_stop, end_stop, start_time in queries:
+                    search(start_stop, end_stop, start_time)
+                elapsed = time.perf_counter() - start
+
+    return {'wall_seconds': round(elapsed, 4), 'peak_rss_mb': round(_peak_rss_mb() or 0.0, 1)}
+
+
+def ensure_feed(scale: str, feed_root: str, seed: int) -> str:
+    """Path to the synthetic feed of a scale, generating it on first use"""
+    feed_dir = os.path.join(feed_root, f"{scale}-seed{seed}")
+    if not os.path.exists(os.path.join(feed_dir, 'stop_times.txt')):
+        print(f"Generating {scale} feed in {feed_dir}...")
+        counts = generate_feed(feed_dir, seed=seed, **SCALES[scale])
+        print('  ' + ', '.join(f"{count:,} {name}" for name, count in counts.items()))
+    return feed_dir
+
+
+def run_benchmarks(scale: str, names: List[str], feed_root: str, n_queries: int = 100,
+                   seed: int = 1, repeat: int = 1) -> Dict[str, Dict]:
+    """
+    Run benchmarks against the synthetic feed of a scale.
+
+    Every run gets a fresh process, so peak RSS belongs to that benchmark alone; with
+    repeat > 1 the fastest run and the largest peak are kept.
+
+    Returns:
+        Dict[str, Dict]: Measurements per benchmark name
+    """
+    feed_dir = os.path.abspath(ensure_feed(scale, feed_root, seed))
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='moovefree-bench-') as work_dir:
+        for name in names:
+            # The cached-network steps need the cache the cold load writes
+            if name != 'load_gtfs_data (cold)' and not os.path.exists(os.path.join(work_dir, 'cache')):
+                _run_in_child(context, 'load_gtfs_data (cold)', feed_dir, work_dir, n_queries, seed)
+            runs = [_run_in_child(context, name, feed_dir, work_dir, n_queries, seed) for _ in range(repeat)]
+            results[name] = {'wall_seconds': min(run['wall_seconds'] for run in runs),
+                             'peak_rss_mb': max(run['peak_rss_mb'] for run in runs)}
+            print(f"  {name:<32} {results[name]['wall_seconds']:>9.3f}s {results[name]['peak_rss_mb']:>9.1f} MB")
+    return results
+
+
+def _run_in_child(context, name: str, feed_dir: str, work_dir: str, n_queries: int, seed: int) -> Dict:
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_benchmark, name, feed_dir, work_dir, n_queries, seed).result()
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], time_tolerance: float,
+            rss_tolerance: float) -> List[str]:
+    """Regressions of results against a baseline, as human-readable lines"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric, tolerance, unit in (('wall_seconds', time_tolerance, 's'), ('peak_rss_mb', rss_tolerance, ' MB')):
+            limit = expected[metric] * (1 + tolerance)
+            if expected[metric] > 0 and result[metric] > limit:
+                regressions.append(f"{name}: {metric} {result[metric]}{unit} > {limit:.3f}{unit} "
+                                   f"(baseline {expected[metric]}{unit} + {tolerance:.0%})")
+    return regressions
+
+
+def build_workers(name: str) -> int:
+    """Worker processes of a build_network benchmark, from its name"""
+    return int(name.split('(')[1].split()[0]) if '(' in name else 1
+
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baselines(baselines: Dict, path: str = BASELINES_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the planner and page generator on synthetic feeds")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='city')
+    parser.add_argument('--only', action='append', choices=BENCHMARKS, help="Run only these benchmarks")
+    parser.add_argument('--feeds', default=os.path.join(BENCHMARK_DIR, 'feeds'), help="Where feeds are generated")
+    parser.add_argument('--queries', type=int, default=100, help="Queries per path-search benchmark")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per benchmark; the fastest is kept")
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help="Allowed slowdown over the baseline")
+    parser.add_argument('--rss-tolerance', type=float, default=0.2, help="Allowed peak RSS growth over the baseline")
+    parser.add_argument('--update-baselines', action='store_true', help="Store the results as the new baselines")
+    args = parser.parse_args()
+
+    print(f"Running {args.scale} benchmarks...")
+    results = run_benchmarks(args.scale, args.only or BENCHMARKS, args.feeds, args.queries, args.seed, args.repeat)
+
+    baselines = load_baselines()
+    if args.update_baselines:
+        # A pool larger than the machine's CPU count measures the smaller pool it
+        # falls back to, so those runs are not recorded as baselines
+        undersized = [name for name in results
+                      if name.startswith('build_network') and build_workers(name) > (os.cpu_count() or 1)]
+        for name in undersized:
+            print(f"Not recording {name}: this machine has {os.cpu_count()} CPUs")
+            del results[name]
+        entry = baselines.setdefault(args.scale, {'results': {}})
+        entry['results'].update(results)
+        entry.update(queries=args.queries, seed=args.seed, machine=platform.platform(), cpus=os.cpu_count(),
+                     python=platform.python_version(), recorded=time.strftime('%Y-%m-%d'))
+        save_baselines(baselines)
+        print(f"Updated {args.scale} baselines in {BASELINES_PATH}")
+    elif args.scale in baselines:
+        baseline = baselines[args.scale]
+        if (baseline.get('queries'), baseline.get('seed')) != (args.queries, args.seed):
+            print(f"\nWarning: the baseline was recorded with --queries {baseline.get('queries')} "
+                  f"--seed {baseline.get('seed')}")
+        regressions = compare(results, baseline['results'], args.time_tolerance, args.rss_tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for line in regressions:
+                print(f"- {line}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+    else:
+        print(f"\nNo {args.scale} baseline yet; run with --update-baselines to record one")
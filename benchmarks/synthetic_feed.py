@@ -0,0 +1,144 @@
+import argparse
+import math
+import os
+import random
+from typing import Dict, List
+
+# Feed sizes, from one city to ten times the national feed. Stops sit on a grid
+# about 280m apart, so walking connections are as dense as in a real city.
+SCALES = {
+    'city': {'stops': 2000, 'lines': 100, 'trips_per_route': 20, 'stops_per_trip': 25},
+    'region': {'stops': 8000, 'lines': 500, 'trips_per_route': 30, 'stops_per_trip': 30},
+    'national': {'stops': 30000, 'lines': 4000, 'trips_per_route': 50, 'stops_per_trip': 35},
+    'national-10x': {'stops': 300000, 'lines': 40000, 'trips_per_route': 50, 'stops_per_trip': 35},
+}
+
+ORIGIN_LAT, ORIGIN_LON = 31.9, 34.7
+LAT_STEP, LON_STEP = 0.0025, 0.003
+
+
+def _route_stops(rng: random.Random, side: int, n_stops: int, length: int) -> List[int]:
+    """A self-avoiding random walk over the stop grid"""
+    route = [rng.randrange(n_stops)]
+    seen = set(route)
+    while len(route) < length:
+        row, col = divmod(route[-1], side)
+        steps = [(row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)]
+        options = [r * side + c for r, c in steps
+                   if 0 <= r and 0 <= c < side and r * side + c < n_stops and r * side + c not in seen]
+        if not options:
+            break
+        route.append(rng.choice(options))
+        seen.add(route[-1])
+    return route
+
+
+def _format_time(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def generate_feed(output_dir: str, stops: int, lines: int, trips_per_route: int, stops_per_trip: int,
+                  seed: int = 1) -> Dict[str, int]:
+    """
+    Write a deterministic synthetic GTFS feed.
+
+    Every line runs in both directions (two routes sharing a catalog number in
+    route_desc, like the Israeli feed), with trips spread over the day on a weekday
+    and a weekend service, and one shape per route.
+
+    Args:
+        output_dir: Folder to write the GTFS files into
+        stops: Number of stops
+        lines: Number of lines; each becomes two routes
+        trips_per_route: Trips per route and direction
+        stops_per_trip: Stops per trip (fewer where the walk runs into a corner)
+        seed: Random seed; the same arguments always give the same feed
+    Returns:
+        Dict[str, int]: Row counts per file
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    side = math.ceil(math.sqrt(stops))
+    coords = [(ORIGIN_LAT + (i // side) * LAT_STEP, ORIGIN_LON + (i % side) * LON_STEP) for i in range(stops)]
+    counts = {}
+
+    with open(os.path.join(output_dir, 'agency.txt'), 'w', encoding='utf-8') as f:
+        f.write("agency_id,agency_name,agency_url,agency_timezone\n")
+        f.write("1,Synthetic Transit,https://example.com,Asia/Jerusalem\n")
+
+    with open(os.path.join(output_dir, 'stops.txt'), 'w', encoding='utf-8') as f:
+        f.write("stop_id,stop_code,stop_name,stop_desc,stop_lat,stop_lon,location_type,parent_station,zone_id\n")
+        for i, (lat, lon) in enumerate(coords):
+            f.write(f"{100000 + i},{i},Stop {i},,{lat:.6f},{lon:.6f},0,,{i % 50}\n")
+    counts['stops'] = stops
+
+    with open(os.path.join(output_dir, 'calendar.txt'), 'w', encoding='utf-8') as f:
+        f.write("service_id,sunday,monday,tuesday,wednesday,thursday,friday,saturday,start_date,end_date\n")
+        f.write("1,1,1,1,1,1,0,0,20240101,20301231\n")
+        f.write("2,0,0,0,0,0,1,1,20240101,20301231\n")
+
+    line_stops = [_route_stops(rng, side, stops, stops_per_trip) for _ in range(lines)]
+
+    with open(os.path.join(output_dir, 'routes.txt'), 'w', encoding='utf-8') as f:
+        f.write("route_id,agency_id,route_short_name,route_long_name,route_desc,route_type,route_color\n")
+        for line in range(lines):
+            for direction in (1, 2):
+                # Short names repeat every 999 lines, as they do across agencies
+                f.write(f"{line * 2 + direction},1,{line % 999 + 1},"
+                        f"Stop {line_stops[line][0]}<->Stop {line_stops[line][-1]}-{direction},"
+                        f"{10000 + line}-{direction}-#,3,\n")
+    counts['routes'] = 2 * lines
+
+    n_trips = n_stop_times = n_shape_points = 0
+    with open(os.path.join(output_dir, 'trips.txt'), 'w', encoding='utf-8') as trips_file, \
+            open(os.path.join(output_dir, 'stop_times.txt'), 'w', encoding='utf-8') as times_file, \
+            open(os.path.join(output_dir, 'shapes.txt'), 'w', encoding='utf-8') as shapes_file:
+        trips_file.write("route_id,service_id,trip_id,trip_headsign,direction_id,shape_id\n")
+        times_file.write("trip_id,arrival_time,departure_time,stop_id,stop_sequence,pickup_type,"
+                         "drop_off_type,shape_dist_traveled\n")
+        shapes_file.write("shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence,shape_dist_traveled\n")
+
+        for line in range(lines):
+            for direction in (1, 2):
+                route_id = line * 2 + direction
+                sequence = line_stops[line] if direction == 1 else line_stops[line][::-1]
+
+                # Shape: the stops with a slightly jittered point between each pair
+                points = []
+                for a, b in zip(sequence, sequence[1:]):
+                    points.append(coords[a])
+                    points.append(((coords[a][0] + coords[b][0]) / 2 + rng.uniform(-2e-4, 2e-4),
+                                   (coords[a][1] + coords[b][1]) / 2 + rng.uniform(-2e-4, 2e-4)))
+                points.append(coords[sequence[-1]])
+                for k, (lat, lon) in enumerate(points, 1):
+                    shapes_file.write(f"{route_id},{lat:.6f},{lon:.6f},{k},\n")
+                n_shape_points += len(points)
+
+                headway = (19 * 3600) // trips_per_route
+                for k in range(trips_per_route):
+                    n_trips += 1
+                    trip_id = f"{n_trips}_{route_id}"
+                    service = 2 if k % 5 == 0 else 1
+                    trips_file.write(f"{route_id},{service},{trip_id},Stop {sequence[-1]},{direction - 1},"
+                                     f"{route_id}\n")
+                    time = 5 * 3600 + k * headway + rng.randrange(max(headway // 4, 1))
+                    for position, stop in enumerate(sequence, 1):
+                        stamp = _format_time(time)
+                        times_file.write(f"{trip_id},{stamp},{stamp},{100000 + stop},{position},0,0,\n")
+                        time += 60 + rng.randrange(90)
+                    n_stop_times += len(sequence)
+
+    counts.update(trips=n_trips, stop_times=n_stop_times, shapes=n_shape_points)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic GTFS feed")
+    parser.add_argument('output_dir')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='city')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    counts = generate_feed(args.output_dir, seed=args.seed, **SCALES[args.scale])
+    print(f"Wrote {args.scale} feed to {args.output_dir}: "
+          + ', '.join(f"{count:,} {name}" for name, count in counts.items()))
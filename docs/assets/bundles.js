@@ -0,0 +1,59 @@
+// Loader for the compact data bundles written by export_bundles.py
+
+// Undo delta encoding: a running sum over the values
+function decodeDeltas(values) {
+    let total = 0;
+    return values.map(value => total += value);
+}
+
+// Decode a CSR table into one array of positions per row
+function decodeCSR(table) {
+    const rows = [];
+    let offset = 0;
+    table.lengths.forEach(length => {
+        rows.push(decodeDeltas(table.deltas.slice(offset, offset + length)));
+        offset += length;
+    });
+    return rows;
+}
+
+// Fetch and decode bundles from base ('stops', 'routes' and/or 'graph').
+// Stops and routes come back as GTFS-like records; route stop lists, adjacency
+// and stop routes refer to stops and routes by their position in these arrays.
+async function loadBundles(base, names = ['stops', 'routes', 'graph']) {
+    const documents = await Promise.all(names.map(name =>
+        fetch(`${base}/${name}.json`).then(response => response.json())
+    ));
+    const bundles = Object.fromEntries(names.map((name, i) => [name, documents[i]]));
+    const result = {};
+
+    if (bundles.stops) {
+        const { ids, names: stopNames, scale } = bundles.stops;
+        const lats = decodeDeltas(bundles.stops.lat);
+        const lons = decodeDeltas(bundles.stops.lon);
+        result.stops = ids.map((id, i) => ({
+            stop_id: id,
+            stop_name: stopNames[i],
+            stop_lat: lats[i] / scale,
+            stop_lon: lons[i] / scale
+        }));
+    }
+
+    if (bundles.routes) {
+        const routes = bundles.routes;
+        result.routes = routes.ids.map((id, i) => ({
+            route_id: id,
+            route_short_name: routes.short_names[i],
+            route_long_name: routes.long_names[i],
+            route_color: routes.colors[i],
+            shape_id: routes.shapes[i],
+            stops: routes.stops[i]
+        }));
+    }
+
+    if (bundles.graph) {
+        result.adjacency = decodeCSR(bundles.graph.adjacency);
+        result.stopRoutes = decodeCSR(bundles.graph.stop_routes);
+    }
+    return result;
+}
@@ -0,0 +1,60 @@
+// Loader for the simplified route shapes written by export_shapes.py
+
+// Decode an encoded polyline (Google's algorithm) into [lat, lon] pairs
+function decodePolyline(encoded, precision = 5) {
+    const factor = Math.pow(10, precision);
+    const points = [];
+    let index = 0, lat = 0, lon = 0;
+
+    function nextValue() {
+        let result = 0, shift = 0, byte;
+        do {
+            byte = encoded.charCodeAt(index++) - 63;
+            result += (byte & 0x1f) * Math.pow(2, shift);
+            shift += 5;
+        } while (byte >= 0x20);
+        return result % 2 ? -(result + 1) / 2 : result / 2;
+    }
+
+    while (index < encoded.length) {
+        lat += nextValue();
+        lon += nextValue();
+        points.push([lat / factor, lon / factor]);
+    }
+    return points;
+}
+
+// Fetch the shape index from base; returns a loader whose forZoom(zoom) resolves to
+// the level simplified for that zoom, with points(routeId) giving a route's decoded shape
+async function loadShapeLevels(base) {
+    const index = await fetch(`${base}/index.json`).then(response => response.json());
+    const levels = new Map();
+
+    function fetchLevel(zoom) {
+        if (!levels.has(zoom)) {
+            levels.set(zoom, fetch(`${base}/${zoom}.json`).then(response => response.json()).then(level => {
+                const decoded = new Map();
+                return {
+                    zoom,
+                    points(routeId) {
+                        if (!(routeId in level.routes)) return null;
+                        if (!decoded.has(routeId)) {
+                            decoded.set(routeId, decodePolyline(level.routes[routeId], index.precision));
+                        }
+                        return decoded.get(routeId);
+                    }
+                };
+            }));
+        }
+        return levels.get(zoom);
+    }
+
+    return {
+        index,
+        // The coarsest level at least as detailed as the map zoom, else the finest
+        forZoom(zoom) {
+            const level = index.zooms.find(levelZoom => levelZoom >= zoom);
+            return fetchLevel(level === undefined ? index.zooms[index.zooms.length - 1] : level);
+        }
+    };
+}
@@ -0,0 +1,53 @@
+// Viewport loader for the quadkey tiles written by export_tiles.py
+
+// Quadkey of a slippy map tile: one base-4 digit per zoom level
+function tileQuadkey(x, y, zoom) {
+    let quadkey = '';
+    for (let level = zoom; level > 0; level--) {
+        const mask = 1 << (level - 1);
+        quadkey += ((x & mask) ? 1 : 0) + ((y & mask) ? 2 : 0);
+    }
+    return quadkey;
+}
+
+// Tile column and row of a point at a zoom level (Web Mercator)
+function latLonToTile(lat, lon, zoom) {
+    const n = 1 << zoom;
+    const clamped = Math.max(-85.05112878, Math.min(85.05112878, lat)) * Math.PI / 180;
+    const x = Math.floor((lon + 180) / 360 * n);
+    const y = Math.floor((1 - Math.log(Math.tan(clamped) + 1 / Math.cos(clamped)) / Math.PI) / 2 * n);
+    return [Math.max(0, Math.min(n - 1, x)), Math.max(0, Math.min(n - 1, y))];
+}
+
+// Fetch the tile index from base; returns a loader whose inView(bounds) resolves to
+// the (cached) tiles covering a Leaflet LatLngBounds
+async function loadTileIndex(base) {
+    const index = await fetch(`${base}/index.json`).then(response => response.json());
+    const zoom = Math.max(...index.zooms);
+    const available = index.tiles[zoom] || {};
+    const cache = new Map();
+
+    function fetchTile(quadkey) {
+        if (!cache.has(quadkey)) {
+            cache.set(quadkey, fetch(`${base}/${zoom}/${quadkey}.json`).then(response => response.json()));
+        }
+        return cache.get(quadkey);
+    }
+
+    return {
+        zoom,
+        index,
+        async inView(bounds) {
+            const [west, north] = latLonToTile(bounds.getNorth(), bounds.getWest(), zoom);
+            const [east, south] = latLonToTile(bounds.getSouth(), bounds.getEast(), zoom);
+            const quadkeys = [];
+            for (let x = west; x <= east; x++) {
+                for (let y = north; y <= south; y++) {
+                    const quadkey = tileQuadkey(x, y, zoom);
+                    if (quadkey in available) quadkeys.push(quadkey);
+                }
+            }
+            return Promise.all(quadkeys.map(fetchTile));
+        }
+    };
+}
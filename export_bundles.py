@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from plan import GTFSPlanner
+
+BUNDLE_VERSION = 1
+COORD_SCALE = 100000  # Coordinates are stored as integers of 1e-5 degrees (about 1m)
+
+
+def delta_encode(values: np.ndarray) -> List[int]:
+    """First value, then differences between neighbours; decoded by a running sum"""
+    values = np.asarray(values, dtype=np.int64)
+    return np.diff(values, prepend=0).tolist()
+
+
+def csr_deltas(indptr: np.ndarray, indices: np.ndarray) -> Dict[str, List[int]]:
+    """
+    A CSR table as row lengths and per-row delta-encoded (ascending) indices.
+
+    Every row restarts from its first index, so rows decode independently.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    deltas = np.diff(indices, prepend=0)
+    starts = indptr[:-1][np.diff(indptr) > 0]
+    deltas[starts] = indices[starts]
+    return {'lengths': np.diff(indptr).tolist(), 'deltas': deltas.tolist()}
+
+
+def route_patterns(planner: GTFSPlanner) -> List[List[int]]:
+    """Ordered stop positions of every route, from its trip with the most stops"""
+    indptr, stops = planner.trip_stop_sequences()
+    patterns: List[List[int]] = [[] for _ in planner.route_ids]
+    for trip, route_id in enumerate(planner.connection_trip_routes):
+        route = planner.route_position[route_id]
+        if indptr[trip + 1] - indptr[trip] > len(patterns[route]):
+            patterns[route] = stops[indptr[trip]:indptr[trip + 1]].tolist()
+    return patterns
+
+
+def route_fields(planner: GTFSPlanner, route_ids: List[str], columns: List[str]) -> Dict[str, List[str]]:
+    """routes.txt columns for a list of route IDs, as strings ('' where missing)"""
+    routes = planner.routes.assign(route_id=planner.routes['route_id'].astype(str))
+    routes = routes.drop_duplicates('route_id').set_index('route_id').reindex(route_ids)
+    return {column: ['' if value != value else str(value) for value in routes[column].tolist()]
+            if column in routes.columns else [''] * len(route_ids) for column in columns}
+
+
+def build_bundles(planner: GTFSPlanner) -> Dict[str, Dict]:
+    """
+    Compact artifacts for the web pages, built from a loaded planner's network.
+
+    Returns:
+        Dict[str, Dict]: JSON documents by file name:
+            stops.json  stop IDs, names and delta-encoded fixed-point coordinates
+            routes.json route names, colors, shape IDs and ordered stop lists
+            graph.json  transit stop adjacency and the routes serving each stop
+        Stops and routes are referred to by their position in stops.json/routes.json.
+    """
+    arrays = planner.network_arrays
+    header = {'version': BUNDLE_VERSION, 'fingerprint': planner.network_fingerprint}
+    walking = planner.route_position['walking']
+    transit_routes = [route_id for route_id in planner.route_ids if route_id != 'walking']
+
+    lats = np.nan_to_num(np.asarray(planner.stop_lats, dtype=np.float64))
+    lons = np.nan_to_num(np.asarray(planner.stop_lons, dtype=np.float64))
+    stops = dict(header,
+                 ids=[str(stop_id) for stop_id in planner.stop_ids],
+                 names=[str(name) for name in planner.stop_names],
+                 scale=COORD_SCALE,
+                 lat=delta_encode(np.round(lats * COORD_SCALE)),
+                 lon=delta_encode(np.round(lons * COORD_SCALE)))
+
+    fields = route_fields(planner, transit_routes, ['route_short_name', 'route_long_name', 'route_color'])
+    shapes = {}
+    if 'shape_id' in planner.trips.columns:
+        first_trips = planner.trips.dropna(subset=['shape_id']).drop_duplicates('route_id')
+        shapes = dict(zip(first_trips['route_id'].astype(str), first_trips['shape_id'].astype(str)))
+
+    patterns = route_patterns(planner)
+    routes = dict(header,
+                  ids=transit_routes,
+                  short_names=fields['route_short_name'],
+                  long_names=fields['route_long_name'],
+                  colors=fields['route_color'],
+                  shapes=[shapes.get(route_id, '') for route_id in transit_routes],
+                  stops=[patterns[planner.route_position[route_id]] for route_id in transit_routes])
+
+    # Transit adjacency: edges served by at least one route other than walking
+    adj_indptr, adj_indices = arrays['adj_indptr'], arrays['adj_indices']
+    edge_route_ptr, edge_routes = arrays['edge_route_ptr'], arrays['edge_routes']
+    transit = np.add.reduceat((edge_routes != walking).astype(np.int32), edge_route_ptr[:-1]) > 0 \
+        if len(adj_indices) else np.zeros(0, dtype=bool)
+    rows = np.repeat(np.arange(len(adj_indptr) - 1), np.diff(adj_indptr))
+    transit_indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[transit], minlength=len(adj_indptr) - 1))])
+
+    stop_routes_ptr, stop_routes_idx = arrays['stop_routes_ptr'], arrays['stop_routes_idx']
+    served = stop_routes_idx != walking
+    member_rows = np.repeat(np.arange(len(stop_routes_ptr) - 1), np.diff(stop_routes_ptr))
+    served_ptr = np.concatenate([[0], np.cumsum(np.bincount(member_rows[served], minlength=len(stop_routes_ptr) - 1))])
+
+    graph = dict(header,
+                 adjacency=csr_deltas(transit_indptr, adj_indices[transit]),
+                 stop_routes=csr_deltas(served_ptr, stop_routes_idx[served]))
+
+    return {'stops.json': stops, 'routes.json': routes, 'graph.json': graph}
+
+
+def write_bundles(bundles: Dict[str, Dict], output_dir: str) -> Dict[str, int]:
+    """Write the bundles as minified JSON; returns the size of each file in bytes"""
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = {}
+    for name, document in bundles.items():
+        path = os.path.join(output_dir, name)
+        data = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        sizes[name] = len(data)
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export compact data bundles for the web pages")
+    parser.add_argument('--gtfs', default="israel-public-transportation", help="Path to the GTFS files")
+    parser.add_argument('--output', default=os.path.join('docs', 'assets', 'bundles'), help="Output directory")
+    args = parser.parse_args()
+
+    planner = GTFSPlanner(args.gtfs)
+    print("\nExporting bundles...")
+    sizes = write_bundles(build_bundles(planner), args.output)
+    for name, size in sizes.items():
+        print(f"- {name}: {size / 1024:,.0f} KB")
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from gtfs_loader import read_optional, read_trips
+
+SHAPES_VERSION = 1
+ZOOM_LEVELS = (8, 11, 14)
+POLYLINE_PRECISION = 5
+METERS_PER_DEGREE = 111319.49
+REFERENCE_LATITUDE = 31.5  # Tolerances are one map pixel at this latitude
+
+
+def pixel_meters(zoom: int, latitude: float = REFERENCE_LATITUDE) -> float:
+    """Ground size of one 256px-tile map pixel at a zoom level, in meters"""
+    return 360 * METERS_PER_DEGREE * np.cos(np.radians(latitude)) / (256 << zoom)
+
+
+def _segment_distances(px, py, ax, ay, bx, by) -> np.ndarray:
+    """Distance of each point p to the segment a-b (to a itself where a == b)"""
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(length2 > 0, ((px - ax) * dx + (py - ay) * dy) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def douglas_peucker_significance(x: np.ndarray, y: np.ndarray, starts: np.ndarray,
+                                 min_tolerance: float = 0.0) -> np.ndarray:
+    """
+    The largest Douglas-Peucker tolerance at which each point of many polylines is kept.
+
+    All polylines are simplified together: every round splits each open segment at its
+    farthest interior point. A point's value is its distance from the segment it split,
+    capped by the value of the point that made that segment, so simplifying at tolerance
+    t keeps exactly the points whose value is above t.
+
+    Args:
+        x, y: Planar coordinates (meters) of every point, grouped by polyline
+        starts: Index of the first point of each polyline
+        min_tolerance: Segments whose farthest point is within this are not split further
+    Returns:
+        np.ndarray: Significance per point; inf for the endpoints of each polyline
+    """
+    significance = np.zeros(len(x))
+    if not len(x):
+        return significance
+    firsts = np.asarray(starts, dtype=np.int64)
+    lasts = np.append(firsts[1:], len(x)) - 1
+    significance[firsts] = significance[lasts] = np.inf
+
+    open_segments = lasts - firsts > 1
+    seg_a, seg_b = firsts[open_segments], lasts[open_segments]
+    ceiling = np.full(len(seg_a), np.inf)
+    while len(seg_a):
+        # Interior points of every open segment, grouped by segment
+        lengths = seg_b - seg_a - 1
+        offsets = np.cumsum(lengths) - lengths
+        group = np.repeat(np.arange(len(seg_a)), lengths)
+        points = np.arange(lengths.sum()) - np.repeat(offsets, lengths) + np.repeat(seg_a + 1, lengths)
+        a, b = seg_a[group], seg_b[group]
+        distance = _segment_distances(x[points], y[points], x[a], y[a], x[b], y[b])
+
+        # Farthest interior point per segment (the first one on ties)
+        farthest = np.maximum.reduceat(distance, offsets)
+        candidates = np.where(distance == farthest[group], np.arange(len(distance)), len(distance))
+        split = points[np.minimum.reduceat(candidates, offsets)]
+        value = np.minimum(farthest, ceiling)
+        significance[split] = value
+
+        keep = value > min_tolerance
+        seg_a, seg_b, split, value = seg_a[keep], seg_b[keep], split[keep], value[keep]
+        seg_a, seg_b, ceiling = np.concatenate([seg_a, split]), np.concatenate([split, seg_b]), \
+            np.concatenate([value, value])
+        open_segments = seg_b - seg_a > 1
+        seg_a, seg_b, ceiling = seg_a[open_segments], seg_b[open_segments], ceiling[open_segments]
+    return significance
+
+
+def encode_polylines(lats: np.ndarray, lons: np.ndarray, starts: np.ndarray,
+                     precision: int = POLYLINE_PRECISION) -> list:
+    """
+    Encoded polyline strings (Google's algorithm) for many polylines at once.
+
+    Args:
+        lats, lons: Coordinates of every point, grouped by polyline
+        starts: Index of the first point of each polyline
+        precision: Decimal places kept
+    Returns:
+        list: One encoded string per polyline
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    if not len(lats):
+        return [''] * len(starts)
+    scale = 10 ** precision
+    values = np.stack([np.round(np.asarray(lats, dtype=np.float64) * scale),
+                       np.round(np.asarray(lons, dtype=np.float64) * scale)], axis=1).astype(np.int64)
+    # Each point relative to the previous one of its polyline; the first one is absolute
+    deltas = np.diff(values, axis=0, prepend=0)
+    deltas[starts] = values[starts]
+    deltas = deltas.ravel()
+    zigzag = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Five-bit chunks, low bits first, with 0x20 on every chunk but the last; +63 each
+    chunks = (zigzag[:, None] >> (5 * np.arange(7))) & 31
+    n_chunks = 1 + sum((zigzag >= 1 << (5 * k)).astype(np.int64) for k in range(1, 7))
+    used = np.arange(7) < n_chunks[:, None]
+    more = np.arange(7) < n_chunks[:, None] - 1
+    characters = (chunks | (more * 0x20)) + 63
+    text = characters[used].astype(np.uint8).tobytes().decode('ascii')
+
+    # Split the text where each polyline's first value starts
+    value_offsets = np.concatenate([[0], np.cumsum(n_chunks)])
+    bounds = value_offsets[np.append(starts, len(lats)) * 2].tolist()
+    return [text[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def build_shape_levels(gtfs_path: str, zooms: Sequence[int] = ZOOM_LEVELS) -> Dict[str, Dict]:
+    """
+    Simplified route shapes as encoded polylines, one document per zoom level.
+
+    Every route gets the shape of its first trip that has one. Each level is
+    simplified with a tolerance of one map pixel at that zoom.
+
+    Returns:
+        Dict[str, Dict]: JSON documents by file name: "{zoom}.json" per level, with
+        the polylines keyed by route_id, and "index.json" listing the levels
+    """
+    trips = read_trips(gtfs_path, columns=['route_id', 'shape_id'])
+    shapes = read_optional(gtfs_path, 'shapes.txt',
+                           columns=['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence'])
+    tolerances = [pixel_meters(zoom) for zoom in zooms]
+    index = {'version': SHAPES_VERSION, 'precision': POLYLINE_PRECISION,
+             'zooms': list(zooms), 'tolerances': [round(tolerance, 1) for tolerance in tolerances]}
+    if shapes is None or 'shape_id' not in trips.columns:
+        shapes = pd.DataFrame({'shape_id': [], 'shape_pt_lat': [], 'shape_pt_lon': [], 'shape_pt_sequence': []})
+        trips = trips.assign(shape_id=np.nan)
+
+    first_trips = trips.dropna(subset=['shape_id']).drop_duplicates('route_id')
+    route_shape = dict(zip(first_trips['route_id'].astype(str), first_trips['shape_id'].astype(str)))
+
+    # Points of the shapes in use, grouped by shape in sequence order
+    shapes = shapes.assign(shape_id=shapes['shape_id'].astype(str))
+    shapes = shapes[shapes['shape_id'].isin(set(route_shape.values()))]
+    shapes = shapes.sort_values(['shape_id', 'shape_pt_sequence'], kind='stable')
+    shape_ids, starts = np.unique(shapes['shape_id'].to_numpy(), return_index=True)
+    lats = shapes['shape_pt_lat'].to_numpy(np.float64)
+    lons = shapes['shape_pt_lon'].to_numpy(np.float64)
+
+    point_shapes = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(lats))))
+
+    # Equirectangular meters, scaled at the latitude of each shape's first point
+    x = lons * METERS_PER_DEGREE * np.cos(np.radians(lats[starts]))[point_shapes]
+    y = lats * METERS_PER_DEGREE
+    significance = douglas_peucker_significance(x, y, starts, min(tolerances))
+
+    shape_position = {shape_id: position for position, shape_id in enumerate(shape_ids.tolist())}
+    documents = {}
+    for zoom, tolerance in zip(zooms, tolerances):
+        kept = np.flatnonzero(significance > tolerance)
+        kept_starts = np.searchsorted(point_shapes[kept], np.arange(len(starts)))
+        polylines = encode_polylines(lats[kept], lons[kept], kept_starts)
+        documents[f"{zoom}.json"] = {
+            'version': SHAPES_VERSION, 'zoom': zoom, 'tolerance': round(tolerance, 1),
+            'routes': {route_id: polylines[shape_position[shape_id]]
+                       for route_id, shape_id in route_shape.items() if shape_id in shape_position},
+        }
+        index.setdefault('points', {})[str(zoom)] = len(kept)
+    index['source_points'] = len(lats)
+    documents['index.json'] = index
+    return documents
+
+
+def write_shape_levels(documents: Dict[str, Dict], output_dir: str) -> Tuple[int, Dict[str, int]]:
+    """Write the shape documents as minified JSON; returns the total and per-file sizes in bytes"""
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    sizes = {}
+    for name, document in documents.items():
+        data = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(os.path.join(output_dir, name), 'wb') as f:
+            f.write(data)
+        sizes[name] = len(data)
+    return sum(sizes.values()), sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export simplified route shapes as encoded polylines")
+    parser.add_argument('--gtfs', default="israel-public-transportation", help="Path to the GTFS files")
+    parser.add_argument('--output', default=os.path.join('docs', 'assets', 'shapes'), help="Output directory")
+    parser.add_argument('--zoom', type=int, action='append', help="Zoom level to build (repeatable, default 8, 11, 14)")
+    args = parser.parse_args()
+
+    print("\nSimplifying shapes...")
+    start = time.perf_counter()
+    documents = build_shape_levels(args.gtfs, sorted(args.zoom) if args.zoom else ZOOM_LEVELS)
+    total, sizes = write_shape_levels(documents, args.output)
+    index = documents['index.json']
+    for name, size in sizes.items():
+        if name != 'index.json':
+            zoom = name.split('.')[0]
+            print(f"- {name}: {index['points'][zoom]:,} of {index['source_points']:,} points, {size / 1024:,.0f} KB")
+    print(f"Wrote {total / 1024 / 1024:,.1f} MB to {args.output} in {time.perf_counter() - start:.1f}s")
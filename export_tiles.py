@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from export_bundles import route_fields, route_patterns
+from gtfs_loader import read_optional
+from plan import GTFSPlanner
+
+TILE_VERSION = 1
+MAX_LATITUDE = 85.05112878  # Web Mercator bounds
+
+
+def lat_lon_to_tile(lats: np.ndarray, lons: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator (slippy map) tile column and row of each point at a zoom level"""
+    n = 1 << zoom
+    lats = np.radians(np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    x = np.floor((np.asarray(lons, dtype=np.float64) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lats) + 1.0 / np.cos(lats)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_to_quadkey(x: int, y: int, zoom: int) -> str:
+    """Bing-style quadkey of a tile: one base-4 digit per zoom level"""
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def quadkey_to_tile(quadkey: str) -> Tuple[int, int, int]:
+    """(x, y, zoom) of a quadkey"""
+    x = y = 0
+    zoom = len(quadkey)
+    for level, digit in zip(range(zoom, 0, -1), quadkey):
+        mask = 1 << (level - 1)
+        if digit in '13':
+            x |= mask
+        if digit in '23':
+            y |= mask
+    return x, y, zoom
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> List[float]:
+    """[south, west, north, east] of a tile in degrees"""
+    n = 1 << zoom
+
+    def latitude(row: int) -> float:
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * row / n)))))
+
+    return [latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0]
+
+
+def route_geometries(planner: GTFSPlanner, transit_routes: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    One polyline per route: the shape of its first trip that has one in shapes.txt,
+    otherwise the route's ordered stops.
+
+    Returns:
+        (route index, lat, lon) of every point, grouped by route in polyline order
+    """
+    shapes = read_optional(planner.gtfs_path, 'shapes.txt',
+                           columns=['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence'])
+    route_shape = {}
+    if shapes is not None and 'shape_id' in planner.trips.columns:
+        first_trips = planner.trips.dropna(subset=['shape_id']).drop_duplicates('route_id')
+        route_shape = dict(zip(first_trips['route_id'].astype(str), first_trips['shape_id'].astype(str)))
+
+    parts = []
+    if route_shape:
+        shapes = shapes.assign(shape_id=shapes['shape_id'].astype(str))
+        shapes = shapes[shapes['shape_id'].isin(set(route_shape.values()))]
+        shapes = shapes.sort_values(['shape_id', 'shape_pt_sequence'], kind='stable')
+        points = shapes.groupby('shape_id', sort=False).indices
+        for index, route_id in enumerate(transit_routes):
+            rows = points.get(route_shape.get(route_id))
+            if rows is not None and len(rows) > 1:
+                parts.append((index, shapes['shape_pt_lat'].to_numpy()[rows], shapes['shape_pt_lon'].to_numpy()[rows]))
+
+    shaped = {index for index, _, _ in parts}
+    patterns = route_patterns(planner)
+    for index, route_id in enumerate(transit_routes):
+        stops = patterns[planner.route_position[route_id]]
+        if index not in shaped and len(stops) > 1:
+            parts.append((index, planner.stop_lats[stops], planner.stop_lons[stops]))
+
+    if not parts:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0)
+    parts.sort(key=lambda part: part[0])
+    routes = np.concatenate([np.full(len(lats), index, dtype=np.int64) for index, lats, _ in parts])
+    lats = np.concatenate([np.asarray(lats, dtype=np.float64) for _, lats, _ in parts])
+    lons = np.concatenate([np.asarray(lons, dtype=np.float64) for _, _, lons in parts])
+    return routes, lats, lons
+
+
+def _route_runs(keys: np.ndarray, routes: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    Pieces of route polylines per tile, as (tile key, route, first point, last point).
+
+    A segment belongs to the tiles of both its ends; consecutive segments of a route
+    in the same tile are joined into one piece.
+    """
+    segments = np.flatnonzero(routes[:-1] == routes[1:])
+    if not len(segments):
+        return []
+    # Unique (tile, segment) records packed into int64 keys, sorted by tile and then segment
+    n_points = len(keys)
+    records = np.unique(np.concatenate([keys[segments], keys[segments + 1]]) * n_points
+                        + np.concatenate([segments, segments]))
+    tiles, segments = np.divmod(records, n_points)
+
+    # A new piece starts wherever the tile changes or the segments stop being consecutive
+    starts = np.ones(len(segments), dtype=bool)
+    starts[1:] = (tiles[1:] != tiles[:-1]) | (segments[1:] != segments[:-1] + 1)
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(segments)) - 1
+    return list(zip(tiles[first].tolist(), routes[segments[first]].tolist(),
+                    segments[first].tolist(), (segments[last] + 1).tolist()))
+
+
+def build_tiles(planner: GTFSPlanner, zooms: Sequence[int] = (13,), precision: int = 5) -> Dict[str, Dict]:
+    """
+    Split stops and route geometry into quadkey tiles.
+
+    Each tile holds its stops, the pieces of route polylines crossing it and a summary
+    of the routes there (serving stops in the tile or passing through it).
+
+    Args:
+        planner: Loaded planner; stop coordinates come from planner.stops
+        zooms: Zoom levels to build tiles for
+        precision: Decimal places kept for coordinates
+    Returns:
+        Dict[str, Dict]: JSON documents by relative path: "{zoom}/{quadkey}.json" per
+        non-empty tile and "index.json" listing the tiles with their stop and route counts
+    """
+    stop_ids = planner.stops['stop_id'].astype(str).to_numpy()
+    stop_names = planner.stops['stop_name'].astype(str).to_numpy()
+    stop_lats = planner.stops['stop_lat'].to_numpy(np.float64)
+    stop_lons = planner.stops['stop_lon'].to_numpy(np.float64)
+    located = ~(np.isnan(stop_lats) | np.isnan(stop_lons))
+    stop_positions = planner._stop_positions(stop_ids)
+
+    transit_routes = [route_id for route_id in planner.route_ids if route_id != 'walking']
+    fields = route_fields(planner, transit_routes, ['route_short_name', 'route_long_name', 'route_color'])
+    short_names, long_names, colors = (fields['route_short_name'], fields['route_long_name'],
+                                       fields['route_color'])
+
+    # (stop row, route) memberships from the network, walking excluded
+    arrays = planner.network_arrays
+    ptr, idx = arrays['stop_routes_ptr'], arrays['stop_routes_idx']
+    walking = planner.route_position['walking']
+    lengths = np.where(stop_positions >= 0, np.diff(ptr)[np.maximum(stop_positions, 0)], 0)
+    member_rows = np.repeat(np.arange(len(stop_ids)), lengths)
+    offsets = np.arange(len(member_rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    member_routes = idx[np.repeat(ptr[np.maximum(stop_positions, 0)], lengths) + offsets].astype(np.int64)
+    transit = (member_routes != walking) & located[member_rows]
+    member_rows, member_routes = member_rows[transit], member_routes[transit]
+
+    geometry_routes, geometry_lats, geometry_lons = route_geometries(planner, transit_routes)
+    rounded_lats = np.round(geometry_lats, precision)
+    rounded_lons = np.round(geometry_lons, precision)
+    documents = {}
+    index = {'version': TILE_VERSION, 'zooms': list(zooms), 'tiles': {}}
+
+    for zoom in zooms:
+        n = 1 << zoom
+        x, y = lat_lon_to_tile(stop_lats[located], stop_lons[located], zoom)
+        stop_keys = np.full(len(stop_ids), -1, dtype=np.int64)
+        stop_keys[located] = x * n + y
+        gx, gy = lat_lon_to_tile(geometry_lats, geometry_lons, zoom)
+        geometry_keys = gx * n + gy
+
+        tiles: Dict[int, Dict] = {}
+
+        def tile(key: int) -> Dict:
+            if key not in tiles:
+                tiles[key] = {'stops': [], 'routes': {}, 'lines': []}
+            return tiles[key]
+
+        for row in np.flatnonzero(located)[np.argsort(stop_keys[located], kind='stable')].tolist():
+            tile(int(stop_keys[row]))['stops'].append(row)
+
+        # Stops served per (tile, route)
+        n_routes = len(transit_routes) + 1
+        pairs, counts = np.unique(stop_keys[member_rows] * n_routes + member_routes, return_counts=True)
+        for pair, count in zip(pairs.tolist(), counts.tolist()):
+            tile(pair // n_routes)['routes'][pair % n_routes] = count
+
+        for key, route, first, last in _route_runs(geometry_keys, geometry_routes):
+            entry = tile(key)
+            entry['routes'].setdefault(route, 0)
+            entry['lines'].append((route, first, last))
+
+        zoom_index = index['tiles'][str(zoom)] = {}
+        for key, entry in tiles.items():
+            tx, ty = divmod(key, n)
+            quadkey = tile_to_quadkey(tx, ty, zoom)
+            # Routes by stops served in the tile, then by name
+            summary = sorted(entry['routes'].items(), key=lambda item: (-item[1], short_names[item[0]], item[0]))
+            position = {route: i for i, (route, _) in enumerate(summary)}
+            rows = entry['stops']
+            documents[f"{zoom}/{quadkey}.json"] = {
+                'version': TILE_VERSION,
+                'quadkey': quadkey, 'zoom': zoom, 'x': tx, 'y': ty,
+                'bounds': [round(value, 6) for value in tile_bounds(tx, ty, zoom)],
+                'stops': {
+                    'ids': stop_ids[rows].tolist(),
+                    'names': stop_names[rows].tolist(),
+                    'lat': np.round(stop_lats[rows], precision).tolist(),
+                    'lon': np.round(stop_lons[rows], precision).tolist(),
+                },
+                'routes': [{'id': transit_routes[route], 'short_name': short_names[route],
+                            'long_name': long_names[route], 'color': colors[route], 'stops': count}
+                           for route, count in summary],
+                'lines': [{'route': position[route],
+                           'points': list(map(list, zip(rounded_lats[first:last + 1].tolist(),
+                                                        rounded_lons[first:last + 1].tolist())))}
+                          for route, first, last in entry['lines']],
+            }
+            zoom_index[quadkey] = [len(rows), len(summary)]
+
+    documents['index.json'] = index
+    return documents
+
+
+def write_tiles(documents: Dict[str, Dict], output_dir: str, clean: bool = True) -> int:
+    """Write tile documents as minified JSON under output_dir; returns the total size in bytes"""
+    if clean and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    total = 0
+    for path, document in documents.items():
+        full_path = os.path.join(output_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        data = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(full_path, 'wb') as f:
+            f.write(data)
+        total += len(data)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export stops and route geometry as quadkey tiles")
+    parser.add_argument('--gtfs', default="israel-public-transportation", help="Path to the GTFS files")
+    parser.add_argument('--output', default=os.path.join('docs', 'assets', 'tiles'), help="Output directory")
+    parser.add_argument('--zoom', type=int, action='append', help="Zoom level to build (repeatable, default 13)")
+    args = parser.parse_args()
+
+    planner = GTFSPlanner(args.gtfs)
+    print("\nBuilding tiles...")
+    start = time.perf_counter()
+    documents = build_tiles(planner, args.zoom or [13])
+    size = write_tiles(documents, args.output)
+    print(f"Wrote {len(documents) - 1:,} tiles ({size / 1024 / 1024:,.1f} MB) to {args.output} "
+          f"in {time.perf_counter() - start:.1f}s")
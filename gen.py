@@ -1,10 +1,15 @@
-import pandas as pd
+import numpy as np
 import os
 from jinja2 import Template, Environment, FileSystemLoader
+import hashlib
 import json
 from datetime import datetime
 from math import radians, sin, cos, sqrt, atan2
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from gtfs_loader import read_routes, read_stop_times, read_stops, read_trips
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two points in kilometers."""
@@ -25,27 +30,8 @@ def calculate_distance(lat1, lon1, lat2, lon2):
         return 0
 
 
-def generate_stylish_route_pages(gtfs_path):
-    """Generate stylish HTML pages with maps for each route in the GTFS data."""
-    try:
-        # Create output directory
-        output_dir = "docs/route_pages"
-
-
-
-
-        # Load GTFS files with error handling
-        try:
-            routes_df = pd.read_csv(f"{gtfs_path}/routes.txt")
-            trips_df = pd.read_csv(f"{gtfs_path}/trips.txt")
-            stop_times_df = pd.read_csv(f"{gtfs_path}/stop_times.txt")
-            stops_df = pd.read_csv(f"{gtfs_path}/stops.txt")
-        except Exception as e:
-            print(f"Error reading GTFS files: {e}")
-            return
-
-        # HTML template for route pages
-        route_template = Template("""
+# HTML template for route pages
+ROUTE_PAGE_TEMPLATE = """
       <!DOCTYPE html>
 <html lang="he" dir="rtl">
 <head>
@@ -274,7 +260,215 @@ def generate_stylish_route_pages(gtfs_path):
     </script>
 </body>
 </html>
-        """)
+        """
+
+# Compiled once per process by _write_route_page
+_route_template = None
+
+
+def _write_route_page(job: Tuple[str, Dict]) -> Optional[str]:
+    """Render one route page and write it; returns an error message instead of raising"""
+    global _route_template
+    path, context = job
+    try:
+        if _route_template is None:
+            _route_template = Template(ROUTE_PAGE_TEMPLATE)
+        html_content = _route_template.render(**context)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+    except Exception as e:
+        return f"Error processing route {context['route_short_name']}: {e}"
+    return None
+
+
+def _first_trip_stops(trips_df, stop_times_df, stops_df) -> Tuple[Dict[str, str], Dict[str, List[Dict]]]:
+    """
+    The first trip of every route and that trip's stops, in one pass over the tables.
+
+    Returns:
+        (first trip ID per route ID, stop records per first trip ID in stop_sequence order)
+    """
+    first_trips = trips_df.drop_duplicates('route_id')
+    first_trip = dict(zip(first_trips['route_id'].astype(str), first_trips['trip_id'].astype(str)))
+
+    trip_stops = stop_times_df[stop_times_df['trip_id'].isin(list(first_trip.values()))]
+    trip_stops = trip_stops.assign(trip_id=trip_stops['trip_id'].astype(str),
+                                   stop_id=trip_stops['stop_id'].astype(str))
+    trip_stops = trip_stops.sort_values('stop_sequence', kind='stable')
+    # Each stop_time takes the first stops.txt row of its stop, as the per-route lookup did
+    stops = stops_df.assign(stop_id=stops_df['stop_id'].astype(str)).drop_duplicates('stop_id')
+    merged = trip_stops.merge(stops, on='stop_id', how='left', indicator=True)
+
+    trip_route = {trip_id: route_id for route_id, trip_id in first_trip.items()}
+    stops_by_trip = {trip_id: [] for trip_id in first_trip.values()}
+    for trip_id, stop_id, sequence, name, lat, lon, found in zip(
+            merged['trip_id'], merged['stop_id'], merged['stop_sequence'], merged['stop_name'],
+            merged['stop_lat'], merged['stop_lon'], merged['_merge'] == 'both'):
+        if not found:
+            print(f"Stop {stop_id} of route {trip_route[trip_id]} (trip {trip_id}) is not in stops.txt. Skipping...")
+            continue
+        stops_by_trip[trip_id].append({
+            'sequence': int(sequence),
+            'name': str(name).replace("'", ""),
+            'lat': float(lat),
+            'lon': float(lon)
+        })
+    return first_trip, stops_by_trip
+
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _page_hash(context: Dict) -> str:
+    """Hash of everything a page is rendered from: its template context and the template"""
+    digest = hashlib.sha256(ROUTE_PAGE_TEMPLATE.encode('utf-8'))
+    digest.update(json.dumps(context, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_manifest(output_dir: str) -> Dict[str, Dict]:
+    """Pages recorded by the last incremental build; empty if there is no usable manifest"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('pages', {})
+
+
+def _save_manifest(output_dir: str, pages: Dict[str, Dict]):
+    """Write the manifest atomically, so an interrupted build never leaves it half written"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'pages': pages}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _generate_pages_single_pass(routes_df, trips_df, stop_times_df, stops_df, output_dir: str, workers: int,
+                                incremental: bool = True):
+    """
+    Write the route pages from one grouped pass over the tables, rendering in a process pool.
+
+    Routes are taken in routes.txt order and the first route with trips owns each short
+    name's page. Incremental builds re-render only pages whose inputs hash differently
+    from the manifest of the last build and delete pages no route owns any more; otherwise
+    existing pages are kept as they are.
+    """
+    first_trip, stops_by_trip = _first_trip_stops(trips_df, stop_times_df, stops_df)
+    current_year = datetime.now().year
+
+    pages = {}
+    owners = {}
+    for route in routes_df.to_dict('records'):
+        route_short_name = str(route['route_short_name']).replace("'", "")
+        route_long_name = str(route['route_long_name']).replace("'", "")
+        path = f"{output_dir}/route_{route_short_name}.html"
+        if route_short_name in owners:
+            if incremental:
+                print(f"Route {route['route_id']} shares short name {route_short_name} "
+                      f"with route {owners[route_short_name]}. Skipping...")
+            else:
+                print(f"Page for route {route_short_name} already exists. Skipping...")
+            continue
+        if not incremental and os.path.exists(path):
+            print(f"Page for route {route_short_name} already exists. Skipping...")
+            continue
+
+        trip_id = first_trip.get(str(route['route_id']))
+        if trip_id is None:
+            continue
+        owners[route_short_name] = str(route['route_id'])
+        stops_info = stops_by_trip[trip_id]
+        pages[os.path.basename(path)] = (path, {
+            'route_short_name': route_short_name,
+            'route_long_name': route_long_name,
+            'route_type': route['route_type'],
+            'agency_id': route.get('agency_id', 'N/A'),
+            'stops': stops_info,
+            'stops_json': json.dumps(stops_info),
+            'current_url': f"https://dorpascal.com/MooveFree/route_pages/route_{route_short_name}",
+            'current_year': current_year
+        })
+
+    if incremental:
+        manifest = _load_manifest(output_dir)
+        hashes = {name: _page_hash(context) for name, (_, context) in pages.items()}
+        jobs = [pages[name] for name in pages
+                if manifest.get(name, {}).get('hash') != hashes[name] or not os.path.exists(pages[name][0])]
+    else:
+        jobs = list(pages.values())
+    for _, context in jobs:
+        print(f"Generating page for route {context['route_short_name']}...")
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(_write_route_page, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+    else:
+        errors = [_write_route_page(job) for job in jobs]
+    for error in errors:
+        if error:
+            print(error)
+    if not incremental:
+        return
+
+    # Pages no route owns any more, whether or not an earlier manifest recorded them
+    orphans = sorted(name for name in os.listdir(output_dir)
+                     if name.startswith('route_') and name.endswith('.html') and name not in pages)
+    for name in orphans:
+        os.remove(os.path.join(output_dir, name))
+        print(f"Deleted orphaned page {name}")
+
+    # Failed pages stay out of the manifest, so the next build retries them
+    failed = {os.path.basename(path) for (path, _), error in zip(jobs, errors) if error}
+    _save_manifest(output_dir, {name: {'hash': hashes[name], 'route_id': owners[pages[name][1]['route_short_name']]}
+                                for name in pages if name not in failed})
+    print(f"Rendered {len(jobs) - len(failed)} pages, {len(pages) - len(jobs)} unchanged, "
+          f"deleted {len(orphans)} orphaned pages")
+
+
+def generate_stylish_route_pages(gtfs_path, single_pass: bool = True, workers: Optional[int] = None,
+                                 incremental: bool = True):
+    """
+    Generate stylish HTML pages with maps for each route in the GTFS data.
+
+    Args:
+        gtfs_path: Path to the GTFS files
+        single_pass: Collect every route's stops in one grouped pass and render pages in a
+            process pool; False uses the original route-by-route loop
+        workers: Rendering processes in single-pass mode (default: CPU count)
+        incremental: In single-pass mode, re-render only pages whose inputs changed since the
+            last build (tracked in docs/route_pages/.build-manifest.json) and delete orphaned
+            pages; False skips every page that already exists
+    """
+    try:
+        # Create output directory
+        output_dir = "docs/route_pages"
+
+
+
+
+        # Load GTFS files with error handling
+        try:
+            routes_df = read_routes(gtfs_path)
+            trips_df = read_trips(gtfs_path, columns=['route_id', 'trip_id'])
+            stop_times_df = read_stop_times(gtfs_path, columns=['trip_id', 'stop_id', 'stop_sequence'])
+            # Full-precision coordinates, as they are written into the pages
+            stops_df = read_stops(gtfs_path, columns=['stop_id', 'stop_name', 'stop_lat', 'stop_lon'],
+                                  coord_dtype=np.float64)
+        except Exception as e:
+            print(f"Error reading GTFS files: {e}")
+            return
+
+        if single_pass:
+            _generate_pages_single_pass(routes_df, trips_df, stop_times_df, stops_df, output_dir,
+                                        workers or os.cpu_count() or 1, incremental)
+            print(f"\nGenerated {len(routes_df)} route pages in '{output_dir}' directory")
+            return
+
+        route_template = Template(ROUTE_PAGE_TEMPLATE)
 
         # Generate individual route pages
         for _, route in routes_df.iterrows():
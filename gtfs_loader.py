@@ -0,0 +1,212 @@
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Compact dtypes per GTFS file. IDs are categorical, coordinates float32 and
+# small integer fields narrow ints; times are converted to int32 seconds after reading.
+# route_short_name keeps pandas' inferred type, so line numbers sort as before.
+GTFS_DTYPES = {
+    'stops.txt': {
+        'stop_id': 'category',
+        'stop_code': 'category',
+        'stop_name': str,
+        'stop_desc': str,
+        'stop_lat': np.float32,
+        'stop_lon': np.float32,
+        'location_type': 'Int8',
+        'parent_station': 'category',
+        'zone_id': 'category',
+    },
+    'routes.txt': {
+        'route_id': 'category',
+        'agency_id': 'category',
+        'route_long_name': str,
+        'route_desc': str,
+        'route_type': np.int16,
+        'route_color': str,
+    },
+    'trips.txt': {
+        'route_id': 'category',
+        'service_id': 'category',
+        'trip_id': 'category',
+        'trip_headsign': str,
+        'direction_id': 'Int8',
+        'shape_id': 'category',
+    },
+    'stop_times.txt': {
+        'trip_id': 'category',
+        'arrival_time': str,
+        'departure_time': str,
+        'stop_id': 'category',
+        'stop_sequence': np.int32,
+        'pickup_type': 'Int8',
+        'drop_off_type': 'Int8',
+        'shape_dist_traveled': np.float32,
+    },
+    'calendar.txt': {
+        'service_id': 'category',
+        'monday': np.int8,
+        'tuesday': np.int8,
+        'wednesday': np.int8,
+        'thursday': np.int8,
+        'friday': np.int8,
+        'saturday': np.int8,
+        'sunday': np.int8,
+        'start_date': str,
+        'end_date': str,
+    },
+    'calendar_dates.txt': {
+        'service_id': 'category',
+        'date': str,
+        'exception_type': np.int8,
+    },
+    'shapes.txt': {
+        'shape_id': 'category',
+        'shape_pt_lat': np.float32,
+        'shape_pt_lon': np.float32,
+        'shape_pt_sequence': np.int32,
+    },
+}
+
+TIME_COLUMNS = ('arrival_time', 'departure_time')
+MISSING_TIME = -1
+
+
+def parse_time_column(times: pd.Series) -> np.ndarray:
+    """
+    Convert a column of GTFS times (HH:MM:SS, hours may exceed 24) to int32 seconds.
+
+    Blank times, allowed for non-timepoint stops, become MISSING_TIME.
+    """
+    parts = times.astype(str).str.strip().str.split(':', expand=True)
+    if parts.shape[1] < 3:
+        return np.full(len(times), MISSING_TIME, dtype=np.int32)
+    parts = parts.iloc[:, :3].apply(pd.to_numeric, errors='coerce')
+    seconds = parts[0] * 3600 + parts[1] * 60 + parts[2]
+    return seconds.fillna(MISSING_TIME).to_numpy(np.int32)
+
+
+def _dtypes(name: str, columns: Optional[List[str]], overrides: Optional[Dict]) -> Dict:
+    """dtype mapping for the requested columns of a file"""
+    dtypes = dict(GTFS_DTYPES.get(name, {}))
+    dtypes.update(overrides or {})
+    if columns is not None:
+        dtypes = {column: dtype for column, dtype in dtypes.items() if column in columns}
+    return dtypes
+
+
+def _convert_times(frame: pd.DataFrame) -> pd.DataFrame:
+    """Replace HH:MM:SS time columns with int32 seconds, in place"""
+    for column in TIME_COLUMNS:
+        if column in frame.columns and frame[column].dtype != np.int32:
+            frame[column] = parse_time_column(frame[column])
+    return frame
+
+
+def _parquet_path(gtfs_path: str, name: str) -> Optional[str]:
+    """The Parquet side file for a GTFS file, if one exists and is up to date"""
+    csv_path = os.path.join(gtfs_path, name)
+    parquet_path = os.path.join(gtfs_path, name.replace('.txt', '.parquet'))
+    if not os.path.exists(parquet_path):
+        return None
+    if os.path.exists(csv_path) and os.path.getmtime(parquet_path) < os.path.getmtime(csv_path):
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return parquet_path
+
+
+def read_table(gtfs_path: str, name: str, columns: Optional[List[str]] = None,
+               dtypes: Optional[Dict] = None, use_parquet: bool = True) -> pd.DataFrame:
+    """
+    Read one GTFS file with compact dtypes.
+
+    Args:
+        gtfs_path: Path to the folder containing GTFS files
+        name: File name, e.g. "stop_times.txt"
+        columns: Columns to load; None loads all of them
+        dtypes: Per-column dtype overrides
+        use_parquet: Read the Parquet side file instead when it is up to date
+    Returns:
+        pd.DataFrame: The table; arrival/departure times are int32 seconds
+    """
+    parquet_path = _parquet_path(gtfs_path, name) if use_parquet else None
+    if parquet_path:
+        frame = pd.read_parquet(parquet_path, columns=columns)
+        overrides = {column: dtype for column, dtype in _dtypes(name, None, dtypes).items()
+                     if column in frame.columns and column.endswith(('_lat', '_lon'))}
+        return frame.astype(overrides) if overrides else frame
+
+    frame = pd.read_csv(os.path.join(gtfs_path, name), usecols=columns,
+                        dtype=_dtypes(name, columns, dtypes))
+    return _convert_times(frame)
+
+
+def iter_table(gtfs_path: str, name: str, columns: Optional[List[str]] = None, chunksize: int = 1000000,
+               dtypes: Optional[Dict] = None, use_parquet: bool = True) -> Iterator[pd.DataFrame]:
+    """Like read_table, but yield the table in chunks of at most chunksize rows"""
+    parquet_path = _parquet_path(gtfs_path, name) if use_parquet else None
+    if parquet_path:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    for chunk in pd.read_csv(os.path.join(gtfs_path, name), usecols=columns, chunksize=chunksize,
+                             dtype=_dtypes(name, columns, dtypes)):
+        yield _convert_times(chunk)
+
+
+def read_stops(gtfs_path: str, columns: Optional[List[str]] = None, coord_dtype=np.float32) -> pd.DataFrame:
+    """Read stops.txt; pass coord_dtype=np.float64 where exact coordinates matter"""
+    return read_table(gtfs_path, 'stops.txt', columns,
+                      dtypes={'stop_lat': coord_dtype, 'stop_lon': coord_dtype})
+
+
+def read_routes(gtfs_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read routes.txt"""
+    return read_table(gtfs_path, 'routes.txt', columns)
+
+
+def read_trips(gtfs_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read trips.txt"""
+    return read_table(gtfs_path, 'trips.txt', columns)
+
+
+def read_stop_times(gtfs_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read stop_times.txt; arrival_time and departure_time come back as int32 seconds"""
+    return read_table(gtfs_path, 'stop_times.txt', columns)
+
+
+def read_optional(gtfs_path: str, name: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """read_table for optional GTFS files; None if the feed does not include the file"""
+    if not os.path.exists(os.path.join(gtfs_path, name)) and _parquet_path(gtfs_path, name) is None:
+        return None
+    return read_table(gtfs_path, name, columns)
+
+
+def write_parquet_side_files(gtfs_path: str, names: Optional[List[str]] = None):
+    """
+    Convert GTFS files to typed Parquet side files (e.g. stop_times.parquet) that
+    read_table picks up while they are newer than the CSV. Requires pyarrow.
+    """
+    names = names or ['stops.txt', 'routes.txt', 'trips.txt', 'stop_times.txt']
+    for name in names:
+        if not os.path.exists(os.path.join(gtfs_path, name)):
+            continue
+        print(f"Writing Parquet side file for {name}...")
+        # Coordinates are stored at full precision; readers narrow them on load
+        exact = {column: np.float64 for column in GTFS_DTYPES.get(name, {})
+                 if column.endswith(('_lat', '_lon'))}
+        frame = read_table(gtfs_path, name, dtypes=exact, use_parquet=False)
+        frame.to_parquet(os.path.join(gtfs_path, name.replace('.txt', '.parquet')), index=False)
+
+
+if __name__ == "__main__":
+    # Example usage
+    gtfs_path = "israel-public-transportation"  # Path to the GTFS files
+    write_parquet_side_files(gtfs_path)
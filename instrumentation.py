@@ -0,0 +1,103 @@
+import contextlib
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Returned by Instrumentation.phase while disabled, so timed blocks cost one call
+_NO_PHASE = contextlib.nullcontext()
+
+
+class _Phase:
+    """Context manager adding the time spent in a block to a phase total"""
+
+    def __init__(self, instrumentation: 'Instrumentation', name: str):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        timer = self.instrumentation.timers.setdefault(self.name, {'seconds': 0.0, 'calls': 0})
+        timer['seconds'] += elapsed
+        timer['calls'] += 1
+        return False
+
+
+class Instrumentation:
+    """
+    Phase timers, counters and per-query trace records for the planner.
+
+    Everything is off unless enabled; hot loops check `enabled` (or get None from
+    start_trace) before recording anything, so a disabled instance costs a branch.
+
+    Timers: load, path_search, trip_fitting, raptor, build_patterns and the network
+    build steps.
+    Counters: paths_examined, segments_fitted, trips_scanned, connections_scanned,
+    raptor_rounds, hops_scanned, pareto_labels, cache_hits, cache_misses, ...
+    """
+
+    def __init__(self, enabled: bool = False, trace: bool = False, max_traces: int = 1000):
+        """
+        Args:
+            enabled: Record timers and counters
+            trace: Also keep a trace record per query (requires enabled)
+            max_traces: Most recent trace records kept
+        """
+        self.enabled = enabled
+        self.trace = enabled and trace
+        self.timers: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.traces = deque(maxlen=max_traces)
+
+    def phase(self, name: str):
+        """Context manager timing a block under name"""
+        return _Phase(self, name) if self.enabled else _NO_PHASE
+
+    def count(self, name: str, amount: int = 1):
+        """Add amount to a counter"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def start_trace(self, query: str, **fields) -> Optional[Dict]:
+        """A new trace record for one query, or None when tracing is off"""
+        if not self.trace:
+            return None
+        return {'query': query, **fields, 'events': [], 'started': time.perf_counter()}
+
+    def finish_trace(self, record: Optional[Dict], **fields):
+        """Close a trace record from start_trace and keep it"""
+        if record is None:
+            return
+        record.update(fields)
+        record['seconds'] = time.perf_counter() - record.pop('started')
+        self.traces.append(record)
+
+    def reset(self):
+        """Drop all recorded timers, counters and traces"""
+        self.timers.clear()
+        self.counters.clear()
+        self.traces.clear()
+
+    def to_dict(self, traces: bool = True) -> Dict:
+        """Everything recorded so far, in a JSON-serializable form"""
+        result = {'timers': {name: dict(timer) for name, timer in self.timers.items()},
+                  'counters': dict(self.counters)}
+        if traces:
+            result['traces'] = list(self.traces)
+        return result
+
+    def export_json(self, path: str, traces: bool = True):
+        """Write to_dict() to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(traces), f, ensure_ascii=False, indent=2)
+
+    def summary(self) -> List[str]:
+        """Human-readable lines for the timers and counters"""
+        lines = [f"{name}: {timer['seconds']:.3f}s over {timer['calls']} calls"
+                 for name, timer in sorted(self.timers.items())]
+        lines += [f"{name}: {value:,}" for name, value in sorted(self.counters.items())]
+        return lines
@@ -0,0 +1,221 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple, Union
+
+from plan import GTFSPlanner, Journey, parse_time
+from service_calendar import parse_date
+
+
+@dataclass
+class BucketProfile:
+    """Everything needed to answer earliest-arrival queries for any time in one bucket"""
+    journeys: List[Journey]  # Pareto journeys leaving within the bucket, by departure
+    fallback: Optional[Journey]  # earliest-arrival journey leaving at the end of the bucket
+    walk: Optional[Journey]  # walking the whole way, leaving at 0 seconds
+
+
+@dataclass
+class CacheEntry:
+    """The answers known for one bucket: single query results, or the bucket's whole profile"""
+    answers: List[Tuple[int, int, List[Journey]]] = field(default_factory=list)  # (departure, last, journeys)
+    profile: Optional[BucketProfile] = None
+    misses: int = 0
+    created: float = 0.0
+
+
+def build_profile(planner: GTFSPlanner, start_stop: str, end_stop: str, bucket_start: int,
+                  bucket_seconds: int, date=None) -> BucketProfile:
+    """Run the profile query for one time bucket and keep what answer_profile needs"""
+    bucket_end = bucket_start + bucket_seconds - 1
+    journeys = planner.find_profile(start_stop, end_stop, bucket_start, bucket_end, date)
+    fallback = planner.find_fastest_path(start_stop, end_stop, bucket_end, date)
+    walk = planner.walking_journey(start_stop, end_stop, 0)
+    return BucketProfile(journeys=journeys, fallback=fallback[0] if fallback else None, walk=walk)
+
+
+def answer_profile(profile: BucketProfile, departure: int) -> List[Journey]:
+    """
+    The earliest-arrival journey leaving at departure, as find_fastest_path would find it.
+
+    Profile journeys arrive later the later they leave, so the first one leaving at or
+    after departure arrives earliest; past the last one, the journey leaving at the end
+    of the bucket is optimal. Walking the whole way is taken when it is no slower.
+    """
+    best = next((journey for journey in profile.journeys if journey.trips[0].departure_time >= departure),
+                profile.fallback)
+    if profile.walk is not None:
+        walk_arrival = departure + profile.walk.trips[-1].arrival_time
+        if best is None or walk_arrival <= best.trips[-1].arrival_time:
+            best = _delayed(profile.walk, departure, len(profile.walk.trips))
+    return [best] if best is not None else []
+
+
+def _first_ride(journey: Journey) -> int:
+    """Index of the journey's first transit trip; len(trips) if it walks all the way"""
+    return next((i for i, trip in enumerate(journey.trips) if not trip.is_walking), len(journey.trips))
+
+
+def _delayed(journey: Journey, delay: int, n_trips: int) -> Journey:
+    """The journey with its first n_trips trips leaving delay seconds later"""
+    if not delay:
+        return journey
+    trips = [replace(trip, departure_time=trip.departure_time + delay, arrival_time=trip.arrival_time + delay)
+             for trip in journey.trips[:n_trips]] + journey.trips[n_trips:]
+    return replace(journey, trips=trips, total_time=trips[-1].arrival_time - trips[0].departure_time)
+
+
+def last_answered(journeys: List[Journey], departure: int, bucket_end: int) -> int:
+    """
+    The latest departure time in the bucket that find_fastest_path's answer for
+    departure also answers.
+
+    Leaving later never arrives earlier, so a journey stays optimal for as long as
+    it can still be caught: up to its first ride, less the walk to it. A journey that
+    walks all the way only answers its own departure time, and when nothing reaches
+    the destination, nothing does from any later departure either.
+    """
+    if not journeys:
+        return bucket_end
+    journey = journeys[0]
+    first = _first_ride(journey)
+    if first == len(journey.trips):
+        return departure
+    walked = journey.trips[first - 1].arrival_time - departure if first else 0
+    return min(journey.trips[first].departure_time - walked, bucket_end)
+
+
+def answer_entry(entry: CacheEntry, departure: int) -> Optional[List[Journey]]:
+    """The cached answer for a departure time in the entry's bucket, or None if it has none"""
+    if entry.profile is not None:
+        return answer_profile(entry.profile, departure)
+    for answered, last, journeys in entry.answers:
+        if answered <= departure <= last:
+            if not journeys:
+                return []
+            return [_delayed(journeys[0], departure - answered, _first_ride(journeys[0]))]
+    return None
+
+
+class JourneyCache:
+    """
+    LRU/TTL cache of journey answers keyed by (start, end, departure-time bucket, date).
+
+    A miss runs one find_fastest_path query; its answer also holds for every later
+    departure in the bucket that still catches the same first ride. Buckets that keep
+    missing anyway are hot: after profile_after misses the profile of Pareto-optimal
+    journeys over the whole bucket is computed once, so every later departure time in
+    it is answered exactly. The cache clears itself when the planner's network is
+    rebuilt, reloaded or built from a changed feed.
+    """
+
+    def __init__(self, planner: GTFSPlanner, bucket_seconds: int = 300, max_entries: int = 1024,
+                 ttl: Optional[float] = 3600, profile_after: Optional[int] = 20):
+        """
+        Args:
+            planner: The planner answering cache misses
+            bucket_seconds: Width of the departure-time buckets
+            max_entries: Entries kept before the least recently used is evicted
+            ttl: Seconds an entry stays valid; None keeps entries until evicted
+            profile_after: Misses in one bucket after which its profile is computed; None never
+        """
+        self.planner = planner
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.profile_after = profile_after
+        self.entries: 'OrderedDict[Tuple, CacheEntry]' = OrderedDict()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+                         'profiles': 0}
+        self._network = self._network_id()
+
+    def _network_id(self) -> Tuple[str, int]:
+        return self.planner.network_fingerprint, self.planner.network_version
+
+    def key(self, start_stop: str, end_stop: str, start_time: Union[str, int], date=None) -> Tuple:
+        """
+        Cache key of a query: its stops, departure bucket start and service date
+
+        Raises:
+            ValueError: If a stop ID is not in the stops data
+        """
+        self.planner.resolve_stops([start_stop, end_stop])
+        departure = parse_time(start_time)
+        bucket_start = departure - departure % self.bucket_seconds
+        return str(start_stop), str(end_stop), bucket_start, parse_date(date) if date is not None else None
+
+    def lookup(self, start_stop: str, end_stop: str, start_time: Union[str, int], date=None) -> Optional[List[Journey]]:
+        """Answer a query from the cache, or return None on a miss"""
+        if self._network != self._network_id():
+            self.clear()
+            self.counters['invalidations'] += 1
+            self._network = self._network_id()
+
+        key = self.key(start_stop, end_stop, start_time, date)
+        entry = self.entries.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry.created > self.ttl:
+            del self.entries[key]
+            self.counters['expirations'] += 1
+            entry = None
+        journeys = answer_entry(entry, parse_time(start_time)) if entry is not None else None
+        if journeys is None:
+            self.counters['misses'] += 1
+            self.planner.instrumentation.count('cache_misses')
+            return None
+
+        self.entries.move_to_end(key)
+        self.counters['hits'] += 1
+        self.planner.instrumentation.count('cache_hits')
+        return journeys
+
+    def _entry(self, key: Tuple) -> CacheEntry:
+        """The entry of a key, added (evicting the least recently used ones) if missing"""
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = CacheEntry(created=time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+        return entry
+
+    def store_answer(self, key: Tuple, start_time: Union[str, int], journeys: List[Journey]):
+        """Add the find_fastest_path answer of a missed query to its bucket"""
+        entry = self._entry(key)
+        departure = parse_time(start_time)
+        entry.answers.append((departure, last_answered(journeys, departure, key[2] + self.bucket_seconds - 1),
+                              journeys))
+        entry.misses += 1
+
+    def store_profile(self, key: Tuple, profile: BucketProfile):
+        """Answer every later query in a bucket from its profile"""
+        entry = self._entry(key)
+        entry.profile = profile
+        entry.answers = []
+        self.counters['profiles'] += 1
+
+    def is_hot(self, key: Tuple) -> bool:
+        """Whether a bucket without a profile has missed often enough to compute one"""
+        entry = self.entries.get(key)
+        return (entry is not None and entry.profile is None and self.profile_after is not None
+                and entry.misses >= self.profile_after)
+
+    def find_path(self, start_stop: str, end_stop: str, start_time: Union[str, int], date=None) -> List[Journey]:
+        """Cached find_fastest_path: the earliest-arrival journey, or an empty list"""
+        journeys = self.lookup(start_stop, end_stop, start_time, date)
+        if journeys is None:
+            journeys = self.planner.find_fastest_path(start_stop, end_stop, start_time, date)
+            key = self.key(start_stop, end_stop, start_time, date)
+            self.store_answer(key, start_time, journeys)
+            if self.is_hot(key):
+                self.store_profile(key, build_profile(self.planner, key[0], key[1], key[2],
+                                                      self.bucket_seconds, date))
+        return journeys
+
+    def clear(self):
+        """Drop every entry"""
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters and the current number of entries"""
+        return dict(self.counters, entries=len(self.entries))
@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from gtfs_loader import read_routes, read_stop_times, read_stops, read_trips
+
 def create_stops_file(gtfs_path, output_file):
     """
     Create a text file that stores the stops each bus line passes in its trips.
@@ -12,10 +15,10 @@ def create_stops_file(gtfs_path, output_file):
         None
     """
     # Load GTFS files
-    routes = pd.read_csv(f"{gtfs_path}/routes.txt")
-    trips = pd.read_csv(f"{gtfs_path}/trips.txt")
-    stop_times = pd.read_csv(f"{gtfs_path}/stop_times.txt")
-    stops = pd.read_csv(f"{gtfs_path}/stops.txt")
+    routes = read_routes(gtfs_path, columns=["route_id", "route_short_name"])
+    trips = read_trips(gtfs_path, columns=["route_id", "trip_id"])
+    stop_times = read_stop_times(gtfs_path, columns=["trip_id", "stop_id", "stop_sequence"])
+    stops = read_stops(gtfs_path, columns=["stop_id", "stop_name", "stop_lat", "stop_lon"], coord_dtype=np.float64)
 
     # Merge data to get a complete picture
     trips_stop_times = pd.merge(trips, stop_times, on="trip_id")
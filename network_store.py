@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 3
+MANIFEST = 'manifest.json'
+
+
+def save_arrays(directory: str, arrays: Dict[str, np.ndarray]):
+    """
+    Write each array to <directory>/<name>.npy.
+
+    Files go to a temporary sibling directory that is renamed into place once the
+    manifest is written, so a half-written cache is never picked up.
+    """
+    tmp_dir = f"{directory}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump({'version': FORMAT_VERSION, 'arrays': sorted(arrays)}, f)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+
+
+def load_arrays(directory: str, mmap: bool = True) -> Optional[Dict[str, np.ndarray]]:
+    """Open every array listed in the directory's manifest, memory-mapped by default"""
+    manifest_path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != FORMAT_VERSION:
+        return None
+
+    mmap_mode = 'r' if mmap else None
+    return {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in manifest['arrays']
+    }
+
+
+def feed_fingerprint(gtfs_path: str, files: List[str], params: Dict, content_hash: bool = False) -> str:
+    """
+    Fingerprint the GTFS input files together with the network build parameters.
+
+    By default each file contributes its size and modification time, which is cheap
+    and catches every feed refresh; with content_hash the file bytes are hashed
+    instead, so re-downloading an identical feed keeps the cache.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps({'version': FORMAT_VERSION, 'params': params}, sort_keys=True).encode())
+
+    for name in files:
+        path = os.path.join(gtfs_path, name)
+        digest.update(name.encode())
+        if not os.path.exists(path):
+            digest.update(b'missing')
+            continue
+        if content_hash:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        else:
+            stat = os.stat(path)
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    return digest.hexdigest()[:16]
+
+
+def touch_cache(directory: str):
+    """Mark a cache variant as just used"""
+    now = time.time()
+    os.utime(os.path.join(directory, MANIFEST), (now, now))
+
+
+def evict_caches(cache_root: str, keep: int):
+    """Delete all but the `keep` most recently used cache variants under cache_root"""
+    if not os.path.isdir(cache_root):
+        return
+
+    variants = []
+    for name in os.listdir(cache_root):
+        manifest_path = os.path.join(cache_root, name, MANIFEST)
+        if os.path.exists(manifest_path):
+            variants.append((os.path.getmtime(manifest_path), name))
+
+    variants.sort(reverse=True)
+    for _, name in variants[keep:]:
+        print(f"Evicting cached network {name}")
+        shutil.rmtree(os.path.join(cache_root, name), ignore_errors=True)
+
+
+def to_csr(rows: np.ndarray, cols: np.ndarray, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build CSR (indptr, indices) from (row, col) pairs.
+
+    Columns are sorted within each row so a single neighbor can be found by
+    binary search.
+    """
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32)
+
+
+def build_network_arrays(stop_ids: List[str], route_ids: List[str], edge_from: np.ndarray, edge_to: np.ndarray,
+                         edge_route: np.ndarray, member_stop: np.ndarray, member_route: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Build the CSR network tables from flat, possibly duplicated, integer records.
+
+    Args:
+        stop_ids, route_ids: ID tables; records refer to stops and routes by position
+        edge_from, edge_to, edge_route: One record per (directed edge, serving route)
+        member_stop, member_route: One record per (stop, route serving it)
+    Returns:
+        Dict of arrays: adjacency (adj_indptr/adj_indices), the routes of each edge
+        (edge_route_ptr/edge_routes) and both directions of stop/route membership
+    """
+    n_stops, n_routes = len(stop_ids), len(route_ids)
+
+    # Unique (from, to, route) records, ordered by edge and then route
+    records = np.unique((edge_from.astype(np.int64) * n_stops + edge_to) * n_routes + edge_route)
+    pairs, routes = np.divmod(records, n_routes)
+    edge_keys, edge_starts = np.unique(pairs, return_index=True)
+    rows, cols = np.divmod(edge_keys, n_stops)
+
+    adj_indptr, adj_indices = to_csr(rows, cols, n_stops)
+    edge_route_ptr = np.append(edge_starts, len(records)).astype(np.int64)
+
+    # Unique (stop, route) memberships
+    members = np.unique(member_stop.astype(np.int64) * n_routes + member_route)
+    member_stops, member_routes = np.divmod(members, n_routes)
+
+    arrays = {
+        'stop_ids': np.array(stop_ids, dtype=str),
+        'route_ids': np.array(route_ids, dtype=str),
+        'adj_indptr': adj_indptr,
+        'adj_indices': adj_indices,
+        'edge_route_ptr': edge_route_ptr,
+        'edge_routes': routes.astype(np.int32),
+    }
+    arrays['stop_routes_ptr'], arrays['stop_routes_idx'] = to_csr(member_stops, member_routes, n_stops)
+    arrays['route_stops_ptr'], arrays['route_stops_idx'] = to_csr(member_routes, member_stops, n_routes)
+    return arrays
+
+
+def shortest_paths(indptr: np.ndarray, indices: np.ndarray, source: int, target: int,
+                   max_paths: Optional[int] = None) -> List[List[int]]:
+    """
+    Shortest (fewest-hop) paths between two nodes of a CSR graph.
+
+    Runs a breadth-first search from source that stops at target's level, then
+    enumerates the paths through the BFS predecessor lists. Their number grows
+    exponentially with the length of the path in a dense network, so the
+    enumeration stops after max_paths of them.
+    """
+    if source == target:
+        return [[source]]
+
+    depth = {source: 0}
+    predecessors = {source: []}
+    frontier = [source]
+    while frontier and target not in depth:
+        next_frontier = []
+        level = depth[frontier[0]] + 1
+        for node in frontier:
+            for neighbor in indices[indptr[node]:indptr[node + 1]].tolist():
+                if neighbor not in depth:
+                    depth[neighbor] = level
+                    predecessors[neighbor] = [node]
+                    next_frontier.append(neighbor)
+                elif depth[neighbor] == level:
+                    predecessors[neighbor].append(node)
+        frontier = next_frontier
+
+    if target not in depth:
+        return []
+
+    paths = []
+    stack = [(target, [target])]
+    while stack:
+        node, suffix = stack.pop()
+        if node == source:
+            paths.append(suffix[::-1])
+            if max_paths is not None and len(paths) >= max_paths:
+                break
+            continue
+        for predecessor in predecessors[node]:
+            stack.append((predecessor, suffix + [predecessor]))
+    return paths
+
+
+class EdgeRoutesView(Mapping):
+    """Read-only view of one stop's neighbors: neighbor stop_id -> frozenset of route_ids"""
+
+    def __init__(self, network: 'DirectConnectionsView', position: int):
+        self._network = network
+        self._start = int(network.adj_indptr[position])
+        self._end = int(network.adj_indptr[position + 1])
+
+    def _edge(self, stop_id: str) -> int:
+        position = self._network.stop_position.get(stop_id)
+        if position is None:
+            raise KeyError(stop_id)
+        row = self._network.adj_indices[self._start:self._end]
+        i = int(np.searchsorted(row, position))
+        if i >= len(row) or row[i] != position:
+            raise KeyError(stop_id)
+        return self._start + i
+
+    def __getitem__(self, stop_id: str) -> frozenset:
+        edge = self._edge(stop_id)
+        start, end = self._network.edge_route_ptr[edge], self._network.edge_route_ptr[edge + 1]
+        route_ids = self._network.route_ids
+        return frozenset(route_ids[r] for r in self._network.edge_routes[start:end].tolist())
+
+    def __iter__(self):
+        stop_ids = self._network.stop_ids
+        return (stop_ids[i] for i in self._network.adj_indices[self._start:self._end].tolist())
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+
+class DirectConnectionsView(Mapping):
+    """Read-only, zero-copy replacement for the direct_connections dict of dicts"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], stop_ids: List[str], route_ids: List[str],
+                 stop_position: Dict[str, int]):
+        self.adj_indptr = arrays['adj_indptr']
+        self.adj_indices = arrays['adj_indices']
+        self.edge_route_ptr = arrays['edge_route_ptr']
+        self.edge_routes = arrays['edge_routes']
+        self.stop_ids = stop_ids
+        self.route_ids = route_ids
+        self.stop_position = stop_position
+        self._degree = np.diff(self.adj_indptr)
+
+    def __getitem__(self, stop_id: str) -> EdgeRoutesView:
+        position = self.stop_position.get(stop_id)
+        if position is None or self._degree[position] == 0:
+            raise KeyError(stop_id)
+        return EdgeRoutesView(self, position)
+
+    def __iter__(self):
+        return (self.stop_ids[i] for i in np.flatnonzero(self._degree).tolist())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._degree))
+
+    def edge_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All directed (from, to) stop positions, in CSR order"""
+        rows = np.repeat(np.arange(len(self._degree), dtype=np.int32), self._degree)
+        return rows, self.adj_indices
+
+
+class MembershipView(Mapping):
+    """Read-only view of a CSR membership table: key id -> frozenset of member ids"""
+
+    def __init__(self, ptr: np.ndarray, idx: np.ndarray, key_ids: List[str], key_position: Dict[str, int],
+                 member_ids: List[str]):
+        self._ptr = ptr
+        self._idx = idx
+        self._key_ids = key_ids
+        self._key_position = key_position
+        self._member_ids = member_ids
+        self._counts = np.diff(ptr)
+
+    def __getitem__(self, key: str) -> frozenset:
+        position = self._key_position.get(key)
+        if position is None or self._counts[position] == 0:
+            raise KeyError(key)
+        members = self._idx[self._ptr[position]:self._ptr[position + 1]].tolist()
+        return frozenset(self._member_ids[m] for m in members)
+
+    def __iter__(self):
+        return (self._key_ids[i] for i in np.flatnonzero(self._counts).tolist())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._counts))
+
+
+class TimetableIndex(Mapping):
+    """
+    (from_stop, to_stop, route_id) -> (start, end) span of the sorted timetable arrays.
+
+    Keys are packed into a single sorted int64 array so lookups are a binary search
+    and the index can be memory-mapped straight from the cache.
+    """
+
+    def __init__(self, keys: np.ndarray, starts: np.ndarray, ends: np.ndarray, stop_ids: List[str],
+                 route_ids: List[str], stop_position: Dict[str, int], route_position: Dict[str, int]):
+        self._keys = keys
+        self._starts = starts
+        self._ends = ends
+        self._stop_ids = stop_ids
+        self._route_ids = route_ids
+        self._stop_position = stop_position
+        self._route_position = route_position
+
+    @staticmethod
+    def pack(from_stop, to_stop, route, n_stops: int, n_routes: int):
+        """Combine stop and route positions into one sortable int64 key"""
+        return (np.asarray(from_stop, dtype=np.int64) * n_stops + to_stop) * n_routes + route
+
+    def __getitem__(self, key: Tuple[str, str, str]) -> Tuple[int, int]:
+        from_stop, to_stop, route_id = key
+        try:
+            packed = self.pack(self._stop_position[from_stop], self._stop_position[to_stop],
+                               self._route_position[route_id], len(self._stop_ids), len(self._route_ids))
+        except KeyError:
+            raise KeyError(key)
+        i = int(np.searchsorted(self._keys, packed))
+        if i >= len(self._keys) or self._keys[i] != packed:
+            raise KeyError(key)
+        return int(self._starts[i]), int(self._ends[i])
+
+    def __iter__(self):
+        n_stops, n_routes = len(self._stop_ids), len(self._route_ids)
+        for packed in self._keys.tolist():
+            pair, route = divmod(packed, n_routes)
+            from_stop, to_stop = divmod(pair, n_stops)
+            yield self._stop_ids[from_stop], self._stop_ids[to_stop], self._route_ids[route]
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -4,6 +4,8 @@ import matplotlib.pyplot as plt
 from shapely.geometry import LineString
 import contextily as ctx
 
+from gtfs_loader import read_routes, read_stop_times, read_stops, read_trips
+
 def plot_line_with_correct_edges(line_short_name, gtfs_path):
     """
     Plot the line on an OpenStreetMap basemap using station coordinates and order.
@@ -17,10 +19,10 @@ def plot_line_with_correct_edges(line_short_name, gtfs_path):
         None
     """
     # Load GTFS files
-    routes = pd.read_csv(f"{gtfs_path}/routes.txt")
-    trips = pd.read_csv(f"{gtfs_path}/trips.txt")
-    stop_times = pd.read_csv(f"{gtfs_path}/stop_times.txt")
-    stops = pd.read_csv(f"{gtfs_path}/stops.txt")
+    routes = read_routes(gtfs_path, columns=['route_id', 'route_short_name'])
+    trips = read_trips(gtfs_path, columns=['route_id', 'trip_id'])
+    stop_times = read_stop_times(gtfs_path, columns=['trip_id', 'stop_id', 'stop_sequence'])
+    stops = read_stops(gtfs_path, columns=['stop_id', 'stop_name', 'stop_lat', 'stop_lon'])
 
     # Step 1: Find the route_id(s) for the specified line
     line_routes = routes[routes['route_short_name'] == line_short_name]
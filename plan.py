@@ -1,14 +1,24 @@
 
 import pandas as pd
 from dataclasses import dataclass
-from typing import List, Dict, Set, Optional, Tuple
-from collections import defaultdict
-import networkx as nx
-import pickle
+from typing import Callable, List, Dict, Set, Optional, Tuple, Union
+import heapq
+import bisect
+import io
 import os
 from datetime import datetime
 import json
 from math import radians, sin, cos, sqrt, atan2
+import numpy as np
+
+from gtfs_loader import GTFS_DTYPES, iter_table, read_optional, read_routes, read_stop_times, read_stops, read_trips
+from instrumentation import Instrumentation
+from service_calendar import SECONDS_PER_DAY, ServiceCalendar, parse_date, previous_day
+from network_store import (
+    DirectConnectionsView, MembershipView, TimetableIndex, build_network_arrays, evict_caches, feed_fingerprint,
+    load_arrays, save_arrays, shortest_paths, to_csr, touch_cache
+)
+from raptor import NO_LABEL, ORIGIN, UNREACHED, WALK, RoutePatterns, raptor
 
 @dataclass
 class Stop:
@@ -20,210 +30,1589 @@ class Stop:
 
 @dataclass
 class Trip:
-    """Represents a trip segment"""
+    """Represents a trip segment; times are seconds since the start of the service day"""
     route_id: str
     from_stop: str
     to_stop: str
-    departure_time: str
-    arrival_time: str
+    departure_time: int
+    arrival_time: int
     is_walking: bool = False
 
 @dataclass
 class Journey:
     """Represents a complete journey with multiple trips"""
     trips: List[Trip]
-    total_time: int
+    total_time: int  # in seconds
     total_walking: float = 0  # in meters
+    transfers: int = 0  # changes between transit vehicles
+
+
+EARTH_RADIUS = 6371000  # meters
+WALKING_SPEED = 5000  # meters per hour
+SCAN_CHUNK = 65536  # connections converted to Python lists at a time while scanning
+MAX_PATHS = 256  # stop sequences find_path fits trips to, of the many equally short ones
+
+# Feed files the cached network is derived from
+GTFS_CACHE_INPUTS = ['stops.txt', 'routes.txt', 'trips.txt', 'stop_times.txt']
+
+
+def parse_time(time_value: Union[str, int]) -> int:
+    """Convert a GTFS time (HH:MM:SS, hours may exceed 24) to seconds; ints pass through"""
+    if isinstance(time_value, (int, np.integer)):
+        return int(time_value)
+    h, m, s = map(int, time_value.split(':'))
+    return h * 3600 + m * 60 + s
+
+
+def format_time(seconds: int) -> str:
+    """Convert seconds back to GTFS HH:MM:SS format"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized Haversine distance in meters between coordinate arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS * c
+
+
+def find_nearby_pairs(lats: np.ndarray, lons: np.ndarray, max_distance: float,
+                      batch_size: int = 4096) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find all pairs of points within max_distance meters of each other.
+
+    Points are bucketed into a grid whose cells are at least max_distance wide, so
+    every pair within range lies in the same or an adjacent cell. Candidate pairs
+    are generated and measured in batches with vectorized Haversine.
+
+    Returns:
+        (i, j, distance) arrays with i < j
+    """
+    n = len(lats)
+    if n < 2:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+
+    # Cell size in degrees; longitude cells widen towards the poles
+    lat_step = np.degrees(max_distance / EARTH_RADIUS)
+    lon_step = lat_step / max(np.cos(np.radians(np.abs(lats).max())), 1e-6)
+    cell_y = np.floor(lats / lat_step).astype(np.int64)
+    cell_x = np.floor(lons / lon_step).astype(np.int64)
+    cell_x -= cell_x.min()
+    cell_y -= cell_y.min()
+    width = int(cell_x.max()) + 3
+    cells = (cell_y + 1) * width + (cell_x + 1)
+
+    order = np.argsort(cells, kind='stable')
+    sorted_cells = cells[order]
+    unique_cells, cell_starts, cell_counts = np.unique(sorted_cells, return_index=True, return_counts=True)
+
+    # Each unordered pair of cells is visited once: the cell itself plus four neighbors
+    offsets = [0, 1, width - 1, width, width + 1]
+    pairs_i, pairs_j, pairs_d = [], [], []
+    for batch in range(0, n, batch_size):
+        members = np.arange(batch, min(batch + batch_size, n))
+        own_cells = sorted_cells[members]
+        for offset in offsets:
+            target = own_cells + offset
+            k = np.searchsorted(unique_cells, target)
+            k = np.minimum(k, len(unique_cells) - 1)
+            found = unique_cells[k] == target
+            starts = np.where(found, cell_starts[k], 0)
+            counts = np.where(found, cell_counts[k], 0)
+            if offset == 0:
+                # Within a cell only pair each point with the ones after it
+                counts = starts + counts - members - 1
+                starts = members + 1
+
+            repeats = np.repeat(members, counts)
+            if len(repeats) == 0:
+                continue
+            within = np.arange(len(repeats)) - np.repeat(np.cumsum(counts) - counts, counts)
+            partners = np.repeat(starts, counts) + within
+
+            a, b = order[repeats], order[partners]
+            distances = _haversine(lats[a], lons[a], lats[b], lons[b])
+            close = distances <= max_distance
+            pairs_i.append(np.minimum(a, b)[close])
+            pairs_j.append(np.maximum(a, b)[close])
+            pairs_d.append(distances[close])
+
+    if not pairs_i:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    return np.concatenate(pairs_i), np.concatenate(pairs_j), np.concatenate(pairs_d)
+
+
+def _lookup_positions(lookup: pd.Index, positions: np.ndarray, values) -> np.ndarray:
+    """Map values to positions through a unique Index; unknown values map to -1"""
+    found = lookup.get_indexer(values)
+    return np.where(found >= 0, positions[found], -1).astype(np.int32)
+
+
+def _concat(parts, dtype=np.int64) -> np.ndarray:
+    """Concatenate array parts, allowing for none at all"""
+    parts = list(parts)
+    return np.concatenate(parts) if parts else np.empty(0, dtype)
+
+
+def _interpolate_blank_times(trip_ids: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                             arrivals: np.ndarray, departures: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fill the blank times of non-timepoint stops, for rows sorted by trip and stop_sequence.
+
+    A stop with only one of its times takes it for both. A stop with neither is timed
+    between the trip's surrounding timepoints, in proportion to the straight-line
+    distance travelled (or the stops passed, where the stops have no coordinates).
+    Stops before a trip's first or after its last timepoint stay MISSING_TIME.
+    """
+    arrivals = np.where(arrivals < 0, departures, arrivals)
+    departures = np.where(departures < 0, arrivals, departures)
+    timed = arrivals >= 0
+    if timed.all():
+        return arrivals, departures
+
+    n = len(arrivals)
+    rows = np.arange(n)
+    previous = np.maximum.accumulate(np.where(timed, rows, -1))
+    following = np.minimum.accumulate(np.where(timed, rows, n)[::-1])[::-1]
+    step = np.zeros(n)
+    step[1:] = np.nan_to_num(_haversine(lats[:-1], lons[:-1], lats[1:], lons[1:]))
+    travelled = np.cumsum(step)
+
+    blank = np.flatnonzero(~timed & (previous >= 0) & (following < n))
+    before, after = previous[blank], following[blank]
+    same_trip = (trip_ids[before] == trip_ids[blank]) & (trip_ids[after] == trip_ids[blank])
+    blank, before, after = blank[same_trip], before[same_trip], after[same_trip]
+    span = travelled[after] - travelled[before]
+    fraction = np.where(span > 0, (travelled[blank] - travelled[before]) / np.where(span > 0, span, 1),
+                        (blank - before) / (after - before))
+    times = np.round(departures[before] + fraction * (arrivals[after] - departures[before]))
+    arrivals[blank] = departures[blank] = times.astype(arrivals.dtype)
+    return arrivals, departures
+
+
+def _encode_stop_times(chunk: pd.DataFrame, context: tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduce stop_times rows to int (trip, stop_sequence, stop) columns.
+
+    Rows of trips that are unknown or whose route has no catalog number are dropped;
+    unknown stops are kept as -1 so they still break the trip's chain of edges.
+    """
+    trip_index, trip_catalog, stop_lookup, stop_lookup_positions, _, _ = context
+    trips = trip_index.get_indexer(chunk['trip_id'])
+    keep = trips >= 0
+    keep[keep] = trip_catalog[trips[keep]] >= 0
+    return (trips[keep].astype(np.int32),
+            chunk['stop_sequence'].to_numpy(np.int64)[keep],
+            _lookup_positions(stop_lookup, stop_lookup_positions, chunk['stop_id'])[keep])
+
+
+def _trip_edge_keys(trips: np.ndarray, sequences: np.ndarray, stops: np.ndarray,
+                    context: tuple) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unique edge and membership keys of a set of complete trips.
+
+    Consecutive stops of a trip form an edge, deduplicated per route catalog:
+    edges are packed as (from * n_stops + to) * n_catalogs + catalog and
+    memberships as stop * n_catalogs + catalog.
+    """
+    _, trip_catalog, _, _, n_stops, n_catalogs = context
+    order = np.lexsort((sequences, trips))
+    trips, stops = trips[order], stops[order]
+    catalogs = trip_catalog[trips]
+
+    hop = (trips[1:] == trips[:-1]) & (stops[:-1] >= 0) & (stops[1:] >= 0)
+    edges = np.unique((stops[:-1][hop].astype(np.int64) * n_stops + stops[1:][hop]) * n_catalogs
+                      + catalogs[:-1][hop])
+
+    known = stops >= 0
+    members = np.unique(stops[known].astype(np.int64) * n_catalogs + catalogs[known])
+    return edges, members
+
+
+def _line_aligned_ranges(path: str, n_ranges: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """Split a CSV file into byte ranges that start and end on line boundaries"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        step = max((size - data_start) // n_ranges, 1)
+        for offset in range(data_start + step, size, step):
+            if offset <= bounds[-1]:
+                continue
+            f.seek(offset)
+            f.readline()
+            if f.tell() < size:
+                bounds.append(f.tell())
+        bounds.append(size)
+    return header, [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+_build_context = None
+
+
+def _init_build_worker(context: tuple):
+    """Process pool initializer: receive the lookup tables once per worker"""
+    global _build_context
+    _build_context = context
+
+
+def _reduce_byte_range(path: str, header: bytes, start: int, end: int):
+    """
+    Parse one byte range of stop_times.txt and reduce its trips to edge and
+    membership keys.
+
+    The first and last trip of the range may continue in the neighbouring ranges,
+    so their rows are handed back unreduced together with the trips that were
+    reduced here, which lets the caller check that those were complete.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    columns = ['trip_id', 'stop_id', 'stop_sequence']
+    chunk = pd.read_csv(io.BytesIO(header + data), usecols=columns,
+                        dtype={column: GTFS_DTYPES['stop_times.txt'][column] for column in columns})
+    trips, sequences, stops = _encode_stop_times(chunk, _build_context)
+    boundary = (trips == trips[:1]) | (trips == trips[-1:])
+    inner = ~boundary
+    edges, members = _trip_edge_keys(trips[inner], sequences[inner], stops[inner], _build_context)
+    return (len(chunk), edges, members, np.unique(trips[inner]),
+            (trips[boundary], sequences[boundary], stops[boundary]))
+
+
+def _convex_hull(lats: np.ndarray, lons: np.ndarray) -> List[Tuple[float, float]]:
+    """Convex hull of points as a closed (lat, lon) ring, by Andrew's monotone chain"""
+    points = sorted(set(zip(lons.tolist(), lats.tolist())))
+    if len(points) < 3:
+        return [(lat, lon) for lon, lat in points]
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    def half(ordered):
+        chain = []
+        for point in ordered:
+            while len(chain) >= 2 and cross(chain[-2], chain[-1], point) <= 0:
+                chain.pop()
+            chain.append(point)
+        return chain[:-1]
+
+    ring = half(points) + half(reversed(points))
+    return [(lat, lon) for lon, lat in ring + ring[:1]]
+
+
+def _padded_neighbors(src: np.ndarray, dst: np.ndarray, secs: np.ndarray, n_stops: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (to, secs) tables with one row per stop listing its edges, padded with
+    zero-second edges to the stop itself so they never improve anything
+    """
+    order = np.lexsort((dst, src))
+    src, dst, secs = src[order], dst[order], secs[order]
+    degrees = np.bincount(src, minlength=n_stops)
+    slots = np.arange(len(src)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+    width = max(int(degrees.max(initial=0)), 1)
+    to = np.repeat(np.arange(n_stops, dtype=np.int64)[:, None], width, axis=1)
+    seconds = np.zeros(to.shape, dtype=np.int64)
+    to[src, slots] = dst
+    seconds[src, slots] = secs
+    return to, seconds
+
+
+def _profile_insert(profile: Tuple[list, list, list], dep: int, arr: int, action: int) -> bool:
+    """
+    Add a (departure, arrival) option to a stop's Pareto profile.
+
+    The profile holds parallel lists sorted by departure, and arrivals rise with
+    departures. Returns False, leaving the profile unchanged, if an option departing
+    no earlier already arrives no later.
+    """
+    deps, arrs, actions = profile
+    i = bisect.bisect_left(deps, dep)
+    if i < len(deps) and arrs[i] <= arr:
+        return False
+    j = i
+    while j > 0 and arrs[j - 1] >= arr:
+        j -= 1
+    end = i + 1 if i < len(deps) and deps[i] == dep else i
+    deps[j:end] = [dep]
+    arrs[j:end] = [arr]
+    actions[j:end] = [action]
+    return True
+
+
+def _bag_dominated(bag: list, arr: int, boardings: int, walking) -> bool:
+    """Whether a label in a Pareto bag is at least as good on all three criteria"""
+    for other in bag:
+        if other[0] <= arr and other[1] <= boardings and other[2] <= walking:
+            return True
+    return False
+
+
+def _bag_insert(bag: list, label: tuple) -> bool:
+    """
+    Add an (arrival, boardings, walking, ...) label to a Pareto bag.
+
+    Returns False, leaving the bag unchanged, if a label already in the bag is at
+    least as good on all three criteria; otherwise labels the new one dominates
+    are dropped.
+    """
+    arr, boardings, walking = label[:3]
+    if _bag_dominated(bag, arr, boardings, walking):
+        return False
+    bag[:] = [other for other in bag
+              if not (arr <= other[0] and boardings <= other[1] and walking <= other[2])]
+    bag.append(label)
+    return True
+
+
+# Set in the parent right before a fork-based pool starts, so workers share the
+# planner's arrays copy-on-write instead of receiving a pickled copy
+_matrix_planner = None
+
+
+def _travel_time_rows(sources: np.ndarray, departure: int, targets: np.ndarray, date) -> np.ndarray:
+    """Travel-time matrix rows for a batch of origins, computed with the inherited planner"""
+    return _matrix_planner._travel_time_rows(sources, departure, targets, date)
+
+
 class GTFSPlanner:
-    def _normalize_time(self, time_str: str) -> str:
-        """Normalize GTFS time format to handle times after midnight"""
-        try:
-            h, m, s = map(int, time_str.split(':'))
-            if h >= 24:  # Convert times after midnight back to standard format
-                h = h - 24
-            return f"{h:02d}:{m:02d}:{s:02d}"
-        except ValueError as e:
-            print(f"Error normalizing time {time_str}: {e}")
-            return time_str
-    def _time_diff(self, time1: str, time2: str) -> int:
+    def _find_next_trip(self, from_stop: str, to_stop: str, current_time: int, routes: set,
+                        date=None) -> Optional[Trip]:
+        """
+        Find the next available trip between two stops after a given time (in seconds).
+
+        With a date only trips running on that date are considered, plus trips of the
+        previous day that are still running past midnight.
+        """
+        routes = {str(route) for route in routes}
+
+        best_route = None
+        best_idx = None
+        best_shift = 0
+        scanned = 0
+        for route_id in routes:
+            span = self.timetable_index.get((from_stop, to_stop, route_id))
+            if span is None:
+                continue
+            start, end = span
+
+            if date is None:
+                # Departures are sorted within the span, so the first usable one is a binary search away
+                i = start + int(np.searchsorted(self.timetable_dep[start:end], current_time, side='left'))
+                if i >= end:
+                    continue
+
+                # Earliest arrival among all departures at or after current_time
+                j = int(self.timetable_best[i])
+                candidates = [(j, 0)]
+            else:
+                candidates = self._next_dated_hops(start, end, current_time, date)
+
+            scanned += len(candidates)
+            for j, shift in candidates:
+                if best_idx is None or self.timetable_arr[j] - shift < self.timetable_arr[best_idx] - best_shift:
+                    best_route = route_id
+                    best_idx = j
+                    best_shift = shift
+
+        self.instrumentation.count('trips_scanned', scanned)
+        if best_idx is None:
+            return None
+
+        best_trip = Trip(
+            route_id=best_route,
+            from_stop=from_stop,
+            to_stop=to_stop,
+            departure_time=int(self.timetable_dep[best_idx]) - best_shift,
+            arrival_time=int(self.timetable_arr[best_idx]) - best_shift
+        )
+        return best_trip
+
+    def _next_dated_hops(self, start: int, end: int, current_time: int, date) -> List[Tuple[int, int]]:
+        """
+        Earliest-arriving hop of one timetable span that runs on date, as (hop, time shift).
+
+        Hops of the date's trips are taken as is; hops of the previous day's trips
+        departing after midnight are shifted back by a day.
+        """
+        candidates = []
+        for day, shift in ((date, 0), (previous_day(date), SECONDS_PER_DAY)):
+            i = start + int(np.searchsorted(self.timetable_dep[start:end], current_time + shift, side='left'))
+            running = np.flatnonzero(self.active_trips(day)[self.timetable_trip[i:end]])
+            if len(running):
+                candidates.append((i + int(running[np.argmin(self.timetable_arr[i:end][running])]), shift))
+        return candidates
+
+    def build_timetable(self):
+        """
+        Index every scheduled hop between consecutive stops of a trip.
+
+        Hops are grouped by (from_stop, to_stop, route_id) and sorted by departure,
+        so the next departure after a given time is a binary search. For every hop
+        `timetable_best` holds the position of the earliest arrival among it and all
+        later departures in the same group.
+        """
+        print("Indexing timetable...")
+        stop_times = read_stop_times(
+            self.gtfs_path, columns=['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence'])
+        stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'], kind='stable')
+
+        trip_ids = stop_times['trip_id'].to_numpy()
+        stop_idx = self._stop_positions(stop_times['stop_id'].to_numpy())
+        known_stop = stop_idx >= 0
+        arrivals, departures = _interpolate_blank_times(
+            trip_ids,
+            np.where(known_stop, self.stop_lats[stop_idx], np.nan),
+            np.where(known_stop, self.stop_lons[stop_idx], np.nan),
+            stop_times['arrival_time'].to_numpy(np.int32),
+            stop_times['departure_time'].to_numpy(np.int32))
+
+        # Consecutive rows of the same trip form a hop, paired before untimed rows are
+        # dropped so a stop without times never joins its neighbours into one hop; stops
+        # and routes are interned to their positions in stop_ids / route_ids, and hops
+        # naming unknown ones are dropped
+        same_trip = trip_ids[1:] == trip_ids[:-1]
+        trip_route_lookup = dict(zip(
+            self.trips['trip_id'].astype(str),
+            self.trips['route_id'].astype(str)
+        ))
+        hop_trips = trip_ids[:-1][same_trip]
+        from_idx = stop_idx[:-1][same_trip]
+        to_idx = stop_idx[1:][same_trip]
+        route_idx = pd.Index(self.route_ids).get_indexer(pd.Series(hop_trips).map(trip_route_lookup))
+        departures = departures[:-1][same_trip]
+        arrivals = arrivals[1:][same_trip]
+        known = (from_idx >= 0) & (to_idx >= 0) & (route_idx >= 0) & (departures >= 0) & (arrivals >= 0)
+
+        hops = pd.DataFrame({
+            'from_stop': from_idx[known],
+            'to_stop': to_idx[known],
+            'route': route_idx[known],
+            'trip_id': hop_trips[known],
+            'departure': departures[known],
+            'arrival': arrivals[known],
+        })
+        self._build_connections(hops)
+
+        hops.sort_values(['from_stop', 'to_stop', 'route', 'departure'], inplace=True, kind='stable')
+        keys = TimetableIndex.pack(hops['from_stop'], hops['to_stop'], hops['route'],
+                                   len(self.stop_ids), len(self.route_ids)).to_numpy()
+        self.timetable_dep = hops['departure'].to_numpy(np.int32)
+        self.timetable_arr = hops['arrival'].to_numpy(np.int32)
+        self.timetable_trip = hops['trip'].to_numpy(np.int32)
+
+        # Group boundaries: a new group starts wherever the key changes
+        n = len(hops)
+        key_change = np.ones(n, dtype=bool)
+        key_change[1:] = keys[1:] != keys[:-1]
+        starts = np.flatnonzero(key_change)
+        self.timetable_keys = keys[starts]
+        self.timetable_starts = starts.astype(np.int64)
+        self.timetable_ends = np.append(starts[1:], n).astype(np.int64)
+
+        # Suffix argmin of arrival within each group; packing (arrival, position) into one
+        # int64 makes the running minimum carry the position along with it
+        packed = (self.timetable_arr.astype(np.int64) << 32) | np.arange(n, dtype=np.int64)
+        group_ids = np.cumsum(key_change) - 1
+        suffix_min = pd.Series(packed[::-1]).groupby(group_ids[::-1]).cummin().to_numpy()[::-1]
+        self.timetable_best = (suffix_min & 0xFFFFFFFF).astype(np.int32)
+
+        print(f"✓ Indexed {n:,} hops in {len(starts):,} stop/route groups")
+
+    def _build_connections(self, hops: pd.DataFrame):
+        """
+        Build the departure-sorted connection arrays scanned by the routing engine.
+
+        Trips are numbered in order of first appearance; hops gets a 'trip' column
+        with these numbers, and each trip's route and service are kept alongside.
+        """
+        trip_codes, trip_names = pd.factorize(hops['trip_id'])
+        hops['trip'] = trip_codes
+        first_hop = np.unique(trip_codes, return_index=True)[1]
+        self.connection_trip_routes = np.asarray(self.route_ids)[hops['route'].to_numpy()[first_hop]].tolist()
+
+        trip_service_lookup = dict(zip(
+            self.trips['trip_id'].astype(str),
+            self.trips['service_id'].astype(str)
+        ))
+        self.service_ids = self.trips['service_id'].astype(str).unique().tolist()
+        self.connection_trip_services = pd.Index(self.service_ids).get_indexer(
+            pd.Series(trip_names).map(trip_service_lookup)).astype(np.int32)
+
+        departures = hops['departure'].to_numpy(np.int32)
+        arrivals = hops['arrival'].to_numpy(np.int32)
+        order = np.lexsort((arrivals, departures))
+        self.conn_dep = departures[order]
+        self.conn_arr = arrivals[order]
+        self.conn_from = hops['from_stop'].to_numpy(np.int32)[order]
+        self.conn_to = hops['to_stop'].to_numpy(np.int32)[order]
+        self.conn_trip = trip_codes[order].astype(np.int32)
+
+    def build_footpaths(self):
+        """
+        Collect walking connections as per-stop lists of (neighbor position, walking seconds),
+        with the matching distances in meters in footpath_meters, and as the padded
+        (to, secs) neighbor tables footpath_table used by RAPTOR
+        """
+        lats, lons = self.stop_lats, self.stop_lons
+
+        # Edges whose route set contains the 'walking' pseudo-route
+        connections = self.direct_connections
+        walking_entries = np.flatnonzero(connections.edge_routes == self.route_position['walking'])
+        edges = np.searchsorted(connections.edge_route_ptr, walking_entries, side='right') - 1
+        rows, cols = connections.edge_pairs()
+        src, dst = rows[edges], cols[edges]
+
+        distances = _haversine(lats[src], lons[src], lats[dst], lons[dst])
+        seconds = (distances * 3600 / WALKING_SPEED).astype(np.int32)
+        self.footpaths = [[] for _ in range(len(self.stop_ids))]
+        self.footpath_meters = [[] for _ in range(len(self.stop_ids))]
+        for a, b, secs, meters in zip(src.tolist(), dst.tolist(), seconds.tolist(), distances.tolist()):
+            self.footpaths[a].append((b, secs))
+            self.footpath_meters[a].append(meters)
+        self.footpath_table = _padded_neighbors(src, dst, seconds, len(self.stop_ids))
+
+    def build_service_days(self):
+        """
+        Index the feed's calendar for per-date trip masks.
+
+        Only the (days x services) table is kept; active_trips gathers a date's
+        row per trip on demand, so no (days x trips) table is ever built.
+        """
+        self.calendar = ServiceCalendar(
+            self.service_ids,
+            read_optional(self.gtfs_path, 'calendar.txt'),
+            read_optional(self.gtfs_path, 'calendar_dates.txt')
+        )
+        self._day_connections = {}
+        self._day_patterns = {}
+        self._active_trip_masks = {}
+        self._fastest_hops = None
+        if self.calendar.has_calendar:
+            print(f"✓ Indexed service calendar for {len(self.calendar.days)} days")
+
+    def active_trips(self, date) -> np.ndarray:
+        """Boolean mask over connection trips running on a date"""
+        n_trips = len(self.connection_trip_routes)
+        if not self.calendar.has_calendar:
+            return np.ones(n_trips, dtype=bool)
+        offset = self.calendar.day_offset(parse_date(date))
+        if offset is None:
+            return np.zeros(n_trips, dtype=bool)
+        if offset not in self._active_trip_masks:
+            if len(self._active_trip_masks) >= 4:
+                self._active_trip_masks.pop(next(iter(self._active_trip_masks)))
+            # Trips with an unknown service (-1) pick up the extra, never-running column
+            services = np.append(self.calendar.days[offset], False)
+            self._active_trip_masks[offset] = services[self.connection_trip_services]
+        return self._active_trip_masks[offset]
+
+    def _connections(self, date=None) -> Tuple[np.ndarray, ...]:
+        """
+        Connection arrays (dep, arr, from, to, trip) to scan for a date.
+
+        Without a date these are all connections. With one they are the date's trips
+        merged with the previous day's trips past midnight, shifted back by a day;
+        those get trip numbers offset by the number of trips so the two runs of a
+        trip stay apart.
+        """
+        if date is None:
+            return self.conn_dep, self.conn_arr, self.conn_from, self.conn_to, self.conn_trip
+
+        date = parse_date(date)
+        if date in self._day_connections:
+            return self._day_connections[date]
+
+        today = np.flatnonzero(self.active_trips(date)[self.conn_trip])
+        overnight = np.flatnonzero(self.active_trips(previous_day(date))[self.conn_trip]
+                                   & (self.conn_dep >= SECONDS_PER_DAY))
+        index = np.concatenate([today, overnight])
+        shift = np.repeat(np.array([0, SECONDS_PER_DAY], dtype=np.int32), [len(today), len(overnight)])
+        deps = self.conn_dep[index] - shift
+        arrs = self.conn_arr[index] - shift
+        order = np.lexsort((arrs, deps))
+        index = index[order]
+        trips = self.conn_trip[index] + np.where(shift[order] > 0, len(self.connection_trip_routes), 0)
+        connections = (deps[order], arrs[order], self.conn_from[index], self.conn_to[index],
+                       trips.astype(np.int32))
+
+        # Queries usually ask about one or two dates at a time
+        if len(self._day_connections) >= 2:
+            self._day_connections.pop(next(iter(self._day_connections)))
+        self._day_connections[date] = connections
+        return connections
+
+    def trip_stop_sequences(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The stops of every connection trip in order, as CSR arrays (indptr, stops).
+
+        Trip t (numbered as in connection_trip_routes) calls at the stop positions
+        stops[indptr[t]:indptr[t + 1]]: its first boarding stop, then every stop it
+        reaches, in departure order.
+        """
+        order = np.lexsort((self.conn_arr, self.conn_dep, self.conn_trip))
+        trips = self.conn_trip[order]
+        hops = np.bincount(trips, minlength=len(self.connection_trip_routes))
+        first_hop = np.cumsum(hops) - hops
+        indptr = np.concatenate([[0], np.cumsum(hops + 1)])
+
+        stops = np.empty(indptr[-1], dtype=np.int32)
+        stops[indptr[:-1]] = self.conn_from[order][first_hop]
+        stops[indptr[trips] + 1 + np.arange(len(trips)) - first_hop[trips]] = self.conn_to[order]
+        return indptr, stops
+
+    def _patterns(self, date=None) -> RoutePatterns:
+        """RAPTOR route patterns of the connections of a date (all connections without one)"""
+        key = parse_date(date) if date is not None else None
+        if key not in self._day_patterns:
+            if len(self._day_patterns) >= 2:
+                self._day_patterns.pop(next(iter(self._day_patterns)))
+            with self.instrumentation.phase('build_patterns'):
+                self._day_patterns[key] = RoutePatterns(self._connections(date), len(self.stop_ids))
+        return self._day_patterns[key]
+
+    def _raptor(self, source: int, departure: int, target: Optional[int] = None, date=None,
+                until: Optional[int] = None) -> Tuple[np.ndarray, List[np.ndarray], RoutePatterns]:
+        """RAPTOR from one stop over a date's patterns; see raptor.raptor"""
+        patterns = self._patterns(date)
+        instrumentation = self.instrumentation if self.instrumentation.enabled else None
+        best, rounds = raptor(patterns, self.footpath_table, source, departure, target, until,
+                             instrumentation=instrumentation)
+        return best, rounds, patterns
+
+    def _raptor_journey(self, target: int, rounds: List[np.ndarray], patterns: RoutePatterns) -> Journey:
+        """Follow RAPTOR labels back from target's last improvement and build a Journey"""
+        n_trips = len(self.connection_trip_routes)
+        stop_ids = self.stop_ids
+        lats, lons = self.stop_lats, self.stop_lons
+
+        trips = []
+        total_walking = 0
+        stop, k = target, len(rounds) - 1
+        while True:
+            while rounds[k][stop, 0] == NO_LABEL:
+                k -= 1
+            col, first, second, arrival = rounds[k][stop].tolist()
+            if col == ORIGIN:
+                break
+            if col == WALK:
+                # Walked from another stop improved in the same round
+                from_stop, walk_secs = first, second
+                trips.append(Trip(
+                    route_id='walking',
+                    from_stop=stop_ids[from_stop],
+                    to_stop=stop_ids[stop],
+                    departure_time=arrival - walk_secs,
+                    arrival_time=arrival,
+                    is_walking=True
+                ))
+                total_walking += float(_haversine(lats[from_stop], lons[from_stop], lats[stop], lons[stop]))
+            else:
+                # Rode trip rank `first` of the pattern from boarding column `second`
+                rank, board = first, second
+                from_stop = int(patterns.col_from[board])
+                trips.append(Trip(
+                    route_id=self.connection_trip_routes[patterns.trip_number(col, rank) % n_trips],
+                    from_stop=stop_ids[from_stop],
+                    to_stop=stop_ids[stop],
+                    departure_time=int(patterns.dep[patterns.col_time[board] + rank]),
+                    arrival_time=arrival
+                ))
+                k -= 1
+            stop = from_stop
+
+        trips.reverse()
+        return Journey(trips=trips, total_time=self._calculate_journey_time(trips), total_walking=total_walking,
+                       transfers=self._count_transfers(trips))
+
+    def _scan_connections(self, source: int, departure: int, target: Optional[int] = None,
+                          connections: Optional[Tuple[np.ndarray, ...]] = None, until: Optional[int] = None):
         """
-        Calculate difference between two times in minutes, handling GTFS >24 hour format.
+        Earliest-arrival Connection Scan from one stop.
 
         Args:
-            time1: First time (format HH:MM:SS or >24:MM:SS)
-            time2: Second time (format HH:MM:SS or >24:MM:SS)
+            source: Stop position of the origin
+            departure: Departure time in seconds
+            target: Optional stop position; the scan stops once no connection can improve it
+            connections: Connection arrays from _connections; all connections by default
+            until: Optional time in seconds; connections departing at or after it are not scanned
         Returns:
-            int: time2 - time1 in minutes
+            (earliest, in_conn, walk_from, trip_board): per-stop earliest arrival, the
+            connection that delivered it (-1 if reached on foot or not at all), the stop
+            walked from (-1 if none) and the connection each trip was boarded at
         """
-        def to_minutes(time_str):
-            h, m, s = map(int, time_str.split(':'))
-            total_minutes = h * 60 + m
-            return total_minutes
+        conn_dep, conn_arr, conn_from, conn_to, conn_trip = connections or self._connections()
+        earliest = [UNREACHED] * len(self.stops)
+        in_conn = [-1] * len(self.stops)
+        walk_from = [-1] * len(self.stops)
+        # Dated scans number the previous day's runs after the date's own trips
+        trip_board = [-1] * (2 * len(self.connection_trip_routes))
+        footpaths = self.footpaths
+
+        earliest[source] = departure
+        self._relax_footpaths(source, earliest, in_conn, walk_from)
+
+        total = len(conn_dep) if until is None else int(np.searchsorted(conn_dep, until, side='left'))
+        first = int(np.searchsorted(conn_dep, departure, side='left'))
+        for offset in range(first, total, SCAN_CHUNK):
+            end = min(offset + SCAN_CHUNK, total)
+            deps = conn_dep[offset:end].tolist()
+            arrs = conn_arr[offset:end].tolist()
+            froms = conn_from[offset:end].tolist()
+            tos = conn_to[offset:end].tolist()
+            trips = conn_trip[offset:end].tolist()
+
+            for k in range(end - offset):
+                dep = deps[k]
+                if target is not None and dep >= earliest[target]:
+                    self.instrumentation.count('connections_scanned', offset + k - first)
+                    return earliest, in_conn, walk_from, trip_board
+
+                trip = trips[k]
+                if trip_board[trip] < 0:
+                    if earliest[froms[k]] > dep:
+                        continue
+                    trip_board[trip] = offset + k
+
+                arr = arrs[k]
+                to = tos[k]
+                if arr < earliest[to]:
+                    earliest[to] = arr
+                    in_conn[to] = offset + k
+                    walk_from[to] = -1
+                    if footpaths[to]:
+                        self._relax_footpaths(to, earliest, in_conn, walk_from)
+
+        self.instrumentation.count('connections_scanned', max(total - first, 0))
+        return earliest, in_conn, walk_from, trip_board
+
+    def _relax_footpaths(self, stop: int, earliest, in_conn, walk_from):
+        """Propagate a new arrival at stop along chains of walking connections"""
+        footpaths = self.footpaths
+        queue = [(earliest[stop], stop)]
+        while queue:
+            arrival, current = heapq.heappop(queue)
+            if arrival > earliest[current]:
+                continue
+            for neighbor, secs in footpaths[current]:
+                if arrival + secs < earliest[neighbor]:
+                    earliest[neighbor] = arrival + secs
+                    in_conn[neighbor] = -1
+                    walk_from[neighbor] = current
+                    heapq.heappush(queue, (arrival + secs, neighbor))
+
+    def _calculate_journey_time(self, trips: List[Trip]) -> int:
+        """Journey duration in seconds from the first departure to the final arrival"""
+        return trips[-1].arrival_time - trips[0].departure_time
+
+    @staticmethod
+    def _count_transfers(trips: List[Trip]) -> int:
+        """Number of changes between transit vehicles; walking legs are not counted"""
+        return max(sum(not trip.is_walking for trip in trips) - 1, 0)
+
+    def find_fastest_path(self, start_stop: str, end_stop: str, start_time: Union[str, int],
+                          date=None) -> List[Journey]:
+        """
+        Find the earliest-arriving journey between two stops directly from the timetable.
+
+        Unlike find_path, this does not fix the sequence of stops up front: it runs
+        RAPTOR rounds over the day's route patterns and the walking footpaths, so
+        journeys through more stops are found when they arrive earlier. Of the
+        earliest-arriving journeys, one with the fewest rides is returned.
 
-        # Convert times directly without modification
-        minutes1 = to_minutes(time1)
-        minutes2 = to_minutes(time2)
+        Args:
+            start_stop: Origin stop ID
+            end_stop: Destination stop ID
+            start_time: Departure time (HH:MM:SS or seconds)
+            date: Service date (YYYYMMDD, YYYY-MM-DD or a date); None ignores the calendar
+        Returns:
+            List[Journey]: The earliest-arrival journey, or an empty list if unreachable
+        """
+        start_stop = str(start_stop)
+        end_stop = str(end_stop)
+        for stop_id in (start_stop, end_stop):
+            if stop_id not in self.stop_position:
+                raise ValueError(f"Stop ID {stop_id} not found in stops data")
 
-        # Simply return the difference since GTFS already handles day wrapping with >24:00:00 format
-        return minutes2 - minutes1
+        if start_stop == end_stop:
+            return []
 
-    def _find_next_trip(self, from_stop: str, to_stop: str, current_time: str, routes: set) -> Optional[Trip]:
-        """Find the next available trip between two stops after a given time"""
-        routes = {str(route) for route in routes}
+        source = self.stop_position[start_stop]
+        target = self.stop_position[end_stop]
+        with self.instrumentation.phase('raptor'):
+            best, rounds, patterns = self._raptor(source, parse_time(start_time), target, date)
 
-        try:
-            # Load stop times
-            stop_times_df = pd.read_csv(f"{self.gtfs_path}/stop_times.txt")
-            stop_times_df['stop_id'] = stop_times_df['stop_id'].astype(str)
-            stop_times_df['trip_id'] = stop_times_df['trip_id'].astype(str)
+        if best[target] == UNREACHED:
+            return []
+        return [self._raptor_journey(target, rounds, patterns)]
+
+    def _travel_time_rows(self, sources: np.ndarray, departure: int, targets: np.ndarray, date) -> np.ndarray:
+        """One one-to-all RAPTOR per source, reduced to travel seconds at targets (-1 if unreachable)"""
+        rows = np.full((len(sources), len(targets)), -1, dtype=np.int32)
+        for row, source in enumerate(sources.tolist()):
+            arrivals = self._raptor(source, departure, None, date)[0][targets]
+            reached = arrivals != UNREACHED
+            rows[row, reached] = arrivals[reached] - departure
+        return rows
+
+    def travel_time_matrix(self, origins: List[str], departure_time: Union[str, int],
+                           targets: Optional[List[str]] = None, date=None,
+                           processes: Optional[int] = None) -> np.ndarray:
+        """
+        Travel times from many origins to many stops.
+
+        Each origin costs a single one-to-all RAPTOR search, whatever the number of
+        targets. Origins are spread over a fork-based process pool; where fork is not
+        available, or with processes=1, they are scanned in this process.
+
+        Args:
+            origins: Origin stop IDs
+            departure_time: Departure time (HH:MM:SS or seconds)
+            targets: Target stop IDs; all stops by default
+            date: Service date (YYYYMMDD, YYYY-MM-DD or a date); None ignores the calendar
+            processes: Worker processes; defaults to the CPU count
+        Returns:
+            np.ndarray: int32 matrix of travel seconds, origins by targets; -1 where unreachable
+        """
+        import multiprocessing
+
+        global _matrix_planner
 
-            # Debug output
-            print(f"\nSearching for trips from {from_stop} to {to_stop} after {current_time}")
-            print(f"Looking at routes: {routes}")
+        departure = parse_time(departure_time)
+        date = parse_date(date) if date is not None else None
+        sources = self.resolve_stops(origins)
+        target_positions = (self.resolve_stops(targets) if targets is not None
+                            else np.arange(len(self.stop_ids), dtype=np.int32))
 
-            # Get trips that serve these stops
-            from_stop_times = stop_times_df[stop_times_df['stop_id'] == from_stop]
-            to_stop_times = stop_times_df[stop_times_df['stop_id'] == to_stop]
+        processes = min(processes or os.cpu_count() or 1, len(sources))
+        if processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return self._travel_time_rows(sources, departure, target_positions, date)
 
-            if from_stop_times.empty:
-                print(f"No departures found from stop {from_stop}")
-                return None
-            if to_stop_times.empty:
-                print(f"No arrivals found at stop {to_stop}")
-                return None
+        from concurrent.futures import ProcessPoolExecutor
 
-            print(f"Found {len(from_stop_times)} departures and {len(to_stop_times)} arrivals")
+        # Build the date's route patterns once so every worker inherits them
+        self._patterns(date)
+        batches = np.array_split(sources, processes * 4)
+        _matrix_planner = self
+        try:
+            with ProcessPoolExecutor(max_workers=processes,
+                                     mp_context=multiprocessing.get_context('fork')) as pool:
+                rows = list(pool.map(_travel_time_rows, batches, [departure] * len(batches),
+                                     [target_positions] * len(batches), [date] * len(batches)))
+        finally:
+            _matrix_planner = None
+        return np.vstack(rows)
+
+    def earliest_arrivals(self, origin: str, departure_time: Union[str, int], date=None,
+                          max_duration: Optional[int] = None) -> np.ndarray:
+        """
+        Earliest arrival time at every stop from one origin, in one RAPTOR search.
 
-            # Find common trips
-            common_trips = set(from_stop_times['trip_id']) & set(to_stop_times['trip_id'])
-            print(f"Found {len(common_trips)} common trips between these stops")
+        Args:
+            origin: Origin stop ID
+            departure_time: Departure time (HH:MM:SS or seconds)
+            date: Service date (YYYYMMDD, YYYY-MM-DD or a date); None ignores the calendar
+            max_duration: Optional limit in seconds; stops reached later count as unreachable
+        Returns:
+            np.ndarray: int32 arrival seconds aligned with stop_ids; -1 where unreachable
+        """
+        source = int(self.resolve_stops([origin])[0])
+        departure = parse_time(departure_time)
+        until = departure + max_duration if max_duration is not None else None
+
+        earliest = self._raptor(source, departure, None, date, until)[0]
+        unreached = earliest == UNREACHED
+        if until is not None:
+            unreached |= earliest > until
+        return np.where(unreached, -1, earliest).astype(np.int32)
+
+    def isochrones(self, origin: str, departure_time: Union[str, int], bands: Tuple[int, ...] = (15, 30, 45, 60),
+                   date=None, polygons: bool = True) -> Dict[int, Dict]:
+        """
+        Stops reachable within each time band, and optionally their outline.
 
-            if not common_trips:
-                return None
+        Bands are cumulative: the 30-minute band holds every stop reached within 30
+        minutes, including those of the 15-minute band. Only connections departing
+        before the largest band ends are scanned.
 
-            # Filter trips by route
-            self.trips['trip_id'] = self.trips['trip_id'].astype(str)
-            self.trips['route_id'] = self.trips['route_id'].astype(str)
+        Args:
+            origin: Origin stop ID
+            departure_time: Departure time (HH:MM:SS or seconds)
+            bands: Band limits in minutes
+            date: Service date (YYYYMMDD, YYYY-MM-DD or a date); None ignores the calendar
+            polygons: Also return each band's convex hull
+        Returns:
+            Dict[int, Dict]: Per band in minutes, 'stops' (stop IDs) and, with polygons,
+            'polygon' as a closed list of (lat, lon) points
+        """
+        departure = parse_time(departure_time)
+        arrivals = self.earliest_arrivals(origin, departure, date, max(bands) * 60)
+        reached = arrivals >= 0
+        durations = arrivals.astype(np.int64) - departure
+
+        result = {}
+        for minutes in sorted(bands):
+            inside = np.flatnonzero(reached & (durations <= minutes * 60))
+            band = {'stops': [self.stop_ids[i] for i in inside.tolist()]}
+            if polygons:
+                band['polygon'] = _convex_hull(self.stop_lats[inside], self.stop_lons[inside])
+            result[minutes] = band
+        return result
+
+    def _walks_to(self, target: int) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """
+        Shortest walking time from every stop that can walk to target, and the next
+        stop on that walk. Footpaths are symmetric, so this is a Dijkstra from target.
+        """
+        walk_secs = {target: 0}
+        next_stop = {}
+        queue = [(0, target)]
+        while queue:
+            secs, stop = heapq.heappop(queue)
+            if secs > walk_secs[stop]:
+                continue
+            for neighbor, step in self.footpaths[stop]:
+                if secs + step < walk_secs.get(neighbor, UNREACHED):
+                    walk_secs[neighbor] = secs + step
+                    next_stop[neighbor] = stop
+                    heapq.heappush(queue, (secs + step, neighbor))
+        return walk_secs, next_stop
+
+    def _scan_profiles(self, first: int, end: int, connections: Tuple[np.ndarray, ...], walk_secs: Dict[int, int],
+                       earliest: List[int], latest: int):
+        """
+        Profile Connection Scan over connections[first:end] towards the target that
+        walk_secs (from _walks_to) leads to.
+
+        Connections are scanned by decreasing departure. For every stop it keeps the
+        Pareto set of (departure, arrival at target) options as a profile whose actions
+        are either a connection to board (>= 0) or the next stop to walk to (-stop - 1);
+        for every scanned connection, conn_exit holds the connection to alight from.
+        Options are only recorded where the origin can be left in time for them, as
+        given by its earliest arrivals, and if they arrive no later than latest.
+        """
+        deps, arrs, froms, tos, trips = (column[first:end].tolist() for column in connections)
+        footpaths = self.footpaths
+        profiles = {}
+        trip_arrival = {}
+        trip_exit = {}
+        conn_exit = {}
+
+        for k in range(end - first - 1, -1, -1):
+            c = first + k
+            dep = deps[k]
+            arr = arrs[k]
+            to = tos[k]
+            trip = trips[k]
+
+            # Best of: walking to target after alighting, staying seated, transferring at to
+            best = arr + walk_secs[to] if to in walk_secs else UNREACHED
+            exit_conn = c
+            if trip_arrival.get(trip, UNREACHED) < best:
+                best = trip_arrival[trip]
+                exit_conn = trip_exit[trip]
+            if to in profiles:
+                option_deps, option_arrs, _ = profiles[to]
+                i = bisect.bisect_left(option_deps, arr)
+                if i < len(option_deps) and option_arrs[i] < best:
+                    best = option_arrs[i]
+                    exit_conn = c
+            if best > latest or best == UNREACHED:
+                continue
+
+            conn_exit[c] = exit_conn
+            if best < trip_arrival.get(trip, UNREACHED):
+                trip_arrival[trip] = best
+                trip_exit[trip] = exit_conn
+
+            # Offer boarding c at its stop, and at every stop that can walk there in time;
+            # a walk is only extended while its option is useful and not dominated
+            queue = [(0, froms[k], c)]
+            seen = set()
+            while queue:
+                walk, stop, action = heapq.heappop(queue)
+                if stop in seen or dep - walk < earliest[stop]:
+                    continue
+                seen.add(stop)
+                profile = profiles.setdefault(stop, ([], [], []))
+                if not _profile_insert(profile, dep - walk, best, action):
+                    continue
+                for neighbor, step in footpaths[stop]:
+                    if neighbor not in seen:
+                        heapq.heappush(queue, (walk + step, neighbor, -stop - 1))
 
-            valid_trips = self.trips[
-                (self.trips['trip_id'].isin(common_trips)) &
-                (self.trips['route_id'].isin(routes))
-            ]
+        return profiles, conn_exit
 
-            print(f"Found {len(valid_trips)} trips on requested routes")
+    def _footpath_trip(self, stop: int, next_stop: int, departure: int) -> Tuple[Trip, float]:
+        """The walking Trip along the footpath from stop to next_stop, and its length in meters"""
+        walk = next(secs for neighbor, secs in self.footpaths[stop] if neighbor == next_stop)
+        trip = Trip(
+            route_id='walking',
+            from_stop=self.stop_ids[stop],
+            to_stop=self.stop_ids[next_stop],
+            departure_time=departure,
+            arrival_time=departure + walk,
+            is_walking=True
+        )
+        lats, lons = self.stop_lats, self.stop_lons
+        return trip, float(_haversine(lats[stop], lons[stop], lats[next_stop], lons[next_stop]))
 
-            if valid_trips.empty:
-                return None
+    def walking_journey(self, start_stop: str, end_stop: str, start_time: Union[str, int]) -> Optional[Journey]:
+        """
+        Walk the whole way along the shortest chain of footpaths
 
-            best_trip = None
-            earliest_arrival = None
+        Args:
+            start_stop: Origin stop ID
+            end_stop: Destination stop ID
+            start_time: Departure time (HH:MM:SS or seconds)
+        Returns:
+            Optional[Journey]: The walk, or None if footpaths do not connect the stops
+        """
+        source, target = (int(position) for position in self.resolve_stops([start_stop, end_stop]))
+        walk_secs, walk_next = self._walks_to(target)
+        if source == target or source not in walk_secs:
+            return None
 
-            for trip_id in valid_trips['trip_id']:
-                trip_stops = stop_times_df[stop_times_df['trip_id'] == str(trip_id)].sort_values('stop_sequence')
+        trips = []
+        total_walking = 0
+        stop, time = source, parse_time(start_time)
+        while stop != target:
+            trip, meters = self._footpath_trip(stop, walk_next[stop], time)
+            trips.append(trip)
+            total_walking += meters
+            stop, time = walk_next[stop], trip.arrival_time
+        return Journey(trips=trips, total_time=self._calculate_journey_time(trips), total_walking=total_walking)
+
+    def _profile_journey(self, source: int, target: int, departure: int, profiles, conn_exit, connections,
+                         walks: Tuple[Dict[int, int], Dict[int, int]]) -> Journey:
+        """Follow the profiles forward from source, leaving at departure, and build the Journey"""
+        conn_dep, conn_arr, conn_from, conn_to, conn_trip = connections
+        walk_secs, walk_next = walks
+        n_trips = len(self.connection_trip_routes)
+        stop_ids = self.stop_ids
+
+        trips = []
+        total_walking = 0
+        stop, time = source, departure
+        while stop != target:
+            option = None
+            if stop in profiles:
+                deps, arrs, actions = profiles[stop]
+                i = bisect.bisect_left(deps, time)
+                if i < len(deps):
+                    option = (deps[i], arrs[i], actions[i])
+            walk_arrival = time + walk_secs[stop] if stop in walk_secs else UNREACHED
+
+            if option is None or walk_arrival <= option[1]:
+                # Walk to the target along the shortest chain of footpaths
+                next_stop, dep = walk_next[stop], time
+            elif option[2] < 0:
+                next_stop, dep = -option[2] - 1, option[0]
+            else:
+                board = option[2]
+                alight = conn_exit[board]
+                trips.append(Trip(
+                    route_id=self.connection_trip_routes[int(conn_trip[board]) % n_trips],
+                    from_stop=stop_ids[stop],
+                    to_stop=stop_ids[int(conn_to[alight])],
+                    departure_time=int(conn_dep[board]),
+                    arrival_time=int(conn_arr[alight])
+                ))
+                stop, time = int(conn_to[alight]), int(conn_arr[alight])
+                continue
+
+            trip, meters = self._footpath_trip(stop, next_stop, dep)
+            trips.append(trip)
+            total_walking += meters
+            stop, time = next_stop, trip.arrival_time
+
+        return Journey(trips=trips, total_time=self._calculate_journey_time(trips), total_walking=total_walking,
+                       transfers=self._count_transfers(trips))
+
+    def find_profile(self, start_stop: str, end_stop: str, window_start: Union[str, int],
+                     window_end: Union[str, int], date=None) -> List[Journey]:
+        """
+        All Pareto-optimal journeys leaving within a departure window, in one pass.
 
-                from_stop_times = trip_stops[trip_stops['stop_id'] == from_stop]
-                to_stop_times = trip_stops[trip_stops['stop_id'] == to_stop]
+        A journey is kept unless another one leaves no earlier and arrives no later,
+        including journeys leaving just after the window. Rather than one query per
+        departure time, a single profile Connection Scan runs backwards over the
+        connections between window_start and the earliest arrival for window_end.
 
-                if from_stop_times.empty or to_stop_times.empty:
+        Args:
+            start_stop: Origin stop ID
+            end_stop: Destination stop ID
+            window_start: Earliest departure (HH:MM:SS or seconds)
+            window_end: Latest departure (HH:MM:SS or seconds)
+            date: Service date (YYYYMMDD, YYYY-MM-DD or a date); None ignores the calendar
+        Returns:
+            List[Journey]: Journeys by departure time; later ones arrive later
+        """
+        source, target = (int(position) for position in self.resolve_stops([start_stop, end_stop]))
+        if source == target:
+            return []
+        window_start = parse_time(window_start)
+        window_end = parse_time(window_end)
+        connections = self._connections(date)
+
+        # Any connection departing after the earliest arrival for window_end can only
+        # serve dominated journeys
+        latest = self._scan_connections(source, window_end, target, connections)[0][target]
+        conn_dep = connections[0]
+        first = int(np.searchsorted(conn_dep, window_start, side='left'))
+        end = int(np.searchsorted(conn_dep, latest, side='left')) if latest != UNREACHED else len(conn_dep)
+
+        # Stops and connections the origin cannot reach when leaving at window_start
+        # are pruned from the profile scan
+        earliest = self._scan_connections(source, window_start, None, connections,
+                                          latest if latest != UNREACHED else None)[0]
+        walks = self._walks_to(target)
+        walk_secs = walks[0]
+        profiles, conn_exit = self._scan_profiles(first, end, connections, walk_secs, earliest, latest)
+        if source not in profiles:
+            return []
+        deps, arrs, _ = profiles[source]
+        journeys = []
+        for dep, arr in zip(deps, arrs):
+            # Walking all the way beats any option arriving later than the walk would
+            if window_start <= dep <= window_end and dep + walk_secs.get(source, UNREACHED) > arr:
+                journeys.append(self._profile_journey(source, target, dep, profiles, conn_exit,
+                                                      connections, walks))
+        return journeys
+
+    def _time_to_target(self, target: int, limit: int) -> np.ndarray:
+        """
+        A lower bound on the travel time to target from every stop, by the fastest
+        run of every hop and the footpaths, ignoring waits; UNREACHED beyond limit seconds.
+        """
+        n_stops = len(self.stop_ids)
+        if self._fastest_hops is None:
+            # Fastest run of every (from, to) hop plus the footpaths, listed by arrival stop
+            pairs = self.conn_from.astype(np.int64) * n_stops + self.conn_to
+            durations = (self.conn_arr - self.conn_dep).astype(np.int64)
+            order = np.lexsort((durations, pairs))
+            hops = order[np.flatnonzero(np.diff(pairs[order], prepend=-1))]
+            walk_to, walk_secs = self.footpath_table
+            walks = walk_to != np.arange(n_stops)[:, None]
+            src = np.concatenate([self.conn_from[hops], np.nonzero(walks)[0]])
+            dst = np.concatenate([self.conn_to[hops], walk_to[walks]])
+            secs = np.concatenate([durations[hops], walk_secs[walks]])
+            self._fastest_hops = _padded_neighbors(dst, src, secs, n_stops)
+
+        previous, secs = self._fastest_hops
+        remaining = np.full(n_stops, UNREACHED, dtype=np.int64)
+        remaining[target] = 0
+        improved = np.zeros(n_stops, dtype=bool)
+        frontier = np.array([target])
+        while len(frontier):
+            stops = previous[frontier]
+            times = remaining[frontier][:, None] + secs[frontier]
+            better = (times <= limit) & (times < remaining[stops])
+            stops, times = stops[better], times[better]
+            np.minimum.at(remaining, stops, times)
+            improved[stops] = True
+            frontier = np.flatnonzero(improved)
+            improved[frontier] = False
+        return remaining
+
+    def find_pareto_paths(self, start_stop: str, end_stop: str, start_time: Union[str, int], date=None,
+                          max_duration: int = 7200, max_transfers: int = 5, max_walking: float = 2000,
+                          walking_resolution: float = 100, max_labels: int = 50000) -> List[Journey]:
+        """
+        Journeys that are Pareto-optimal in arrival time, transfers and walking distance.
+
+        A multi-criteria Connection Scan keeps a bag of non-dominated labels per stop
+        and per boarded trip. Every label is checked against the target's bag before
+        it is inserted, at the earliest time it could still get there (from
+        _time_to_target), and dropped if a label already at the target is as good on
+        all three criteria; onboard labels are checked again at every stop of their
+        trip. Walking distances are compared in steps of walking_resolution meters so
+        near-identical walks do not multiply the labels.
+
+        Args:
+            start_stop: Origin stop ID
+            end_stop: Destination stop ID
+            start_time: Departure time (HH:MM:SS or seconds)
+            date: Service date (YYYYMMDD, YYYY-MM-DD or a date); None ignores the calendar
+            max_duration: Journeys must arrive within this many seconds of start_time
+            max_transfers: Maximum number of transfers
+            max_walking: Maximum total walking in meters
+            walking_resolution: Meters of walking that count as a difference; 0 compares exactly
+            max_labels: Labels inserted before the scan gives up and returns the journeys
+                found so far, which may then miss part of the Pareto set
+        Returns:
+            List[Journey]: The Pareto set, by arrival time
+        """
+        source, target = (int(position) for position in self.resolve_stops([start_stop, end_stop]))
+        if source == target:
+            return []
+        departure = parse_time(start_time)
+        until = departure + max_duration
+        max_boardings = max_transfers + 1
+        connections = self._connections(date)
+        footpaths, footpath_meters = self.footpaths, self.footpath_meters
+        with self.instrumentation.phase('pareto_bounds'):
+            to_target = self._time_to_target(target, max_duration)
+        if to_target[source] == UNREACHED:
+            return []
+        remaining = to_target.tolist()
+
+        # Stop labels are (arrival, boardings, walking steps, walking meters, stop, parent),
+        # where parent is None at the origin, ('walk', label) or
+        # ('ride', boarding conn, alighting conn, label)
+        bags = {}
+        target_bag = bags.setdefault(target, [])
+        # Onboard labels are (0, boardings, walking steps, walking meters, boarding conn, label):
+        # everyone on a trip arrives together, so only the other criteria compete
+        trip_bags = {}
+        count = inserted = 0
+        target_arrival = UNREACHED
+        # Arrival of a single ride without walking at the target: every label made
+        # from a connection leaving at or after it has a ride and arrives later
+        settled = UNREACHED
+
+        def beaten(reach: int, boardings: int, steps) -> bool:
+            """Whether a label reaching the target no earlier than reach is no use there"""
+            return reach > until or reach >= target_arrival and _bag_dominated(target_bag, reach, boardings, steps)
+
+        def add(label: tuple):
+            """Insert a stop label unless the target already beats it, then walk on by arrival"""
+            nonlocal count, inserted, target_arrival, settled
+            queue = [(label[0], count, label)]
+            while queue:
+                label = heapq.heappop(queue)[2]
+                arr, boardings, steps, meters, stop, _ = label
+                if beaten(arr + remaining[stop], boardings, steps):
                     continue
+                if not _bag_insert(bags.setdefault(stop, []), label):
+                    continue
+                inserted += 1
+                if stop == target:
+                    target_arrival = min(target_arrival, arr)
+                    if boardings <= 1 and not steps:
+                        settled = min(settled, arr)
+                    continue
+                for (neighbor, secs), walk in zip(footpaths[stop], footpath_meters[stop]):
+                    walked = meters + walk
+                    if walked > max_walking:
+                        continue
+                    # Skip walks that would be rejected anyway before queueing them
+                    walk_steps = walked // walking_resolution if walking_resolution else round(walked, 6)
+                    reach = arr + secs + remaining[neighbor]
+                    if reach > until or reach >= target_arrival and \
+                            _bag_dominated(target_bag, reach, boardings, walk_steps):
+                        continue
+                    bag = bags.get(neighbor)
+                    if bag and _bag_dominated(bag, arr + secs, boardings, walk_steps):
+                        continue
+                    count += 1
+                    heapq.heappush(queue, (arr + secs, count, (
+                        arr + secs, boardings, walk_steps, walked, neighbor, ('walk', label))))
+
+        add((departure, 0, 0, 0.0, source, None))
+
+        # Only connections that can still get to the target in time; once a trip
+        # cannot, none of its later connections can either
+        conn_dep, conn_arr, _, conn_to, _ = connections
+        first = int(np.searchsorted(conn_dep, departure, side='left'))
+        end = int(np.searchsorted(conn_dep, until, side='left'))
+        reaches = conn_arr[first:end] + to_target[conn_to[first:end]]
+        scanned = first + np.flatnonzero(reaches <= until)
+        for offset in range(0, len(scanned), SCAN_CHUNK):
+            chunk = scanned[offset:offset + SCAN_CHUNK]
+            deps, arrs, froms, tos, trips = (column[chunk].tolist() for column in connections)
+            conns = chunk.tolist()
+            for k in range(len(conns)):
+                dep, trip, conn = deps[k], trips[k], conns[k]
+                if dep >= settled or inserted > max_labels:
+                    break
+                reach = arrs[k] + remaining[tos[k]]
+
+                # Board from every label waiting at the departure stop
+                for label in bags.get(froms[k], ()):
+                    if label[0] <= dep and label[1] < max_boardings and not beaten(reach, label[1] + 1, label[2]):
+                        if _bag_insert(trip_bags.setdefault(trip, []),
+                                       (0, label[1] + 1, label[2], label[3], conn, label)):
+                            inserted += 1
+
+                # Alight every onboard label at the arrival stop; those the target
+                # beats now stay beaten further down the trip
+                onboard = trip_bags.get(trip)
+                if onboard:
+                    onboard[:] = [entry for entry in onboard if not beaten(reach, entry[1], entry[2])]
+                    for _, boardings, steps, meters, board, label in onboard:
+                        add((arrs[k], boardings, steps, meters, tos[k], ('ride', board, conn, label)))
+            else:
+                continue
+            break
+        if inserted > max_labels:
+            self.instrumentation.count('pareto_truncated')
+        self.instrumentation.count('pareto_labels', inserted)
+
+        journeys = [self._label_journey(label, connections) for label in target_bag]
+        journeys.sort(key=lambda journey: (journey.trips[-1].arrival_time, journey.transfers, journey.total_walking))
+        return journeys
+
+    def _label_journey(self, label: tuple, connections: Tuple[np.ndarray, ...]) -> Journey:
+        """Follow a multi-criteria label's parents back to the origin and build the Journey"""
+        conn_dep, conn_arr, conn_from, _, conn_trip = connections
+        n_trips = len(self.connection_trip_routes)
+        stop_ids = self.stop_ids
+        total_walking = label[3]
+
+        trips = []
+        while label[5] is not None:
+            arr, stop, parent = label[0], label[4], label[5]
+            previous = parent[-1]
+            if parent[0] == 'walk':
+                trips.append(Trip(
+                    route_id='walking',
+                    from_stop=stop_ids[previous[4]],
+                    to_stop=stop_ids[stop],
+                    departure_time=previous[0],
+                    arrival_time=arr,
+                    is_walking=True
+                ))
+            else:
+                board, alight = parent[1], parent[2]
+                trips.append(Trip(
+                    route_id=self.connection_trip_routes[int(conn_trip[board]) % n_trips],
+                    from_stop=stop_ids[int(conn_from[board])],
+                    to_stop=stop_ids[stop],
+                    departure_time=int(conn_dep[board]),
+                    arrival_time=int(conn_arr[alight])
+                ))
+            label = previous
+
+        trips.reverse()
+        return Journey(trips=trips, total_time=self._calculate_journey_time(trips), total_walking=total_walking,
+                       transfers=self._count_transfers(trips))
+
+    def resolve_stops(self, stop_ids: List[str]) -> np.ndarray:
+        """
+        Positions of stop IDs in stop_ids (and the network arrays)
 
-                from_stop_time = from_stop_times['departure_time'].iloc[0]
-                to_stop_time = to_stop_times['arrival_time'].iloc[0]
-
-                # Debug time comparison
-                time_diff = self._time_diff(current_time, from_stop_time)
-                print(f"Trip {trip_id}: Departs at {from_stop_time}, time diff from {current_time} is {time_diff} minutes")
-
-                # Check if this trip is after current time and arrives earlier than current best
-                if time_diff >= 0 and (earliest_arrival is None or
-                                     self._time_diff(to_stop_time, earliest_arrival) < 0):
-                    route_id = str(valid_trips[valid_trips['trip_id'] == trip_id]['route_id'].iloc[0])
-                    best_trip = Trip(
-                        route_id=route_id,
-                        from_stop=from_stop,
-                        to_stop=to_stop,
-                        departure_time=from_stop_time,
-                        arrival_time=to_stop_time
-                    )
-                    earliest_arrival = to_stop_time
-                    print(f"Found better trip: Route {route_id}, {from_stop_time} -> {to_stop_time}")
-
-            return best_trip
+        Raises:
+            ValueError: If a stop ID is not in the stops data
+        """
+        stop_ids = [str(stop_id) for stop_id in stop_ids]
+        positions = np.fromiter((self.stop_position.get(stop_id, -1) for stop_id in stop_ids),
+                                dtype=np.int64, count=len(stop_ids))
+        if (positions < 0).any():
+            unknown = stop_ids[int(np.flatnonzero(positions < 0)[0])]
+            raise ValueError(f"Stop ID {unknown} not found in stops data")
+        return positions
 
-        except Exception as e:
-            print(f"Error finding next trip: {str(e)}")
-            traceback.print_exc()  # Print full stack trace
-            return None
     def load_gtfs_data(self):
         """Load GTFS data and cached network if available"""
+        with self.instrumentation.phase('load'):
+            self._load_gtfs_data()
+
+    def _load_gtfs_data(self):
         print("Loading GTFS data...")
+        self._report_progress('reading feed', 0.0)
 
         # Load core GTFS files
-        self.stops = pd.read_csv(f"{self.gtfs_path}/stops.txt")
-        # Convert stop_id to string to ensure consistent type matching
-        self.stops['stop_id'] = self.stops['stop_id'].astype(str)
-
-        self.routes = pd.read_csv(f"{self.gtfs_path}/routes.txt")
-        self.trips = pd.read_csv(f"{self.gtfs_path}/trips.txt")
-
-        # Create cache directory if it doesn't exist
-        os.makedirs('cache', exist_ok=True)
-        cache_file = os.path.join('cache', 'network_data.pkl')
-
-        # Try to load cached network
-        if os.path.exists(cache_file):
-            print("Loading cached network...")
-            try:
-                with open(cache_file, 'rb') as f:
-                    cached_data = pickle.load(f)
-
-                # Convert network data back to networkx Graph
-                self.network = nx.Graph()
-                self.network.add_edges_from(cached_data['edges'])
-
-                # Convert defaultdict data
-                self.stop_routes = defaultdict(set, {k: set(v) for k, v in cached_data['stop_routes'].items()})
-                self.route_stops = defaultdict(set, {k: set(v) for k, v in cached_data['route_stops'].items()})
-
-                # Convert direct connections
-                self.direct_connections = {}
-                for from_stop, to_stops in cached_data['direct_connections'].items():
-                    self.direct_connections[from_stop] = {}
-                    for to_stop, routes in to_stops.items():
-                        self.direct_connections[from_stop][to_stop] = set(routes)
-
-                print("✓ Loaded cached network successfully")
-
-            except Exception as e:
-                print(f"Failed to load cache: {str(e)}")
-                print("Rebuilding network...")
-                self.build_network()
+        # IDs are read as categorical strings; coordinates stay float64 so walking
+        # distances match the exact feed values
+        self.stops = read_stops(self.gtfs_path, coord_dtype=np.float64)
+        self.routes = read_routes(self.gtfs_path)
+        self.trips = read_trips(self.gtfs_path)
+
+        # Stops and routes are referred to by position in these lists inside the
+        # network arrays; 'walking' is a pseudo-route for footpaths
+        self._set_id_tables(
+            self.stops['stop_id'].tolist(),
+            self.routes['route_id'].astype(str).unique().tolist() + ['walking']
+        )
+        self.build_stop_index()
+
+        # Each combination of feed files and build parameters gets its own cache
+        # variant, so a changed feed or walking distance never reuses a stale network
+        cache_root = os.path.join('cache', 'networks')
+        self.network_fingerprint = feed_fingerprint(
+            self.gtfs_path, GTFS_CACHE_INPUTS,
+            {'max_walking_distance': self.max_walking_distance},
+            content_hash=self.content_hash
+        )
+        cache_dir = os.path.join(cache_root, self.network_fingerprint)
+        os.makedirs(cache_root, exist_ok=True)
+
+        self._report_progress('loading cached network', 0.2)
+        arrays = load_arrays(cache_dir)
+        if arrays is not None and self._attach_arrays(arrays):
+            touch_cache(cache_dir)
+            print(f"✓ Loaded cached network {self.network_fingerprint} successfully")
         else:
             print("No cached network found, building network...")
-            self.build_network()
+            self._report_progress('building network', 0.3)
+            with self.instrumentation.phase('build_network'):
+                self.build_network()
+            self._report_progress('building timetable', 0.6)
+            with self.instrumentation.phase('build_timetable'):
+                self.build_timetable()
+            self._report_progress('caching network', 0.8)
+            self.save_network_cache(cache_dir)
+            evict_caches(cache_root, self.cache_variants)
+
+        self._report_progress('building footpaths', 0.9)
+        with self.instrumentation.phase('build_footpaths'):
+            self.build_footpaths()
+        self._report_progress('indexing calendar', 0.95)
+        self.build_service_days()
+        self._report_progress('ready', 1.0)
+
+    def _report_progress(self, stage: str, fraction: float):
+        """Record the current load stage and pass it on to the on_progress callback"""
+        self.load_progress = {'stage': stage, 'fraction': fraction}
+        if self.on_progress is not None:
+            self.on_progress(stage, fraction)
+
+    def _stop_positions(self, stop_ids) -> np.ndarray:
+        """Vectorized stop_position lookup; unknown stop IDs map to -1"""
+        lookup = pd.Index(list(self.stop_position))
+        positions = np.fromiter(self.stop_position.values(), dtype=np.int32, count=len(self.stop_position))
+        return _lookup_positions(lookup, positions, stop_ids)
+
+    def build_stop_index(self):
+        """
+        Keep stop names and coordinates as arrays aligned with stop_ids.
+
+        Together with stop_position this makes every stop lookup a dict hit and an
+        array read instead of a scan of the stops table.
+        """
+        self.stop_names = self.stops['stop_name'].astype(str).to_numpy(dtype=object)
+        self.stop_lats = pd.to_numeric(self.stops['stop_lat'], errors='coerce').to_numpy(np.float64)
+        self.stop_lons = pd.to_numeric(self.stops['stop_lon'], errors='coerce').to_numpy(np.float64)
+
+    def _set_id_tables(self, stop_ids: List[str], route_ids: List[str]):
+        """Install the stop/route ID tables and their reverse lookups"""
+        self.stop_ids = stop_ids
+        self.route_ids = route_ids
+        # Duplicate stop IDs resolve to their first row, like a scan of stops.txt would
+        self.stop_position = {stop_id: i for i, stop_id in reversed(list(enumerate(stop_ids)))}
+        self.route_position = {route_id: i for i, route_id in enumerate(route_ids)}
+
+    def save_network_cache(self, cache_dir: str):
+        """
+        Write the network and timetable as flat .npy arrays and reopen them memory-mapped.
+
+        If the cache cannot be written the planner keeps running on the in-memory arrays.
+        """
+        print("\nCaching network for future use...")
+        arrays = dict(self.network_arrays)
+        arrays.update({
+            'timetable_keys': self.timetable_keys,
+            'timetable_starts': self.timetable_starts,
+            'timetable_ends': self.timetable_ends,
+            'timetable_dep': self.timetable_dep,
+            'timetable_arr': self.timetable_arr,
+            'timetable_best': self.timetable_best,
+            'timetable_trip': self.timetable_trip,
+            'conn_dep': self.conn_dep,
+            'conn_arr': self.conn_arr,
+            'conn_from': self.conn_from,
+            'conn_to': self.conn_to,
+            'conn_trip': self.conn_trip,
+            'connection_trip_routes': np.array(self.connection_trip_routes, dtype=str),
+            'connection_trip_services': self.connection_trip_services,
+            'service_ids': np.array(self.service_ids, dtype=str),
+        })
+
+        try:
+            save_arrays(cache_dir, arrays)
+            arrays = load_arrays(cache_dir)
+            print("✓ Network cached successfully")
+        except OSError as e:
+            print(f"Failed to write cache: {str(e)}")
+        self._attach_arrays(arrays)
+
+    def _attach_network(self, arrays: Dict[str, np.ndarray]):
+        """Expose the CSR network tables through the dict-like lookups used by the planner"""
+        self.network_arrays = arrays
+        self._set_id_tables(self.stop_ids, arrays['route_ids'].tolist())
+        self.direct_connections = DirectConnectionsView(arrays, self.stop_ids, self.route_ids, self.stop_position)
+        self.stop_routes = MembershipView(arrays['stop_routes_ptr'], arrays['stop_routes_idx'],
+                                          self.stop_ids, self.stop_position, self.route_ids)
+        self.route_stops = MembershipView(arrays['route_stops_ptr'], arrays['route_stops_idx'],
+                                          self.route_ids, self.route_position, self.stop_ids)
+
+    def _attach_arrays(self, arrays: Dict[str, np.ndarray]) -> bool:
+        """
+        Run the planner on network arrays, typically memory-mapped from the cache.
 
-    def __init__(self, gtfs_path: str, max_walking_distance: float = 500):
+        Returns False if the arrays were built for a different stops table.
+        """
+        if not np.array_equal(arrays['stop_ids'], np.asarray(self.stop_ids, dtype=str)):
+            print("Cached network does not match stops.txt")
+            return False
+
+        self._attach_network(arrays)
+        # Lets result caches notice that the network was rebuilt or reloaded
+        self.network_version += 1
+
+        self.timetable_keys = arrays['timetable_keys']
+        self.timetable_starts = arrays['timetable_starts']
+        self.timetable_ends = arrays['timetable_ends']
+        self.timetable_dep = arrays['timetable_dep']
+        self.timetable_arr = arrays['timetable_arr']
+        self.timetable_best = arrays['timetable_best']
+        self.timetable_trip = arrays['timetable_trip']
+        self.timetable_index = TimetableIndex(self.timetable_keys, self.timetable_starts, self.timetable_ends,
+                                              self.stop_ids, self.route_ids, self.stop_position,
+                                              self.route_position)
+
+        self.conn_dep = arrays['conn_dep']
+        self.conn_arr = arrays['conn_arr']
+        self.conn_from = arrays['conn_from']
+        self.conn_to = arrays['conn_to']
+        self.conn_trip = arrays['conn_trip']
+        self.connection_trip_routes = arrays['connection_trip_routes'].tolist()
+        self.connection_trip_services = arrays['connection_trip_services']
+        self.service_ids = arrays['service_ids'].tolist()
+        return True
+
+    def __init__(self, gtfs_path: str, max_walking_distance: float = 500, cache_variants: int = 3,
+                 content_hash: bool = False, build_workers: int = 1,
+                 on_progress: Optional[Callable[[str, float], None]] = None,
+                 instrumentation: Optional[Instrumentation] = None):
         """
         Initialize the GTFS trip planner
 
         Args:
             gtfs_path: Path to GTFS files
             max_walking_distance: Maximum walking distance between stops in meters
+            cache_variants: Number of cached networks (feed versions / parameters) to keep
+            content_hash: Fingerprint feed files by content instead of size and mtime
+            build_workers: Processes used to build the network, at most one per CPU; 1 builds serially
+            on_progress: Called with (stage, fraction done) as loading advances
+            instrumentation: Collects phase timings, counters and query traces; off by default
         """
         self.gtfs_path = gtfs_path
         self.max_walking_distance = max_walking_distance
+        self.cache_variants = cache_variants
+        self.content_hash = content_hash
+        self.build_workers = build_workers
+        self.on_progress = on_progress
+        self.instrumentation = instrumentation or Instrumentation()
+        self.load_progress = {'stage': 'starting', 'fraction': 0.0}
+        self.network_version = 0
         self.load_gtfs_data()
 
     def get_stop_details(self, stop_id: str) -> Tuple[str, float, float]:
         """Get stop name and coordinates"""
         stop_id = str(stop_id)  # Ensure stop_id is string
-        stop_data = self.stops[self.stops['stop_id'].astype(str) == stop_id]
+        position = self.stop_position.get(stop_id)
 
-        if stop_data.empty:
+        if position is None:
             raise ValueError(f"Stop ID {stop_id} not found in stops data")
 
-        stop = stop_data.iloc[0]
-        return stop['stop_name'], float(stop['stop_lat']), float(stop['stop_lon'])
+        return self.stop_names[position], float(self.stop_lats[position]), float(self.stop_lons[position])
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate distance between two points in meters using Haversine formula"""
         R = 6371000  # Earth's radius in meters
@@ -238,125 +1627,160 @@ class GTFSPlanner:
 
         return distance
 
+    def _serial_edge_keys(self, context: tuple, pbar) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read stop_times in chunks, keeping only compact integer columns. Rows are
+        sorted once over the whole file, so trips split across chunks stay whole.
+        """
+        chunk_size = 1000000  # Process 1M rows at a time
+        parts = []
+        for chunk in iter_table(self.gtfs_path, 'stop_times.txt', chunksize=chunk_size,
+                                columns=['trip_id', 'stop_id', 'stop_sequence']):
+            parts.append(_encode_stop_times(chunk, context))
+            pbar.update(len(chunk))
+
+        columns = list(zip(*parts)) or [[], [], []]
+        return _trip_edge_keys(*(_concat(column) for column in columns), context)
+
+    def _parallel_edge_keys(self, context: tuple, pbar, workers: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build the edge and membership keys with a process pool, one line-aligned
+        byte range of stop_times.txt per task.
+
+        Each worker reduces the trips of its range itself and only returns the
+        compact keys, plus the rows of the trips cut by the range bounds, which are
+        reduced here. stop_times.txt lists trips contiguously in practice; if some
+        trip turns up in more than one range, the file is built serially instead.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        path = f"{self.gtfs_path}/stop_times.txt"
+        header, ranges = _line_aligned_ranges(path, workers * 4)
+
+        edge_parts, member_parts, reduced_trips, range_trips, boundary_rows = [], [], [], [], []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_build_worker,
+                                 initargs=(context,)) as pool:
+            futures = [pool.submit(_reduce_byte_range, path, header, start, end) for start, end in ranges]
+            for future in futures:
+                rows, edges, members, trips, boundary = future.result()
+                edge_parts.append(edges)
+                member_parts.append(members)
+                reduced_trips.append(trips)
+                range_trips.extend([trips, np.unique(boundary[0])])
+                boundary_rows.append(boundary)
+                pbar.update(rows)
+
+        # A trip reduced by a worker must not have rows in any other range
+        trips, counts = np.unique(_concat(range_trips), return_counts=True)
+        if np.isin(trips[counts > 1], _concat(reduced_trips)).any():
+            print("stop_times.txt does not list trips contiguously; building serially")
+            pbar.reset()
+            return self._serial_edge_keys(context, pbar)
+
+        columns = list(zip(*boundary_rows)) or [[], [], []]
+        edges, members = _trip_edge_keys(*(_concat(column) for column in columns), context)
+        return np.unique(_concat(edge_parts + [edges])), np.unique(_concat(member_parts + [members]))
+
+    @staticmethod
+    def _expand_catalogs(from_stops: np.ndarray, to_stops: np.ndarray, catalogs: np.ndarray,
+                         catalog_ptr: np.ndarray, catalog_routes: np.ndarray):
+        """Repeat each (from, to, catalog) record once for every route in the catalog"""
+        counts = (catalog_ptr[catalogs + 1] - catalog_ptr[catalogs]).astype(np.int64)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        routes = catalog_routes[np.repeat(catalog_ptr[catalogs], counts) + offsets]
+        return np.repeat(from_stops, counts), np.repeat(to_stops, counts), routes
+
     def add_walking_connections(self):
         """Add walking connections between nearby stops"""
         print("\nAnalyzing walking connections...")
-        walking_edges = []
-        stops_df = self.stops.copy()
-
-        # Convert stop coordinates to float
-        stops_df['stop_lat'] = pd.to_numeric(stops_df['stop_lat'], errors='coerce')
-        stops_df['stop_lon'] = pd.to_numeric(stops_df['stop_lon'], errors='coerce')
-
-        # Remove stops with invalid coordinates
-        valid_stops = stops_df.dropna(subset=['stop_lat', 'stop_lon'])
-
-        # Create spatial index for efficient nearby stop finding
-        from rtree import index
-        idx = index.Index()
-        stop_coords = {}
-
-        # Build spatial index
-        for _, stop in valid_stops.iterrows():
-            stop_id = str(stop['stop_id'])
-            lat, lon = stop['stop_lat'], stop['stop_lon']
-            idx.insert(int(stop_id), (lon, lat, lon, lat))
-            stop_coords[stop_id] = (lat, lon)
-
-        # Find nearby stops
-        walking_connections = 0
-        for stop_id, (lat, lon) in stop_coords.items():
-            # Find potential nearby stops using spatial index
-            nearby = list(idx.intersection((
-                lon - 0.01,  # roughly 1km at equator
-                lat - 0.01,
-                lon + 0.01,
-                lat + 0.01
-            )))
-
-            for near_id in nearby:
-                near_id = str(near_id)
-                if near_id != stop_id:
-                    near_lat, near_lon = stop_coords[near_id]
-                    distance = self.calculate_distance(lat, lon, near_lat, near_lon)
-
-                    if distance <= self.max_walking_distance:
-                        # Add walking edge to network
-                        self.network.add_edge(stop_id, near_id,
-                                           weight=distance,
-                                           type='walking')
-                        walking_connections += 1
-
-                        # Add to direct connections with special walking route
-                        if stop_id not in self.direct_connections:
-                            self.direct_connections[stop_id] = {}
-                        if near_id not in self.direct_connections[stop_id]:
-                            self.direct_connections[stop_id][near_id] = set()
-                        self.direct_connections[stop_id][near_id].add('walking')
-
-        print(f"Added {walking_connections} walking connections")
-
-    def create_walking_trip(self, from_stop: str, to_stop: str, current_time: str) -> Trip:
-        """Create a walking trip between stops"""
+        # Skip stops with invalid coordinates
+        valid = ~(np.isnan(self.stop_lats) | np.isnan(self.stop_lons))
+        positions = np.flatnonzero(valid)
+
+        src, dst, _ = find_nearby_pairs(
+            self.stop_lats[valid],
+            self.stop_lons[valid],
+            self.max_walking_distance
+        )
+
+        # Add walking edges to network in both directions, served by the special walking route
+        from_stops = np.concatenate([positions[src], positions[dst]])
+        to_stops = np.concatenate([positions[dst], positions[src]])
+        walking = np.full(len(from_stops), self.route_position['walking'], dtype=np.int32)
+        self._edge_parts.append((from_stops, to_stops, walking))
+
+        print(f"Added {2 * len(src)} walking connections")
+
+    def create_walking_trip(self, from_stop: str, to_stop: str, current_time: int) -> Trip:
+        """Create a walking trip between stops, leaving at current_time (in seconds)"""
         # Get coordinates
         _, from_lat, from_lon = self.get_stop_details(from_stop)
         _, to_lat, to_lon = self.get_stop_details(to_stop)
 
-        # Calculate walking time (assuming 5 km/h walking speed)
+        # Calculate walking time at WALKING_SPEED
         distance = self.calculate_distance(from_lat, from_lon, to_lat, to_lon)
-        walking_time_minutes = int((distance / 5000) * 60)  # convert to minutes
-
-        # Calculate arrival time
-        h, m, s = map(int, current_time.split(':'))
-        total_minutes = h * 60 + m + walking_time_minutes
-        arrival_h = total_minutes // 60
-        arrival_m = total_minutes % 60
-        arrival_time = f"{arrival_h:02d}:{arrival_m:02d}:00"
+        walking_time = int(distance * 3600 / WALKING_SPEED)
 
         return Trip(
             route_id='walking',
             from_stop=from_stop,
             to_stop=to_stop,
             departure_time=current_time,
-            arrival_time=arrival_time,
+            arrival_time=current_time + walking_time,
             is_walking=True
         )
-    def find_path(self, start_stop: str, end_stop: str, start_time: str) -> List[Journey]:
-        """Find possible journeys between two stops"""
-        # Convert stop IDs to strings
+    def find_path(self, start_stop: str, end_stop: str, start_time: Union[str, int],
+                  date=None, max_paths: int = MAX_PATHS) -> List[Journey]:
+        """
+        Find possible journeys between two stops
+
+        Args:
+            start_stop: Origin stop ID
+            end_stop: Destination stop ID
+            start_time: Departure time (HH:MM:SS or seconds)
+            date: Service date (YYYYMMDD, YYYY-MM-DD or a date); None ignores the calendar
+            max_paths: Most fewest-hop stop sequences to try
+        """
+        # Convert stop IDs to strings and the start time to seconds
         start_stop = str(start_stop)
         end_stop = str(end_stop)
+        start_time = parse_time(start_time)
+        date = parse_date(date) if date is not None else None
+        for stop_id in (start_stop, end_stop):
+            if stop_id not in self.stop_position:
+                raise ValueError(f"Stop ID {stop_id} not found in stops data")
+
+        instrumentation = self.instrumentation
+        trace = instrumentation.start_trace('find_path', start_stop=start_stop, end_stop=end_stop,
+                                            start_time=start_time,
+                                            date=date.isoformat() if date is not None else None)
+        with instrumentation.phase('path_search'):
+            journeys = self._find_path(start_stop, end_stop, start_time, date, trace, max_paths)
+        instrumentation.finish_trace(trace, journeys=len(journeys))
+        return journeys
 
-        print(f"\nFinding paths from {start_stop} to {end_stop} starting at {start_time}")
-
-        # Get stop names for better output
-        start_name = self.get_stop_details(start_stop)[0]
-        end_name = self.get_stop_details(end_stop)[0]
-        print(f"From: {start_name} to {end_name}")
-
+    def _find_path(self, start_stop: str, end_stop: str, start_time: int, date,
+                   trace: Optional[Dict], max_paths: int) -> List[Journey]:
+        """find_path for normalized arguments; records events into trace unless it is None"""
+        instrumentation = self.instrumentation
         if start_stop == end_stop:
-            print("Start and end stops are the same!")
             return []
 
-        if not nx.has_path(self.network, start_stop, end_stop):
-            print("No path exists between these stops!")
+        # Find shortest paths in terms of stops
+        paths = shortest_paths(self.direct_connections.adj_indptr, self.direct_connections.adj_indices,
+                               self.stop_position[start_stop], self.stop_position[end_stop], max_paths)
+        if not paths:
             return []
 
-        # Find shortest paths in terms of stops
-        paths = list(nx.all_shortest_paths(self.network, start_stop, end_stop))
-        print(f"Found {len(paths)} possible paths")
+        paths = [[str(self.stop_ids[stop]) for stop in path] for path in paths]
+        instrumentation.count('paths_examined', len(paths))
 
         journeys = []
-        for path_idx, path in enumerate(paths, 1):
-            print(f"\nAnalyzing path {path_idx}/{len(paths)}:")
-
-            # Convert path stops to strings and print
-            path = [str(stop) for stop in path]  # Convert all stops in path to strings
-            path_stops = []
-            for stop_id in path:
-                stop_name = self.get_stop_details(stop_id)[0]
-                path_stops.append(f"{stop_id} ({stop_name})")
-            print("Stops:", ' -> '.join(path_stops))
+        for path in paths:
+            path_trace = None
+            if trace is not None:
+                path_trace = {'stops': path, 'segments': []}
+                trace['events'].append(path_trace)
 
             # Convert path to trips
             trips = []
@@ -365,27 +1789,17 @@ class GTFSPlanner:
             total_walking = 0
 
             for i in range(len(path) - 1):
-                from_stop = path[i]  # Already string from earlier conversion
-                to_stop = path[i + 1]  # Already string from earlier conversion
-
-                # Get stop names for output
-                from_name = self.get_stop_details(from_stop)[0]
-                to_name = self.get_stop_details(to_stop)[0]
-                print(f"\n  Finding connection from {from_name} to {to_name} after {current_time}")
+                from_stop = path[i]
+                to_stop = path[i + 1]
 
                 try:
                     # Find routes that connect these stops
                     possible_routes = self.direct_connections[from_stop][to_stop]
-                    # Convert routes to strings for display
-                    routes_display = ', '.join(str(route) for route in possible_routes)
-                    print(f"  Found {len(possible_routes)} possible routes: {routes_display}")
-
                     next_trip = None
 
                     # Check for walking option (ensure string comparison)
                     if 'walking' in {str(r) for r in possible_routes}:
                         walking_trip = self.create_walking_trip(from_stop, to_stop, current_time)
-                        print(f"  Walking option available: {walking_trip.departure_time} -> {walking_trip.arrival_time}")
                         next_trip = walking_trip
                         total_walking += self.calculate_distance(
                             *self.get_stop_details(from_stop)[1:],
@@ -395,38 +1809,48 @@ class GTFSPlanner:
                     # If not walking or if we want to check for better transit options
                     transit_routes = {str(r) for r in possible_routes if str(r) != 'walking'}
                     if transit_routes:
-                        transit_trip = self._find_next_trip(from_stop, to_stop, current_time, transit_routes)
-                        if transit_trip and (not next_trip or
-                                           self._time_diff(current_time, transit_trip.arrival_time) <
-                                           self._time_diff(current_time, next_trip.arrival_time)):
+                        with instrumentation.phase('trip_fitting'):
+                            transit_trip = self._find_next_trip(from_stop, to_stop, current_time,
+                                                                transit_routes, date)
+                        if transit_trip and (not next_trip or transit_trip.arrival_time < next_trip.arrival_time):
                             next_trip = transit_trip
 
+                    if path_trace is not None:
+                        path_trace['segments'].append({
+                            'from_stop': from_stop, 'to_stop': to_stop, 'after': current_time,
+                            'routes': sorted(str(route) for route in possible_routes),
+                            'selected': next_trip.route_id if next_trip else None,
+                            'departure_time': next_trip.departure_time if next_trip else None,
+                            'arrival_time': next_trip.arrival_time if next_trip else None,
+                        })
+                    instrumentation.count('segments_fitted')
+
                     if next_trip:
-                        route_display = 'Walking' if next_trip.is_walking else f'Route {str(next_trip.route_id)}'
-                        print(f"  Selected: {route_display} "
-                              f"({next_trip.departure_time} -> {next_trip.arrival_time})")
                         trips.append(next_trip)
                         current_time = next_trip.arrival_time
                     else:
-                        print("  No valid connection found for this segment")
                         path_valid = False
                         break
 
                 except Exception as e:
-                    print(f"  Error processing connection: {str(e)}")
+                    print(f"  Error processing connection {from_stop} -> {to_stop}: {str(e)}")
+                    if path_trace is not None:
+                        path_trace['segments'].append({'from_stop': from_stop, 'to_stop': to_stop,
+                                                       'error': str(e)})
                     path_valid = False
                     break
 
             if path_valid and trips and len(trips) == len(path) - 1:
                 total_time = self._calculate_journey_time(trips)
-                journeys.append(Journey(trips=trips, total_time=total_time, total_walking=total_walking))
-                print(f"\nValid journey found! Total time: {total_time} minutes, Walking: {total_walking:.0f}m")
-            else:
-                print("\nPath invalid or incomplete")
+                journeys.append(Journey(trips=trips, total_time=total_time, total_walking=total_walking,
+                                        transfers=self._count_transfers(trips)))
+                if path_trace is not None:
+                    path_trace['total_time'] = total_time
+            elif path_trace is not None:
+                path_trace['total_time'] = None
 
         # Sort journeys by total time
         journeys.sort(key=lambda x: x.total_time)
-        print(f"\nFound {len(journeys)} valid journeys")
         return journeys
 
     def build_network(self):
@@ -434,130 +1858,95 @@ class GTFSPlanner:
         print("\nBuilding transit network...")
         from tqdm import tqdm
 
-        # Create graph for finding connected stops
-        self.network = nx.Graph()
-        self.stop_routes = defaultdict(set)
-        self.route_stops = defaultdict(set)
-        self.direct_connections = {}
+        # Edge and route-membership records as integer positions, turned into CSR
+        # tables once all trips and walking connections are collected
+        self._edge_parts = []
+        self._member_parts = []
 
         # Build route catalog mapping - use first 5 digits as per docs
         print("Creating route catalog lookup...")
-        route_catalog = defaultdict(set)
-        catalog_to_routes = defaultdict(set)
-        for _, route in self.routes.iterrows():
-            route_id = str(route['route_id'])
-            desc = str(route['route_desc'])
-            # According to docs, route_desc contains "line catalog number-direction-alternative"
-            if '-' in desc:
-                catalog_num = desc.split('-')[0]  # Get first 5 digits
-                route_catalog[route_id] = catalog_num
-                catalog_to_routes[catalog_num].add(route_id)
-
-        # Create trip to route lookup for faster access
+        route_ids = self.routes['route_id'].astype(str)
+        descs = self.routes['route_desc'].astype(str)
+        # According to docs, route_desc contains "line catalog number-direction-alternative"
+        catalog_nums = descs.str.split('-').str[0].where(descs.str.contains('-', regex=False))
+        catalog_codes, _ = pd.factorize(catalog_nums)  # -1 for routes without a catalog number
+
+        # All routes of each catalog, as CSR over catalog codes
+        route_positions = pd.Index(self.route_ids).get_indexer(route_ids)
+        has_catalog = catalog_codes >= 0
+        catalog_ptr, catalog_routes = to_csr(catalog_codes[has_catalog], route_positions[has_catalog],
+                                             int(catalog_codes.max()) + 1)
+        route_catalog = pd.Series(catalog_codes, index=route_ids)
+        route_catalog = route_catalog[~route_catalog.index.duplicated(keep='last')]
+
+        # Catalog of every trip, through its route
         print("Creating trip-route lookup...")
-        trip_route_lookup = dict(zip(
-            self.trips['trip_id'].astype(str),
-            self.trips['route_id'].astype(str)
-        ))
+        trip_catalog = pd.Series(
+            self.trips['route_id'].astype(str).map(route_catalog).fillna(-1).to_numpy(np.int64),
+            index=self.trips['trip_id'].astype(str)
+        )
+        trip_catalog = trip_catalog[~trip_catalog.index.duplicated(keep='last')]
+        trip_index = trip_catalog.index
+        trip_catalog = trip_catalog.to_numpy()
 
-        # Process stop_times in chunks
+        # Reduce stop_times to unique (from, to, catalog) edges and (stop, catalog)
+        # memberships, packed into int64 keys
         print("Processing stop_times...")
-        chunk_size = 1000000  # Process 1M rows at a time
-        processed_trips = set()
+        n_stops, n_catalogs = len(self.stop_ids), len(catalog_ptr)
+        stop_lookup = pd.Index(list(self.stop_position))
+        stop_lookup_positions = np.fromiter(self.stop_position.values(), dtype=np.int32,
+                                            count=len(self.stop_position))
+        context = (trip_index, trip_catalog, stop_lookup, stop_lookup_positions, n_stops, n_catalogs)
 
         with tqdm(total=sum(1 for _ in open(f"{self.gtfs_path}/stop_times.txt")) - 1) as pbar:
-            for chunk in pd.read_csv(
-                f"{self.gtfs_path}/stop_times.txt",
-                chunksize=chunk_size,
-                usecols=['trip_id', 'stop_id', 'stop_sequence']
-            ):
-                # Convert IDs to strings
-                chunk['trip_id'] = chunk['trip_id'].astype(str)
-                chunk['stop_id'] = chunk['stop_id'].astype(str)
-
-                # Group by trip and process
-                for trip_id, trip_stops in chunk.groupby('trip_id'):
-                    if trip_id in processed_trips:
-                        continue
-
-                    processed_trips.add(trip_id)
-                    route_id = trip_route_lookup.get(trip_id)
-                    if not route_id:
-                        continue
-
-                    # Get catalog number for this route
-                    catalog_num = route_catalog.get(str(route_id))
-                    if not catalog_num:
-                        continue
-
-                    # Get all related routes from same catalog
-                    related_routes = catalog_to_routes[catalog_num]
-
-                    # Sort stops by sequence
-                    stops = trip_stops.sort_values('stop_sequence')['stop_id'].tolist()
-
-                    # Add to route-stop mappings
-                    for stop_id in stops:
-                        # Add all related routes to this stop
-                        self.stop_routes[stop_id].update(related_routes)
-                        for r_id in related_routes:
-                            self.route_stops[r_id].add(stop_id)
-
-                    # Add edges between consecutive stops
-                    for i in range(len(stops) - 1):
-                        from_stop = stops[i]
-                        to_stop = stops[i + 1]
-
-                        self.network.add_edge(from_stop, to_stop)
-
-                        # Add to direct connections with all related routes
-                        for a, b in [(from_stop, to_stop), (to_stop, from_stop)]:
-                            if a not in self.direct_connections:
-                                self.direct_connections[a] = {}
-                            if b not in self.direct_connections[a]:
-                                self.direct_connections[a][b] = set()
-                            self.direct_connections[a][b].update(related_routes)
-
-                pbar.update(len(chunk))
+            workers = min(self.build_workers, os.cpu_count() or 1)
+            if workers > 1:
+                edges, members = self._parallel_edge_keys(context, pbar, workers)
+            else:
+                edges, members = self._serial_edge_keys(context, pbar)
+
+        # Expand each catalog into its routes
+        pairs, edge_catalogs = np.divmod(edges, n_catalogs)
+        from_stops, to_stops = np.divmod(pairs, n_stops)
+        edge_from, edge_to, edge_route = self._expand_catalogs(from_stops, to_stops, edge_catalogs,
+                                                               catalog_ptr, catalog_routes)
+        self._edge_parts.append((edge_from, edge_to, edge_route))
+        self._edge_parts.append((edge_to, edge_from, edge_route))
+
+        # Add all related routes to every stop
+        member_stops, member_catalogs = np.divmod(members, n_catalogs)
+        member_stop, _, member_route = self._expand_catalogs(member_stops, member_stops, member_catalogs,
+                                                             catalog_ptr, catalog_routes)
+        self._member_parts.append((member_stop, member_route))
 
         # Add walking connections
         print("\nAdding walking connections...")
         self.add_walking_connections()
 
+        edge_parts = list(zip(*self._edge_parts)) or [[np.empty(0, np.int32)]] * 3
+        member_parts = list(zip(*self._member_parts)) or [[np.empty(0, np.int32)]] * 2
+        self.network_arrays = build_network_arrays(
+            self.stop_ids, self.route_ids,
+            *(np.concatenate(part) for part in edge_parts),
+            *(np.concatenate(part) for part in member_parts)
+        )
+        del self._edge_parts, self._member_parts
+        self._attach_network(self.network_arrays)
+
+        degree = np.diff(self.network_arrays['adj_indptr'])
         print(f"\nNetwork statistics:")
-        print(f"- Nodes (stops): {len(self.network.nodes):,}")
-        print(f"- Edges (connections): {len(self.network.edges):,}")
+        print(f"- Nodes (stops): {np.count_nonzero(degree):,}")
+        print(f"- Edges (connections): {len(self.network_arrays['adj_indices']) // 2:,}")
         print(f"- Routes: {len(self.route_stops):,}")
-        print(f"- Direct connections: {sum(len(to_stops) for to_stops in self.direct_connections.values()):,}")
+        print(f"- Direct connections: {len(self.network_arrays['adj_indices']):,}")
 
-        # Cache the network
-        print("\nCaching network for future use...")
-        os.makedirs('cache', exist_ok=True)
-        cache_file = os.path.join('cache', 'network_data.pkl')
-
-        # Convert sets to lists for pickling
-        cache_data = {
-            'edges': list(self.network.edges()),
-            'stop_routes': {k: list(v) for k, v in self.stop_routes.items()},
-            'route_stops': {k: list(v) for k, v in self.route_stops.items()},
-            'direct_connections': {
-                from_stop: {
-                    to_stop: list(routes)
-                    for to_stop, routes in to_stops.items()
-                }
-                for from_stop, to_stops in self.direct_connections.items()
-            }
-        }
-
-        with open(cache_file, 'wb') as f:
-            pickle.dump(cache_data, f)
-        print("✓ Network cached successfully")
 def example_usage():
     """Example usage of the trip planner"""
     print("Starting GTFS Processing Example...")
 
-    # Initialize planner with 800m max walking distance
-    planner = GTFSPlanner("israel-public-transportation", max_walking_distance=800)
+    # Initialize planner with 800m max walking distance, timing its phases and tracing queries
+    planner = GTFSPlanner("israel-public-transportation", max_walking_distance=800,
+                          instrumentation=Instrumentation(enabled=True, trace=True))
 
     # Find busy stops based on how many routes serve them
     print("\nFinding frequently served stops...")
@@ -587,7 +1976,7 @@ def example_usage():
             print("\nFound journeys (showing top 3):")
             for i, journey in enumerate(journeys[:3], 1):
                 print(f"\nJourney {i}:")
-                print(f"Total time: {journey.total_time} minutes")
+                print(f"Total time: {journey.total_time // 60} minutes")
                 print(f"Total walking: {journey.total_walking:.0f} meters")
 
                 for j, trip in enumerate(journey.trips, 1):
@@ -598,12 +1987,12 @@ def example_usage():
                         print(f"\n  Leg {j}:")
                         if trip.is_walking:
                             print(f"    WALK: {from_name} -> {to_name}")
-                            print(f"    Time: {trip.departure_time} -> {trip.arrival_time}")
+                            print(f"    Time: {format_time(trip.departure_time)} -> {format_time(trip.arrival_time)}")
                         else:
-                            route_name = planner.routes[planner.routes['route_id'] == trip.route_id]['route_short_name'].iloc[0]
+                            route_name = planner.routes[planner.routes['route_id'].astype(str) == trip.route_id]['route_short_name'].iloc[0]
                             print(f"    Route {route_name}")
-                            print(f"    From: {from_name} at {trip.departure_time}")
-                            print(f"    To: {to_name} at {trip.arrival_time}")
+                            print(f"    From: {from_name} at {format_time(trip.departure_time)}")
+                            print(f"    To: {to_name} at {format_time(trip.arrival_time)}")
 
                     except Exception as e:
                         print(f"  Leg {j}: Error getting details - {str(e)}")
@@ -613,5 +2002,9 @@ def example_usage():
     except Exception as e:
         print(f"\nError planning journey: {str(e)}")
 
+    print("\nInstrumentation:")
+    for line in planner.instrumentation.summary():
+        print(f"- {line}")
+
 if __name__ == "__main__":
     example_usage()
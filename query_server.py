@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import signal
+import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from journey_cache import BucketProfile, JourneyCache, build_profile
+from plan import GTFSPlanner, Journey, format_time
+
+# The planner queries are answered with: the server's own in thread workers, one
+# loaded from the network cache in every worker process
+_server_planner: Optional[GTFSPlanner] = None
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+def journey_to_dict(journey: Journey) -> Dict:
+    """JSON-friendly form of a Journey, with HH:MM:SS times alongside the seconds"""
+    result = asdict(journey)
+    for trip in result['trips']:
+        trip['departure'] = format_time(trip['departure_time'])
+        trip['arrival'] = format_time(trip['arrival_time'])
+    return result
+
+
+def _init_worker(gtfs_path: str, planner_options: Dict, started):
+    """Process pool initializer: load the planner and report this worker's pid"""
+    global _server_planner
+    _server_planner = GTFSPlanner(gtfs_path, **planner_options)
+    started.put(os.getpid())
+
+
+def _worker_ready():
+    """A no-op job: submitting one per worker makes a pool start all of them"""
+
+
+def answer_query(params: Dict[str, str]) -> Dict:
+    """
+    Run one routing query against the worker's planner.
+
+    Params: from, to, time (HH:MM:SS), optional date, and mode, one of
+    fastest (default), paths, pareto or profile (which also needs until).
+    """
+    planner = _server_planner
+    start, end = params['from'], params['to']
+    start_time = params.get('time', '08:00:00')
+    date = params.get('date')
+    mode = params.get('mode', 'fastest')
+
+    if mode == 'fastest':
+        journeys = planner.find_fastest_path(start, end, start_time, date)
+    elif mode == 'paths':
+        journeys = planner.find_path(start, end, start_time, date)
+    elif mode == 'pareto':
+        journeys = planner.find_pareto_paths(start, end, start_time, date)
+    elif mode == 'profile':
+        journeys = planner.find_profile(start, end, start_time, params['until'], date)
+    else:
+        raise ValueError(f"Unknown mode {mode}")
+
+    return {'from': start, 'to': end, 'mode': mode, 'journeys': [journey_to_dict(j) for j in journeys]}
+
+
+def find_fastest(start: str, end: str, start_time: str, date: Optional[str]) -> List[Journey]:
+    """find_fastest_path in a worker, returning the journeys for the parent's JourneyCache"""
+    return _server_planner.find_fastest_path(start, end, start_time, date)
+
+
+def build_cache_profile(key: Tuple, bucket_seconds: int) -> BucketProfile:
+    """Compute a JourneyCache bucket profile in a worker; the parent stores it"""
+    start, end, bucket_start, date = key
+    return build_profile(_server_planner, start, end, bucket_start, bucket_seconds, date)
+
+
+class QueryServer:
+    """
+    Local HTTP/JSON routing service around one warm GTFSPlanner.
+
+    The planner loads in the background while /health and /ready already answer;
+    queries are answered by a pool of worker processes, so the event loop stays
+    free. Workers are started by a fork server rather than forked from this
+    multithreaded process, and each loads the planner from the network cache the
+    server wrote (threads share the server's planner where there is no fork server).
+    Fastest-journey queries go through a JourneyCache kept in the server process;
+    a miss runs one find_fastest_path in a worker, and the profile of a hot bucket
+    is built in the background. A query still running after query_timeout seconds
+    gets a 504, and the pool it runs in is replaced, killing its processes so the
+    stuck worker does not hold on to a slot; queries the other workers were
+    running are retried on the new pool.
+
+    Endpoints:
+        GET /health  liveness
+        GET /ready   200 once the planner is loaded, 503 with load progress before
+        GET /cache   journey cache counters
+        GET /path?from=..&to=..&time=..[&date=..][&mode=..][&until=..]
+        POST /path   the same parameters as a JSON object
+    """
+
+    def __init__(self, gtfs_path: str, workers: Optional[int] = None, cache_entries: int = 1024,
+                 query_timeout: float = 30.0, **planner_options):
+        self.gtfs_path = gtfs_path
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_entries = cache_entries
+        self.query_timeout = query_timeout
+        self.planner_options = planner_options
+        self.pool: Optional[Executor] = None
+        self.cache: Optional[JourneyCache] = None
+        self._worker_pids: Dict[Executor, object] = {}  # pool -> queue its workers report their pids to
+        self._warming: Dict[Executor, list] = {}  # pool -> one no-op job per worker, done once it is started
+        self._profiling: Dict[Tuple, asyncio.Task] = {}
+        self.status = {'ready': False, 'stage': 'starting', 'progress': 0.0, 'error': None}
+
+    def _on_progress(self, stage: str, fraction: float):
+        self.status.update(stage=stage, progress=fraction)
+
+    def _load(self):
+        """Load the planner and start the worker pool (runs in a background thread)"""
+        global _server_planner
+        try:
+            _server_planner = GTFSPlanner(self.gtfs_path, on_progress=self._on_progress, **self.planner_options)
+            self.cache = JourneyCache(_server_planner, max_entries=self.cache_entries)
+            self._on_progress('starting workers', 1.0)
+            self.pool = self._start_pool()
+            for future in self._warming[self.pool]:
+                future.result()
+            self.status['ready'] = True
+        except Exception as e:
+            traceback.print_exc()
+            self.status.update(stage='failed', error=str(e))
+
+    def _start_pool(self) -> Executor:
+        """
+        Worker processes from a fork server, which start loading the planner right
+        away; threads sharing the server's planner where there is no fork server
+        """
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            started = context.SimpleQueue()
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                       initargs=(self.gtfs_path, self.planner_options, started))
+            self._worker_pids[pool] = started
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._warming[pool] = [pool.submit(_worker_ready) for _ in range(self.workers)]
+        return pool
+
+    def _recycle_pool(self, pool: Executor):
+        """
+        Replace a pool with a worker stuck on a timed-out query, killing its processes.
+        Threads cannot be killed; a stuck thread finishes in the background.
+        """
+        if self.pool is not pool:
+            return  # Already replaced after another timeout
+        self.pool = self._start_pool()
+        pool.shutdown(wait=False, cancel_futures=True)
+        del self._warming[pool]
+        started = self._worker_pids.pop(pool, None)
+        while started is not None and not started.empty():
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(started.get(), signal.SIGTERM)
+
+    async def _run(self, function, *args, retry: bool = True):
+        """Run function in a worker; raises asyncio.TimeoutError after query_timeout seconds"""
+        pool = self.pool
+        try:
+            # Workers of a new pool load the planner first, which is not part of the query
+            for future in self._warming[pool]:
+                await asyncio.wrap_future(future)
+            return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(pool, function, *args),
+                                          self.query_timeout)
+        except asyncio.TimeoutError:
+            self._recycle_pool(pool)
+            raise
+        except BrokenProcessPool:
+            # Killed along with a stuck query on the same pool
+            if not retry or self.pool is pool:
+                raise
+            return await self._run(function, *args, retry=False)
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        """Route one request to its handler and return (status code, JSON payload)"""
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok'}
+        if url.path == '/ready':
+            return (200 if self.status['ready'] else 503), dict(self.status)
+        if url.path == '/cache':
+            return 200, self.cache.stats() if self.cache is not None else {}
+        if url.path != '/path':
+            return 404, {'error': f"Unknown endpoint {url.path}"}
+        if method not in ('GET', 'POST'):
+            return 405, {'error': f"Method {method} not allowed"}
+        if not self.status['ready']:
+            return 503, dict(self.status)
+
+        try:
+            params = dict(parse_qsl(url.query))
+            if method == 'POST' and body:
+                params.update({key: str(value) for key, value in json.loads(body).items()})
+            if 'from' not in params or 'to' not in params:
+                return 400, {'error': "Parameters 'from' and 'to' are required"}
+            if params.get('mode', 'fastest') == 'fastest':
+                return 200, await self._cached_fastest(params)
+            return 200, await self._run(answer_query, params)
+        except (ValueError, KeyError) as e:
+            return 400, {'error': str(e)}
+        except asyncio.TimeoutError:
+            return 504, {'error': f"Query did not finish within {self.query_timeout:g}s"}
+        except Exception as e:
+            traceback.print_exc()
+            return 500, {'error': str(e)}
+
+    async def _cached_fastest(self, params: Dict[str, str]) -> Dict:
+        """Answer a fastest-journey query from the cache, filling it from a worker on a miss"""
+        start, end = params['from'], params['to']
+        start_time = params.get('time', '08:00:00')
+        date = params.get('date')
+        journeys = self.cache.lookup(start, end, start_time, date)
+        if journeys is None:
+            key = self.cache.key(start, end, start_time, date)
+            journeys = await self._run(find_fastest, start, end, start_time, date)
+            self.cache.store_answer(key, start_time, journeys)
+            if self.cache.is_hot(key) and key not in self._profiling:
+                self._profiling[key] = asyncio.ensure_future(self._fill_profile(key))
+        return {'from': start, 'to': end, 'mode': 'fastest', 'journeys': [journey_to_dict(j) for j in journeys]}
+
+    async def _fill_profile(self, key: Tuple):
+        """Build the profile of a hot cache bucket in a worker, without holding up any request"""
+        try:
+            self.cache.store_profile(key, await self._run(build_cache_profile, key, self.cache.bucket_seconds))
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            del self._profiling[key]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive between requests"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split(maxsplit=2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                status, payload = await self._dispatch(method.upper(), target, body)
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and not version.strip().upper().endswith('1.0'))
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        """Start listening right away and load the planner in the background"""
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"Listening on http://{host}:{port}")
+        loading = asyncio.get_running_loop().run_in_executor(None, self._load)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await loading
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve GTFS journey queries over HTTP")
+    parser.add_argument('--gtfs', default="israel-public-transportation", help="Path to the GTFS files")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None, help="Query worker processes (default: CPU count)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds a query may run before a 504")
+    args = parser.parse_args()
+
+    asyncio.run(QueryServer(args.gtfs, workers=args.workers, query_timeout=args.timeout).serve(args.host, args.port))
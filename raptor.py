@@ -0,0 +1,293 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+UNREACHED = 2 ** 31 - 1
+KEY_SPAN = 1 << 24  # Above any time in seconds; packs (hop column, time) into one sort key
+
+# First field of a RAPTOR label that is not a ride (rides hold their hop column there)
+WALK, NO_LABEL, ORIGIN = -1, -2, -3
+
+
+def _segment_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenated ranges start..start + length - 1"""
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(offsets - starts, lengths)
+
+
+class RoutePatterns:
+    """
+    One day's connections regrouped into route patterns for RAPTOR.
+
+    Trips running the same sequence of hops form a pattern. Trips that overtake each
+    other are split into separate patterns, so within a pattern a later trip never
+    departs or arrives earlier at any hop. Patterns are stored hop-major: hop column c
+    (of pattern col_pattern[c]) holds its trips' times at
+    dep[col_time[c]:col_time[c] + col_trips[c]], earliest trip first.
+    """
+
+    def __init__(self, connections: Tuple[np.ndarray, ...], n_stops: int):
+        """
+        Args:
+            connections: (dep, arr, from, to, trip) connection arrays, sorted by
+                departure, from GTFSPlanner._connections
+            n_stops: Number of stops
+        """
+        conn_dep, conn_arr, conn_from, conn_to, conn_trip = connections
+        # Connections are sorted by (departure, arrival, stop sequence), so a stable
+        # sort by trip lists each trip's hops in order
+        order = np.argsort(conn_trip, kind='stable')
+        self._hop_dep = conn_dep[order].astype(np.int64)
+        self._hop_arr = conn_arr[order].astype(np.int64)
+        self._hop_from = conn_from[order].astype(np.int64)
+        self._hop_to = conn_to[order].astype(np.int64)
+        trips = conn_trip[order]
+
+        starts = np.flatnonzero(np.diff(trips, prepend=-1)) if len(trips) else np.empty(0, np.int64)
+        self._trip_starts = starts
+        self._trip_lengths = np.diff(np.append(starts, len(trips)))
+        self._trip_numbers = trips[starts].astype(np.int64)
+        self._hop_rank = np.arange(len(trips)) - np.repeat(starts, self._trip_lengths)
+
+        # Trips with identical hop sequences share a pattern
+        hops = np.stack([self._hop_from, self._hop_to], axis=1).astype(np.int32).tobytes()
+        ids: Dict[bytes, int] = {}
+        patterns = [ids.setdefault(hops[start * 8:(start + length) * 8], len(ids))
+                    for start, length in zip(starts.tolist(), self._trip_lengths.tolist())]
+        trip_patterns = np.array(patterns, dtype=np.int64)
+
+        self._layout(trip_patterns)
+        overtaken = self._overtaken_patterns()
+        if len(overtaken):
+            self._layout(self._split_overtaking(trip_patterns, overtaken))
+
+        # Hop columns by boarding stop, to find the patterns serving marked stops
+        by_stop = np.argsort(self.col_from, kind='stable')
+        self.stop_cols_ptr = np.zeros(n_stops + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.col_from, minlength=n_stops), out=self.stop_cols_ptr[1:])
+        self.stop_cols = by_stop
+        del self._hop_dep, self._hop_arr, self._hop_from, self._hop_to, self._hop_rank
+
+    def _layout(self, trip_patterns: np.ndarray):
+        """Place every hop of every trip into its pattern's hop-major time tables"""
+        n_patterns = int(trip_patterns.max()) + 1 if len(trip_patterns) else 0
+        first_dep = self._hop_dep[self._trip_starts] if len(self._trip_starts) else np.empty(0, np.int64)
+        trip_order = np.lexsort((self._trip_numbers, first_dep, trip_patterns))
+
+        pattern_trips = np.bincount(trip_patterns, minlength=n_patterns)
+        pattern_hops = np.zeros(n_patterns, dtype=np.int64)
+        pattern_hops[trip_patterns] = self._trip_lengths
+        trip_offsets = np.cumsum(pattern_trips) - pattern_trips
+        rank = np.empty(len(trip_order), dtype=np.int64)
+        rank[trip_order] = np.arange(len(trip_order)) - np.repeat(trip_offsets, pattern_trips)
+
+        self.pattern_trip_ptr = np.append(trip_offsets, len(trip_order))
+        self.pattern_trip_numbers = self._trip_numbers[trip_order]
+        self.pattern_col_ptr = np.append(0, np.cumsum(pattern_hops))
+        time_offsets = np.append(0, np.cumsum(pattern_trips * pattern_hops))
+
+        n_cols = int(self.pattern_col_ptr[-1])
+        self.col_pattern = np.repeat(np.arange(n_patterns), pattern_hops)
+        self.col_leg = np.arange(n_cols) - self.pattern_col_ptr[self.col_pattern]
+        self.col_trips = pattern_trips[self.col_pattern]
+        self.col_time = time_offsets[self.col_pattern] + self.col_leg * self.col_trips
+
+        # Every hop of trip (pattern p, rank r) at leg l lands at col_time[c] + r
+        hop_trip = np.repeat(np.arange(len(self._trip_starts)), self._trip_lengths)
+        hop_pattern = trip_patterns[hop_trip]
+        hop_col = self.pattern_col_ptr[hop_pattern] + self._hop_rank
+        slots = self.col_time[hop_col] + rank[hop_trip]
+        self.dep = np.empty(len(slots), dtype=np.int64)
+        self.arr = np.empty(len(slots), dtype=np.int64)
+        self.dep[slots] = self._hop_dep
+        self.arr[slots] = self._hop_arr
+        self.col_from = np.empty(n_cols, dtype=np.int64)
+        self.col_to = np.empty(n_cols, dtype=np.int64)
+        self.col_from[hop_col] = self._hop_from
+        self.col_to[hop_col] = self._hop_to
+
+        # (column, departure) sort keys; FIFO patterns keep them ascending
+        self.keys = np.repeat(np.arange(n_cols, dtype=np.int64), self.col_trips) * KEY_SPAN + self.dep
+        self._max_trips = int(pattern_trips.max()) if n_patterns else 0
+        self._max_hops = int(pattern_hops.max()) if n_patterns else 0
+
+    def _overtaken_patterns(self) -> np.ndarray:
+        """Patterns where some trip departs or arrives before the trip ahead of it"""
+        if not len(self.dep):
+            return np.empty(0, np.int64)
+        slot_cols = np.repeat(np.arange(len(self.col_time)), self.col_trips)
+        later = np.ones(len(self.dep), dtype=bool)
+        later[self.col_time] = False
+        backwards = later & ((np.diff(self.dep, prepend=0) < 0) | (np.diff(self.arr, prepend=0) < 0))
+        return np.unique(self.col_pattern[slot_cols[backwards]])
+
+    def _split_overtaking(self, trip_patterns: np.ndarray, overtaken: np.ndarray) -> np.ndarray:
+        """Reassign the trips of overtaken patterns to FIFO sub-patterns, first fit in departure order"""
+        trip_patterns = trip_patterns.copy()
+        trip_of_number = {number: trip for trip, number in enumerate(self._trip_numbers.tolist())}
+        next_pattern = int(trip_patterns.max()) + 1
+        for pattern in overtaken.tolist():
+            n_trips = int(self.pattern_trip_ptr[pattern + 1] - self.pattern_trip_ptr[pattern])
+            cols = np.arange(self.pattern_col_ptr[pattern], self.pattern_col_ptr[pattern + 1])
+            slots = self.col_time[cols][None, :] + np.arange(n_trips)[:, None]
+            deps, arrs = self.dep[slots], self.arr[slots]
+
+            lasts: List[Tuple[np.ndarray, np.ndarray, int]] = []
+            numbers = self.pattern_trip_numbers[self.pattern_trip_ptr[pattern]:self.pattern_trip_ptr[pattern + 1]]
+            for row, number in enumerate(numbers.tolist()):
+                for i, (last_dep, last_arr, sub) in enumerate(lasts):
+                    if (last_dep <= deps[row]).all() and (last_arr <= arrs[row]).all():
+                        lasts[i] = (deps[row], arrs[row], sub)
+                        break
+                else:
+                    sub = pattern if not lasts else next_pattern
+                    next_pattern += bool(lasts)
+                    lasts.append((deps[row], arrs[row], sub))
+                trip_patterns[trip_of_number[number]] = sub
+        return trip_patterns
+
+    def trip_number(self, col: int, rank: int) -> int:
+        """Connection trip number of the trip at rank in the pattern of a hop column"""
+        return int(self.pattern_trip_numbers[self.pattern_trip_ptr[self.col_pattern[col]] + rank])
+
+
+def _improve(best: np.ndarray, stops: np.ndarray, arrivals: np.ndarray, labels: np.ndarray,
+             rows: np.ndarray, seen: np.ndarray) -> np.ndarray:
+    """
+    Lower best at stops to the smallest of their candidate arrivals and label each
+    improved stop with a winning candidate's row. Returns the improved stops, sorted.
+    """
+    np.minimum.at(best, stops, arrivals)
+    winning = arrivals == best[stops]
+    labels[stops[winning]] = rows[winning]
+    seen[stops[winning]] = True
+    improved = np.flatnonzero(seen)
+    seen[improved] = False
+    return improved
+
+
+def _relax_walks(frontier: np.ndarray, best: np.ndarray, bound: int, labels: np.ndarray,
+                 footpaths: Tuple[np.ndarray, np.ndarray], seen: np.ndarray) -> np.ndarray:
+    """
+    Walk on from newly improved stops until no arrival improves; chains of footpaths
+    are followed within the round. Returns the stops improved on foot, sorted.
+    """
+    walk_to, walk_secs = footpaths
+    walked = np.zeros(len(best), dtype=bool)
+    while len(frontier):
+        targets = walk_to[frontier]
+        arrivals = best[frontier][:, None] + walk_secs[frontier]
+        better = arrivals < np.minimum(best[targets], bound)
+        rows, _ = better.nonzero()
+        if not len(rows):
+            break
+        targets, arrivals = targets[better], arrivals[better]
+        np.minimum.at(best, targets, arrivals)
+        winning = arrivals == best[targets]
+        winners = targets[winning]
+        labels[winners, 1] = frontier[rows[winning]]
+        seen[winners] = True
+        frontier = np.flatnonzero(seen)
+        seen[frontier] = False
+        walked[frontier] = True
+
+    # A stop's last improvement came from its predecessor's final arrival
+    walked = np.flatnonzero(walked)
+    labels[walked, 0] = WALK
+    labels[walked, 2] = best[walked] - best[labels[walked, 1]]
+    labels[walked, 3] = best[walked]
+    return walked
+
+
+def raptor(patterns: RoutePatterns, footpaths: Tuple[np.ndarray, np.ndarray], source: int,
+           departure: int, target: Optional[int] = None, until: Optional[int] = None,
+           instrumentation=None) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Earliest arrivals from one stop by RAPTOR rounds, each round vectorized over all
+    patterns serving a stop improved in the round before.
+
+    A round boards, at every hop of those patterns, the earliest trip leaving after
+    the previous round's arrival (one binary search over all hops at once), carries
+    the earliest boarded trip along each pattern with a segmented running minimum,
+    and then follows footpaths from the stops it improved.
+
+    Args:
+        patterns: The day's RoutePatterns
+        footpaths: (to, secs) walking connections per stop, padded with zero-second
+            footpaths to the stop itself
+        source: Stop position of the origin
+        departure: Departure time in seconds
+        target: Optional stop position; arrivals no earlier than the target's are pruned
+        until: Optional time in seconds; hops departing at or after it are not used
+        instrumentation: Optional Instrumentation counting rounds and hops scanned
+    Returns:
+        (best, rounds): best arrival per stop (UNREACHED where none) and a label table
+        per round, one row per stop: (column, trip rank, boarding column, arrival) for
+        a stop improved by a ride in that round, (WALK, from stop, walking seconds,
+        arrival) for one improved on foot, ORIGIN for the source and NO_LABEL otherwise
+    """
+    n_stops = len(patterns.stop_cols_ptr) - 1
+    best = np.full(n_stops, UNREACHED, dtype=np.int64)
+    best[source] = departure
+    seen = np.zeros(n_stops, dtype=bool)
+    labels = np.full((n_stops, 4), NO_LABEL, dtype=np.int64)
+    labels[source] = (ORIGIN, source, 0, departure)
+    rounds = [labels]
+    bound = UNREACHED
+    walked = _relax_walks(np.array([source]), best, bound, labels, footpaths, seen)
+    seen[source] = seen[walked] = True
+    marked = np.flatnonzero(seen)
+    seen[marked] = False
+    hop_span = max(patterns._max_hops, 1)
+    span = (patterns._max_trips + 1) * hop_span
+
+    while len(marked):
+        if target is not None:
+            bound = int(best[target])
+            marked = marked[best[marked] < bound]
+        # Hops of the patterns through marked stops, from the first marked stop on
+        lengths = patterns.stop_cols_ptr[marked + 1] - patterns.stop_cols_ptr[marked]
+        cols = patterns.stop_cols[_segment_ranges(patterns.stop_cols_ptr[marked], lengths)]
+        if not len(cols):
+            break
+        first_leg = np.full(len(patterns.pattern_col_ptr) - 1, KEY_SPAN, dtype=np.int64)
+        np.minimum.at(first_leg, patterns.col_pattern[cols], patterns.col_leg[cols])
+        scanned = np.flatnonzero(first_leg < KEY_SPAN)
+        hop_counts = patterns.pattern_col_ptr[scanned + 1] - patterns.pattern_col_ptr[scanned] - first_leg[scanned]
+        cols = _segment_ranges(patterns.pattern_col_ptr[scanned] + first_leg[scanned], hop_counts)
+        if instrumentation is not None:
+            instrumentation.count('raptor_rounds')
+            instrumentation.count('hops_scanned', len(cols))
+
+        # Earliest boardable trip per hop, then the earliest boarded one carried along.
+        # Only marked stops can board earlier trips than the last round already did.
+        legs = patterns.col_leg[cols]
+        seen[marked] = True
+        boarding = cols[seen[patterns.col_from[cols]]]
+        seen[marked] = False
+        boardable = patterns.col_trips[cols].copy()
+        ready = np.minimum(best[patterns.col_from[boarding]], KEY_SPAN - 1)
+        boardable[np.searchsorted(cols, boarding)] = \
+            np.searchsorted(patterns.keys, boarding * KEY_SPAN + ready, side='left') - patterns.col_time[boarding]
+        group = np.repeat(len(scanned) - np.arange(len(scanned)), hop_counts) * span
+        trips, board_legs = np.divmod(np.minimum.accumulate(group + boardable * hop_span + legs) - group, hop_span)
+        riding = trips < patterns.col_trips[cols]
+        if until is not None:
+            riding &= patterns.dep[patterns.col_time[cols] + np.where(riding, trips, 0)] < until
+        arrivals = np.where(riding, patterns.arr[patterns.col_time[cols] + np.where(riding, trips, 0)], UNREACHED)
+        stops = patterns.col_to[cols]
+        better = arrivals < np.minimum(best[stops], bound)
+
+        labels = np.full((n_stops, 4), NO_LABEL, dtype=np.int64)
+        cols, trips, arrivals, stops = cols[better], trips[better], arrivals[better], stops[better]
+        rows = np.stack([cols, trips, cols - legs[better] + board_legs[better], arrivals], axis=1)
+        improved = _improve(best, stops, arrivals, labels, rows, seen)
+
+        if target is not None:
+            bound = int(best[target])
+        walked = _relax_walks(improved, best, bound, labels, footpaths, seen)
+        rounds.append(labels)
+        seen[improved] = seen[walked] = True
+        marked = np.flatnonzero(seen)
+        seen[marked] = False
+    return best, rounds
@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 86400
+
+
+def parse_date(value: Union[str, date, datetime]) -> date:
+    """Parse a service date given as a date, YYYYMMDD or YYYY-MM-DD"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).replace('-', ''), '%Y%m%d').date()
+
+
+class ServiceCalendar:
+    """
+    Which services run on which dates, from calendar.txt and calendar_dates.txt.
+
+    `days` is a (n_days, n_services) boolean matrix over every date the feed
+    mentions, starting at `first_day`. Feeds without calendar files run every
+    service on every date.
+    """
+
+    WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+    def __init__(self, service_ids: List[str], calendar: Optional[pd.DataFrame] = None,
+                 calendar_dates: Optional[pd.DataFrame] = None):
+        self.service_ids = service_ids
+        self.has_calendar = calendar is not None or calendar_dates is not None
+        services = pd.Index(service_ids)
+
+        bounds = []
+        if calendar is not None and len(calendar):
+            starts = pd.to_datetime(calendar['start_date'].astype(str), format='%Y%m%d')
+            ends = pd.to_datetime(calendar['end_date'].astype(str), format='%Y%m%d')
+            bounds += [starts.min(), ends.max()]
+        if calendar_dates is not None and len(calendar_dates):
+            dates = pd.to_datetime(calendar_dates['date'].astype(str), format='%Y%m%d')
+            bounds += [dates.min(), dates.max()]
+
+        if not bounds:
+            self.first_day = None
+            self.days = np.zeros((0, len(service_ids)), dtype=bool)
+            return
+
+        self.first_day = min(bounds).date()
+        n_days = (max(bounds).date() - self.first_day).days + 1
+        self.days = np.zeros((n_days, len(service_ids)), dtype=bool)
+        day = np.arange(n_days)
+        weekday = (self.first_day.weekday() + day) % 7
+
+        if calendar is not None and len(calendar):
+            rows = services.get_indexer(calendar['service_id'].astype(str))
+            first = (starts - pd.Timestamp(self.first_day)).dt.days.to_numpy()
+            last = (ends - pd.Timestamp(self.first_day)).dt.days.to_numpy()
+            flags = calendar[self.WEEKDAYS].to_numpy(np.int8) > 0
+            # (rows, n_days): the date is in range and the service runs on its weekday
+            running = (day >= first[:, None]) & (day <= last[:, None]) & flags[:, weekday]
+            known = rows >= 0
+            for row, mask in zip(rows[known], running[known]):
+                self.days[:, row] |= mask
+
+        if calendar_dates is not None and len(calendar_dates):
+            rows = services.get_indexer(calendar_dates['service_id'].astype(str))
+            offsets = (dates - pd.Timestamp(self.first_day)).dt.days.to_numpy()
+            added = calendar_dates['exception_type'].to_numpy(np.int8) == 1
+            known = rows >= 0
+            self.days[offsets[known], rows[known]] = added[known]
+
+    def day_offset(self, day: date) -> Optional[int]:
+        """Row of `days` for a date, or None if the feed does not cover it"""
+        if self.first_day is None:
+            return None
+        offset = (day - self.first_day).days
+        return offset if 0 <= offset < len(self.days) else None
+
+    def services_on(self, day: Union[str, date]) -> np.ndarray:
+        """Boolean mask over service_ids of the services running on a date"""
+        if not self.has_calendar:
+            return np.ones(len(self.service_ids), dtype=bool)
+        offset = self.day_offset(parse_date(day))
+        if offset is None:
+            return np.zeros(len(self.service_ids), dtype=bool)
+        return self.days[offset]
+
+
+def previous_day(day: Union[str, date]) -> date:
+    """The service date before day"""
+    return parse_date(day) - timedelta(days=1)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+from synthetic_feed import generate_feed  # noqa: E402
+
+# A few hundred stops: every test feed builds in well under a second
+TINY_SCALE = {'stops': 300, 'lines': 12, 'trips_per_route': 6, 'stops_per_trip': 12}
+
+
+@pytest.fixture(scope='session')
+def feed_dir(tmp_path_factory) -> str:
+    """Path to a tiny deterministic synthetic GTFS feed"""
+    path = str(tmp_path_factory.mktemp('feed'))
+    generate_feed(path, seed=1, **TINY_SCALE)
+    return path
+
+
+@pytest.fixture(scope='session')
+def planner(feed_dir, tmp_path_factory):
+    """A GTFSPlanner over the tiny feed, caching its network outside the repo"""
+    from plan import GTFSPlanner
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('work'))
+    try:
+        return GTFSPlanner(feed_dir)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def fresh_planner(feed_dir, tmp_path, monkeypatch):
+    """A GTFSPlanner over the tiny feed that a test may rebuild or change freely"""
+    from plan import GTFSPlanner
+
+    monkeypatch.chdir(tmp_path)
+    return GTFSPlanner(feed_dir)
@@ -0,0 +1,56 @@
+import os
+from collections import defaultdict
+
+import pandas as pd
+
+import plan
+
+
+def _loop_network(feed_dir):
+    """
+    Transit edges and stop/route memberships by the original per-trip loop: each
+    trip's stops in sequence order, every hop served by all routes of its catalog
+    """
+    routes = pd.read_csv(os.path.join(feed_dir, 'routes.txt'), dtype=str)
+    trips = pd.read_csv(os.path.join(feed_dir, 'trips.txt'), dtype=str)
+    stop_times = pd.read_csv(os.path.join(feed_dir, 'stop_times.txt'), dtype={'trip_id': str, 'stop_id': str})
+
+    route_catalog, catalog_routes = {}, defaultdict(set)
+    for route_id, desc in zip(routes['route_id'], routes['route_desc'].astype(str)):
+        if '-' in desc:
+            route_catalog[route_id] = desc.split('-')[0]
+            catalog_routes[desc.split('-')[0]].add(route_id)
+    trip_route = dict(zip(trips['trip_id'], trips['route_id']))
+
+    edges, members = set(), set()
+    for trip_id, trip_stops in stop_times.groupby('trip_id'):
+        catalog = route_catalog.get(trip_route.get(trip_id))
+        if catalog is None:
+            continue
+        stops = trip_stops.sort_values('stop_sequence')['stop_id'].tolist()
+        for route_id in catalog_routes[catalog]:
+            members.update((stop, route_id) for stop in stops)
+            for a, b in zip(stops, stops[1:]):
+                edges.update({(a, b, route_id), (b, a, route_id)})
+    return edges, members
+
+
+def _planner_network(planner):
+    connections = planner.direct_connections
+    edges = {(a, b, str(route)) for a in connections for b in connections[a] for route in connections[a][b]
+             if str(route) != 'walking'}
+    members = {(stop, str(route)) for stop in planner.stop_routes for route in planner.stop_routes[stop]}
+    return edges, members
+
+
+def test_matches_per_trip_loop(planner, feed_dir):
+    assert _planner_network(planner) == _loop_network(feed_dir)
+
+
+def test_trips_split_across_chunks(fresh_planner, feed_dir, monkeypatch):
+    # Chunks of 7 rows cut almost every trip of the feed in two
+    iter_table = plan.iter_table
+    monkeypatch.setattr(plan, 'iter_table', lambda *args, **kwargs: iter_table(*args, **{**kwargs, 'chunksize': 7}))
+    fresh_planner.build_network()
+
+    assert _planner_network(fresh_planner) == _loop_network(feed_dir)
@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+
+from export_bundles import route_patterns
+
+
+def test_route_patterns_follow_the_longest_trip(planner, feed_dir):
+    trips = pd.read_csv(os.path.join(feed_dir, 'trips.txt'), dtype=str)
+    stop_times = pd.read_csv(os.path.join(feed_dir, 'stop_times.txt'), dtype={'trip_id': str, 'stop_id': str})
+    trip_stops = {trip_id: rows.sort_values('stop_sequence')['stop_id'].tolist()
+                  for trip_id, rows in stop_times.groupby('trip_id')}
+    route_trips = trips.groupby('route_id')['trip_id'].apply(list)
+
+    patterns = route_patterns(planner)
+    for route_id, trip_ids in route_trips.items():
+        longest = max(len(trip_stops[trip_id]) for trip_id in trip_ids)
+        stops = [planner.stop_ids[position] for position in patterns[planner.route_position[route_id]]]
+        assert len(stops) == longest
+        assert stops in [trip_stops[trip_id] for trip_id in trip_ids], route_id
+    assert patterns[planner.route_position['walking']] == []
+
+
+def test_trip_stop_sequences_chain_the_connections(planner):
+    indptr, stops = planner.trip_stop_sequences()
+    assert len(indptr) == len(planner.connection_trip_routes) + 1
+
+    hops = {(int(trip), int(from_stop), int(to_stop))
+            for trip, from_stop, to_stop in zip(planner.conn_trip, planner.conn_from, planner.conn_to)}
+    chained = {(trip, int(from_stop), int(to_stop))
+               for trip in range(len(indptr) - 1)
+               for from_stop, to_stop in zip(stops[indptr[trip]:indptr[trip + 1] - 1],
+                                             stops[indptr[trip] + 1:indptr[trip + 1]])}
+    assert chained == hops
+    assert indptr[-1] == len(planner.conn_trip) + len(indptr) - 1
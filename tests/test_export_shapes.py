@@ -0,0 +1,123 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from export_shapes import build_shape_levels, douglas_peucker_significance, encode_polylines
+
+
+def _encode(points, precision=5):
+    """Google's encoded polyline algorithm, one value at a time"""
+    text, previous = [], (0, 0)
+    for point in points:
+        value = tuple(int(round(coordinate * 10 ** precision)) for coordinate in point)
+        for delta in (value[0] - previous[0], value[1] - previous[1]):
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                text.append(chr((0x20 | (delta & 0x1f)) + 63))
+                delta >>= 5
+            text.append(chr(delta + 63))
+        previous = value
+    return ''.join(text)
+
+
+def _decode(text, precision=5):
+    values, value, shift = [], 0, 0
+    for character in text:
+        chunk = ord(character) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    coordinates = np.cumsum(np.reshape(values, (-1, 2)), axis=0) / 10 ** precision
+    return [tuple(point) for point in coordinates.tolist()]
+
+
+def _segment_distance(p, a, b):
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else min(max(((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length2, 0.0), 1.0)
+    return math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+
+def _douglas_peucker(points, tolerance):
+    """Indices kept by the recursive Douglas-Peucker algorithm"""
+    def simplify(first, last):
+        if last - first < 2:
+            return []
+        distances = [_segment_distance(points[i], points[first], points[last]) for i in range(first + 1, last)]
+        farthest = max(distances)
+        if farthest <= tolerance:
+            return []
+        split = first + 1 + distances.index(farthest)
+        return simplify(first, split) + [split] + simplify(split, last)
+    return [0] + simplify(0, len(points) - 1) + [len(points) - 1]
+
+
+def _polylines(seed, sizes, spread):
+    """Random walks of the given sizes, and the index of the first point of each"""
+    rng = random.Random(seed)
+    polylines = []
+    for size in sizes:
+        x, y = rng.uniform(-80, 80), rng.uniform(-170, 170)
+        points = []
+        for _ in range(size):
+            x, y = x + rng.gauss(0, spread), y + rng.gauss(0, spread)
+            points.append((x, y))
+        polylines.append(points)
+    starts = np.cumsum([0] + list(sizes[:-1]))
+    return polylines, starts
+
+
+def test_encodes_googles_example():
+    lats, lons = [38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]
+    assert encode_polylines(np.array(lats), np.array(lons), np.array([0])) == ['_p~iF~ps|U_ulLnnqC_mqNvxq`@']
+
+
+@pytest.mark.parametrize('precision', [5, 6])
+def test_matches_scalar_encoder(precision):
+    polylines, starts = _polylines(seed=precision, sizes=[1, 2, 40, 7, 300], spread=0.01)
+    points = np.array([point for polyline in polylines for point in polyline])
+    encoded = encode_polylines(points[:, 0], points[:, 1], starts, precision=precision)
+
+    assert encoded == [_encode(polyline, precision) for polyline in polylines]
+    for text, polyline in zip(encoded, polylines):
+        assert np.allclose(_decode(text, precision), polyline, atol=10 ** -precision)
+
+
+@pytest.mark.parametrize('tolerance', [0.5, 5, 20, 100])
+def test_significance_matches_recursive_simplification(tolerance):
+    polylines, starts = _polylines(seed=1, sizes=[2, 3, 50, 400, 9], spread=25)
+    points = np.array([point for polyline in polylines for point in polyline])
+    significance = douglas_peucker_significance(points[:, 0], points[:, 1], starts, min_tolerance=0.5)
+
+    for polyline, start in zip(polylines, starts):
+        kept = np.flatnonzero(significance[start:start + len(polyline)] > tolerance).tolist()
+        assert kept == _douglas_peucker(polyline, tolerance)
+
+
+def test_shape_levels_keep_endpoints_and_thin_out(feed_dir):
+    documents = build_shape_levels(feed_dir)
+    index = documents.pop('index.json')
+    shapes = pd.read_csv(f"{feed_dir}/shapes.txt", dtype={'shape_id': str}).sort_values(
+        ['shape_id', 'shape_pt_sequence'])
+    trips = pd.read_csv(f"{feed_dir}/trips.txt", dtype=str).drop_duplicates('route_id')
+    route_shape = dict(zip(trips['route_id'], trips['shape_id']))
+
+    counts = []
+    for zoom in index['zooms']:
+        document = documents[f"{zoom}.json"]
+        assert sorted(document['routes']) == sorted(route_shape)
+        total = 0
+        for route_id, text in document['routes'].items():
+            shape = shapes[shapes['shape_id'] == route_shape[route_id]]
+            source = list(zip(shape['shape_pt_lat'], shape['shape_pt_lon']))
+            decoded = _decode(text)
+            assert np.allclose([decoded[0], decoded[-1]], [source[0], source[-1]], atol=1e-5)
+            total += len(decoded)
+        assert total == index['points'][str(zoom)]
+        counts.append(total)
+    assert counts == sorted(counts) and counts[-1] <= index['source_points']
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from journey_cache import JourneyCache
+
+
+def _arrival(journeys):
+    return journeys[0].trips[-1].arrival_time if journeys else None
+
+
+@pytest.mark.parametrize('profile_after', [None, 2])
+def test_matches_find_fastest_path(planner, profile_after):
+    cache = JourneyCache(planner, profile_after=profile_after)
+    rng = random.Random(7)
+    stop_ids = sorted(planner.stop_position)
+    for _ in range(15):
+        start_stop, end_stop = rng.sample(stop_ids, 2)
+        bucket_start = rng.randrange(7 * 3600, 9 * 3600, cache.bucket_seconds)
+        # Several departures in one bucket, so later ones are answered from earlier misses
+        for departure in sorted(bucket_start + rng.randrange(cache.bucket_seconds) for _ in range(6)):
+            journeys = cache.find_path(start_stop, end_stop, departure)
+            expected = planner.find_fastest_path(start_stop, end_stop, departure)
+            assert _arrival(journeys) == _arrival(expected), (start_stop, end_stop, departure)
+            if journeys:
+                trips = journeys[0].trips
+                assert trips[0].departure_time >= departure
+                assert journeys[0].total_time == trips[-1].arrival_time - trips[0].departure_time
+
+    stats = cache.stats()
+    assert stats['hits'] and stats['misses']
+    assert bool(stats['profiles']) == (profile_after is not None)
+
+
+def test_cleared_when_the_network_changes(planner, monkeypatch):
+    cache = JourneyCache(planner)
+    start_stop, end_stop = sorted(planner.stop_position)[:2]
+    cache.find_path(start_stop, end_stop, '08:00:00')
+    monkeypatch.setattr(planner, 'network_version', planner.network_version + 1)
+
+    assert cache.lookup(start_stop, end_stop, '08:00:00') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_unknown_stop(planner):
+    with pytest.raises(ValueError):
+        JourneyCache(planner).lookup('no-such-stop', sorted(planner.stop_position)[0], '08:00:00')
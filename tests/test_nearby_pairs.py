@@ -0,0 +1,43 @@
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+import pytest
+
+from plan import EARTH_RADIUS, find_nearby_pairs
+
+
+def _brute_force_pairs(lats, lons, max_distance):
+    """Every pair within max_distance by scalar Haversine, as {(i, j): distance} with i < j"""
+    pairs = {}
+    for i in range(len(lats)):
+        for j in range(i + 1, len(lats)):
+            lat1, lon1, lat2, lon2 = map(radians, (lats[i], lons[i], lats[j], lons[j]))
+            a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+            distance = 2 * EARTH_RADIUS * asin(sqrt(a))
+            if distance <= max_distance:
+                pairs[(i, j)] = distance
+    return pairs
+
+
+@pytest.mark.parametrize('max_distance', [300, 500, 2500])
+def test_matches_brute_force_on_feed_stops(planner, max_distance):
+    lats, lons = planner.stop_lats.astype(np.float64), planner.stop_lons.astype(np.float64)
+    i, j, distance = find_nearby_pairs(lats, lons, max_distance, batch_size=64)
+
+    expected = _brute_force_pairs(lats, lons, max_distance)
+    assert sorted(zip(i.tolist(), j.tolist())) == sorted(expected)
+    np.testing.assert_allclose(distance, [expected[pair] for pair in zip(i.tolist(), j.tolist())], rtol=1e-9)
+
+
+def test_matches_brute_force_on_scattered_points():
+    rng = np.random.default_rng(5)
+    lats = np.concatenate([rng.uniform(31.9, 32.0, 150), [60.0, 60.001, 60.0]])
+    lons = np.concatenate([rng.uniform(34.7, 34.8, 150), [10.0, 10.0, 10.0]])
+    i, j, _ = find_nearby_pairs(lats, lons, 800)
+
+    assert sorted(zip(i.tolist(), j.tolist())) == sorted(_brute_force_pairs(lats, lons, 800))
+
+
+def test_fewer_than_two_points():
+    i, j, distance = find_nearby_pairs(np.array([32.0]), np.array([34.8]), 500)
+    assert len(i) == len(j) == len(distance) == 0
@@ -0,0 +1,48 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import plan
+
+
+@pytest.fixture
+def many_cpus(monkeypatch):
+    """Let build_workers > 1 use a process pool even on a single-CPU machine"""
+    monkeypatch.setattr(plan.os, 'cpu_count', lambda: 4)
+
+
+def _rebuilt_arrays(planner, workers, monkeypatch):
+    monkeypatch.setattr(planner, 'build_workers', workers)
+    planner.build_network()
+    return planner.network_arrays
+
+
+def _assert_same_arrays(expected, actual):
+    assert sorted(expected) == sorted(actual)
+    for name in expected:
+        np.testing.assert_array_equal(expected[name], actual[name], err_msg=name)
+
+
+def test_parallel_matches_serial(fresh_planner, many_cpus, monkeypatch, capsys):
+    serial = _rebuilt_arrays(fresh_planner, 1, monkeypatch)
+    parallel = _rebuilt_arrays(fresh_planner, 3, monkeypatch)
+
+    assert 'building serially' not in capsys.readouterr().out
+    _assert_same_arrays(serial, parallel)
+
+
+def test_shuffled_stop_times_fall_back_to_serial(feed_dir, tmp_path, many_cpus, monkeypatch, capsys):
+    shuffled_dir = tmp_path / 'feed'
+    shutil.copytree(feed_dir, shuffled_dir)
+    stop_times = pd.read_csv(shuffled_dir / 'stop_times.txt', dtype=str)
+    stop_times.sample(frac=1, random_state=0).to_csv(shuffled_dir / 'stop_times.txt', index=False)
+    monkeypatch.chdir(tmp_path)
+    planner = plan.GTFSPlanner(str(shuffled_dir))
+
+    serial = _rebuilt_arrays(planner, 1, monkeypatch)
+    parallel = _rebuilt_arrays(planner, 3, monkeypatch)
+
+    assert 'building serially' in capsys.readouterr().out
+    _assert_same_arrays(serial, parallel)
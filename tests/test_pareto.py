@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+DEPARTURE = 8 * 3600
+LIMITS = {'max_duration': 7200, 'max_transfers': 5, 'max_walking': 2000}
+
+
+def _stop_pairs(planner, n_pairs, seed):
+    rng = random.Random(seed)
+    stop_ids = sorted(planner.stop_position)
+    return [tuple(rng.sample(stop_ids, 2)) for _ in range(n_pairs)]
+
+
+def _criteria(journey):
+    return journey.trips[-1].arrival_time, journey.transfers, journey.total_walking
+
+
+def _dominates(a, b):
+    return all(x <= y for x, y in zip(a, b)) and a != b
+
+
+def _within_limits(journey):
+    return (journey.trips[-1].arrival_time <= DEPARTURE + LIMITS['max_duration']
+            and journey.transfers <= LIMITS['max_transfers'] and journey.total_walking <= LIMITS['max_walking'])
+
+
+@pytest.mark.parametrize('date', [None, '20260105'])
+def test_pareto_set_is_non_dominated_and_holds_the_fastest(planner, date):
+    found = 0
+    for start_stop, end_stop in _stop_pairs(planner, 15, seed=4):
+        journeys = planner.find_pareto_paths(start_stop, end_stop, DEPARTURE, date=date, walking_resolution=0,
+                                             **LIMITS)
+        criteria = [_criteria(journey) for journey in journeys]
+        assert [arrival for arrival, _, _ in criteria] == sorted(arrival for arrival, _, _ in criteria)
+        for journey, own in zip(journeys, criteria):
+            assert _within_limits(journey)
+            assert (journey.trips[0].from_stop, journey.trips[-1].to_stop) == (start_stop, end_stop)
+            assert journey.trips[0].departure_time >= DEPARTURE
+            assert not any(_dominates(other, own) for other in criteria), (start_stop, end_stop, own)
+
+        fastest = planner.find_fastest_path(start_stop, end_stop, DEPARTURE, date=date)
+        if fastest and _within_limits(fastest[0]):
+            found += 1
+            arrival = fastest[0].trips[-1].arrival_time
+            assert criteria and criteria[0][0] == arrival
+            assert min(transfers for arrival_time, transfers, _ in criteria if arrival_time == arrival) \
+                <= fastest[0].transfers
+        elif fastest:
+            assert all(arrival >= fastest[0].trips[-1].arrival_time for arrival, _, _ in criteria)
+        else:
+            assert journeys == []
+    assert found
@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+WINDOW = (7 * 3600, 10 * 3600)
+
+
+def _stop_pairs(planner, n_pairs, seed):
+    rng = random.Random(seed)
+    stop_ids = sorted(planner.stop_position)
+    return [tuple(rng.sample(stop_ids, 2)) for _ in range(n_pairs)]
+
+
+@pytest.mark.parametrize('date', [None, '20260105'])
+def test_matches_repeated_fastest_path(planner, date):
+    window_start, window_end = WINDOW
+    profiles = 0
+    for start_stop, end_stop in _stop_pairs(planner, 12, seed=3):
+        journeys = planner.find_profile(start_stop, end_stop, window_start, window_end, date=date)
+        profiles += bool(journeys)
+        departures = [journey.trips[0].departure_time for journey in journeys]
+        arrivals = [journey.trips[-1].arrival_time for journey in journeys]
+        assert departures == sorted(departures) and arrivals == sorted(arrivals)
+
+        # Every departure in the window is served by the next profile journey, unless
+        # walking all the way (never part of a profile) arrives no later
+        for departure in sorted(set(range(window_start, window_end + 1, 600)) | set(departures)):
+            fastest = planner.find_fastest_path(start_stop, end_stop, departure, date=date)
+            later = [arrival for dep, arrival in zip(departures, arrivals) if dep >= departure]
+            if fastest and all(trip.is_walking for trip in fastest[0].trips):
+                assert not later or later[0] >= fastest[0].trips[-1].arrival_time
+            elif later:
+                assert fastest and fastest[0].trips[-1].arrival_time == later[0], (start_stop, end_stop, departure)
+            else:
+                assert not fastest or fastest[0].trips[0].departure_time > window_end
+    assert profiles
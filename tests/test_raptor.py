@@ -0,0 +1,86 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+DEPARTURES = (6 * 3600, 8 * 3600 + 1234, 17 * 3600)
+
+
+def _brute_force_arrivals(planner, source, departure, date):
+    """
+    Earliest arrivals by relaxing every trip and footpath until nothing improves:
+    a trip can be boarded at any stop reached by its departure there, and ridden on
+    """
+    conn_dep, conn_arr, conn_from, conn_to, conn_trip = planner._connections(date)
+    trips = defaultdict(list)
+    for hop in zip(conn_dep.tolist(), conn_arr.tolist(), conn_from.tolist(), conn_to.tolist(), conn_trip.tolist()):
+        trips[hop[4]].append(hop[:4])
+    for hops in trips.values():
+        hops.sort()
+
+    earliest = [None] * len(planner.stop_ids)
+    earliest[source] = departure
+    changed = True
+    while changed:
+        changed = False
+        for hops in trips.values():
+            boarded = False
+            for dep, arr, from_stop, to_stop in hops:
+                boarded = boarded or (earliest[from_stop] is not None and earliest[from_stop] <= dep)
+                if boarded and (earliest[to_stop] is None or arr < earliest[to_stop]):
+                    earliest[to_stop] = arr
+                    changed = True
+        for stop, footpaths in enumerate(planner.footpaths):
+            for neighbor, secs in footpaths:
+                if earliest[stop] is not None and (earliest[neighbor] is None
+                                                   or earliest[stop] + secs < earliest[neighbor]):
+                    earliest[neighbor] = earliest[stop] + secs
+                    changed = True
+    return [-1 if arrival is None else arrival for arrival in earliest]
+
+
+def _origins(planner, n, seed):
+    return random.Random(seed).sample(sorted(planner.stop_position), n)
+
+
+@pytest.mark.parametrize('date', [None, '20260105'])
+@pytest.mark.parametrize('departure', DEPARTURES)
+def test_earliest_arrivals_match_brute_force(planner, date, departure):
+    for origin in _origins(planner, 4, seed=departure):
+        expected = _brute_force_arrivals(planner, planner.stop_position[origin], departure, date)
+        assert planner.earliest_arrivals(origin, departure, date=date).tolist() == expected, origin
+        assert sum(arrival >= 0 for arrival in expected) > 1
+
+
+def test_max_duration_cuts_off_later_arrivals(planner):
+    departure, limit = DEPARTURES[1], 1800
+    origin = _origins(planner, 1, seed=5)[0]
+    expected = _brute_force_arrivals(planner, planner.stop_position[origin], departure, None)
+    expected = [arrival if 0 <= arrival <= departure + limit else -1 for arrival in expected]
+    assert planner.earliest_arrivals(origin, departure, max_duration=limit).tolist() == expected
+
+
+@pytest.mark.parametrize('date', [None, '20260105'])
+def test_fastest_path_arrives_at_brute_force_time(planner, date):
+    departure = DEPARTURES[1]
+    rng = random.Random(11)
+    reached = 0
+    for origin in _origins(planner, 4, seed=7):
+        expected = _brute_force_arrivals(planner, planner.stop_position[origin], departure, date)
+        for target in rng.sample(sorted(planner.stop_position), 10):
+            if target == origin:
+                continue
+            journeys = planner.find_fastest_path(origin, target, departure, date=date)
+            arrival = expected[planner.stop_position[target]]
+            if arrival < 0:
+                assert journeys == []
+                continue
+            reached += 1
+            trips = journeys[0].trips
+            assert trips[-1].arrival_time == arrival
+            assert (trips[0].from_stop, trips[-1].to_stop) == (origin, target)
+            assert trips[0].departure_time >= departure
+            for leg, next_leg in zip(trips, trips[1:]):
+                assert leg.to_stop == next_leg.from_stop
+                assert leg.arrival_time <= next_leg.departure_time
+    assert reached
@@ -0,0 +1,63 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import gen
+
+
+def _generate_pages(feed_dir, work_dir, monkeypatch, **kwargs):
+    """Generate route pages into work_dir; returns the contents of every page by file name"""
+    os.makedirs(work_dir, exist_ok=True)
+    monkeypatch.chdir(work_dir)
+    output_dir = os.path.join('docs', 'route_pages')
+    os.makedirs(output_dir, exist_ok=True)
+    gen.generate_stylish_route_pages(feed_dir, **kwargs)
+    pages = {}
+    for name in os.listdir(output_dir):
+        if name.endswith('.html'):
+            with open(os.path.join(output_dir, name), encoding='utf-8') as f:
+                pages[name] = f.read()
+    return pages
+
+
+@pytest.fixture(scope='module')
+def per_route_pages(feed_dir, tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        return _generate_pages(feed_dir, tmp_path_factory.mktemp('per-route'), monkeypatch, single_pass=False)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_single_pass_matches_per_route(feed_dir, per_route_pages, tmp_path, monkeypatch, workers):
+    pages = _generate_pages(feed_dir, tmp_path, monkeypatch, workers=workers, incremental=False)
+
+    assert per_route_pages
+    assert sorted(pages) == sorted(per_route_pages)
+    for name, html in per_route_pages.items():
+        assert pages[name] == html, name
+
+
+def test_incremental_rebuild_keeps_pages(feed_dir, per_route_pages, tmp_path, monkeypatch):
+    _generate_pages(feed_dir, tmp_path, monkeypatch, workers=1)
+    pages = _generate_pages(feed_dir, tmp_path, monkeypatch, workers=1)
+
+    assert pages == per_route_pages
+
+
+def test_missing_stop_is_named_and_skipped(feed_dir, tmp_path, monkeypatch, capsys):
+    feed = tmp_path / 'feed'
+    shutil.copytree(feed_dir, feed)
+    trips = pd.read_csv(feed / 'trips.txt', dtype=str)
+    stop_times = pd.read_csv(feed / 'stop_times.txt', dtype=str)
+    route_id, trip_id = trips.iloc[0]['route_id'], trips.iloc[0]['trip_id']
+    missing = stop_times[stop_times['trip_id'] == trip_id]['stop_id'].iloc[1]
+    stops = pd.read_csv(feed / 'stops.txt', dtype=str)
+    stops[stops['stop_id'] != missing].to_csv(feed / 'stops.txt', index=False)
+
+    per_route = _generate_pages(str(feed), tmp_path / 'per-route', monkeypatch, single_pass=False)
+    capsys.readouterr()
+    pages = _generate_pages(str(feed), tmp_path / 'single-pass', monkeypatch, workers=1, incremental=False)
+
+    assert pages == per_route
+    assert f"Stop {missing} of route {route_id} (trip {trip_id}) is not in stops.txt" in capsys.readouterr().out
@@ -0,0 +1,103 @@
+import shutil
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import plan
+from service_calendar import ServiceCalendar, parse_date, previous_day
+
+SHIFT = 20 * 3600  # Moves a morning trip past midnight
+
+
+def _calendar():
+    calendar = pd.DataFrame({
+        'service_id': ['weekdays', 'weekend'],
+        'monday': [1, 0], 'tuesday': [1, 0], 'wednesday': [1, 0], 'thursday': [1, 0], 'friday': [1, 0],
+        'saturday': [0, 1], 'sunday': [0, 1],
+        'start_date': ['20260101', '20260131'], 'end_date': ['20260131', '20260131'],
+    })
+    calendar_dates = pd.DataFrame({
+        'service_id': ['weekdays', 'weekend', 'unknown'],
+        'date': ['20260106', '20260210', '20260107'],
+        'exception_type': [2, 1, 1],
+    })
+    return ServiceCalendar(['weekdays', 'weekend', 'unused'], calendar, calendar_dates)
+
+
+@pytest.mark.parametrize('day, running', [
+    ('20260105', [True, False, False]),     # Monday
+    ('2026-01-03', [False, False, False]),  # Saturday before the weekend service starts
+    ('20260131', [False, True, False]),     # Saturday on the weekend service's only day
+    ('20260106', [False, False, False]),    # Weekday service removed
+    ('20260107', [True, False, False]),     # Added service of an unknown ID is ignored
+    ('20260210', [False, True, False]),     # Added past the calendar's end
+    ('20260209', [False, False, False]),    # Inside the dates' span but in no calendar row
+    ('20251231', [False, False, False]),    # Before the feed
+    ('20270101', [False, False, False]),    # After the feed
+])
+def test_services_on(day, running):
+    assert _calendar().services_on(day).tolist() == running
+
+
+def test_without_calendar_every_service_runs():
+    calendar = ServiceCalendar(['a', 'b'])
+    assert not calendar.has_calendar
+    assert calendar.services_on('19990101').tolist() == [True, True]
+
+
+def test_date_formats():
+    assert parse_date('20260105') == parse_date('2026-01-05') == parse_date(date(2026, 1, 5)) == date(2026, 1, 5)
+    assert previous_day('20260301') == date(2026, 2, 28)
+
+
+@pytest.fixture(scope='module')
+def overnight(feed_dir, tmp_path_factory):
+    """
+    A planner over one Sunday-to-Thursday trip moved past midnight, with no room to walk
+    between stops, and the trip's first and last stops and times
+    """
+    feed_copy = tmp_path_factory.mktemp('overnight') / 'feed'
+    shutil.copytree(feed_dir, feed_copy)
+    trips = pd.read_csv(feed_copy / 'trips.txt', dtype=str)
+    trip_id = trips.loc[trips['service_id'] == '1', 'trip_id'].iloc[0]
+    stop_times = pd.read_csv(feed_copy / 'stop_times.txt', dtype=str, keep_default_na=False)
+    trip = stop_times[stop_times['trip_id'] == trip_id].copy()
+    for column in ('arrival_time', 'departure_time'):
+        trip[column] = [plan.format_time(plan.parse_time(time) + SHIFT) for time in trip[column]]
+    trip.to_csv(feed_copy / 'stop_times.txt', index=False)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(feed_copy.parent)
+        planner = plan.GTFSPlanner(str(feed_copy), max_walking_distance=1)
+    first, last = trip.iloc[0], trip.iloc[-1]
+    return (planner, first['stop_id'], last['stop_id'],
+            plan.parse_time(first['departure_time']), plan.parse_time(last['arrival_time']))
+
+
+@pytest.mark.parametrize('day, shift', [
+    ('20260104', 0),                     # Sunday: the trip's own run, after midnight
+    ('20260109', plan.SECONDS_PER_DAY),  # Friday: Thursday's run, in Friday's early hours
+    ('20310101', plan.SECONDS_PER_DAY),  # Past the calendar's end, but the day before is in it
+])
+def test_overnight_trip_runs(overnight, day, shift):
+    planner, start_stop, end_stop, departure, arrival = overnight
+    journeys = planner.find_fastest_path(start_stop, end_stop, 0, date=day)
+
+    assert [(trip.departure_time, trip.arrival_time) for trip in journeys[0].trips] == \
+        [(departure - shift, arrival - shift)]
+    assert planner.earliest_arrivals(start_stop, 0, date=day)[planner.stop_position[end_stop]] == arrival - shift
+
+
+@pytest.mark.parametrize('day', [
+    '20260110',  # Saturday, after Friday: neither day runs the trip
+    '20350101',  # Long after the calendar's end
+    '20200101',  # Before its start
+])
+def test_overnight_trip_does_not_run(overnight, day):
+    planner, start_stop, end_stop, _, _ = overnight
+    assert planner.find_fastest_path(start_stop, end_stop, 0, date=day) == []
+
+    arrivals = planner.earliest_arrivals(start_stop, 0, date=day)
+    assert np.flatnonzero(arrivals >= 0).tolist() == [planner.stop_position[start_stop]]
@@ -0,0 +1,56 @@
+import shutil
+
+import pandas as pd
+
+import plan
+
+
+def _single_trip_planner(feed_dir, tmp_path, monkeypatch, blank):
+    """
+    A planner over a copy of the feed that keeps only its first trip, with the times
+    named by blank ({row: columns}) left empty; returns the planner and the trip's rows.
+    """
+    feed_copy = tmp_path / 'feed'
+    shutil.copytree(feed_dir, feed_copy)
+    stop_times = pd.read_csv(feed_copy / 'stop_times.txt', dtype=str, keep_default_na=False)
+    trip = stop_times[stop_times['trip_id'] == stop_times['trip_id'].iloc[0]].reset_index(drop=True)
+    edited = trip.copy()
+    for row, columns in blank.items():
+        edited.loc[row, columns] = ''
+    edited.to_csv(feed_copy / 'stop_times.txt', index=False)
+    monkeypatch.chdir(tmp_path)
+    return plan.GTFSPlanner(str(feed_copy)), trip
+
+
+def _hop_times(planner):
+    """{(from stop, to stop): (departure, arrival)} of every connection"""
+    return {
+        (planner.stop_ids[from_stop], planner.stop_ids[to_stop]): (int(dep), int(arr))
+        for dep, arr, from_stop, to_stop in zip(planner.conn_dep, planner.conn_arr, planner.conn_from, planner.conn_to)
+    }
+
+
+def test_blank_times_are_interpolated(feed_dir, tmp_path, monkeypatch):
+    both = ['arrival_time', 'departure_time']
+    planner, trip = _single_trip_planner(feed_dir, tmp_path, monkeypatch,
+                                         {1: both, 2: both, 4: ['arrival_time']})
+    stops = trip['stop_id'].tolist()
+    times = _hop_times(planner)
+
+    # Every consecutive pair is still a hop, and no hop skips the untimed stops
+    assert sorted(times) == sorted(zip(stops, stops[1:]))
+
+    # The untimed stops are passed in order between their timed neighbours
+    passed = [times[stops[0], stops[1]][0]] + [times[pair][1] for pair in zip(stops, stops[1:4])]
+    assert passed == sorted(passed)
+    assert passed[0] == plan.parse_time(trip['departure_time'][0])
+    assert passed[-1] == plan.parse_time(trip['arrival_time'][3])
+    assert times[stops[3], stops[4]][1] == times[stops[4], stops[5]][0] == plan.parse_time(trip['departure_time'][4])
+
+
+def test_untimed_first_stop_is_left_out(feed_dir, tmp_path, monkeypatch):
+    planner, trip = _single_trip_planner(feed_dir, tmp_path, monkeypatch,
+                                         {0: ['arrival_time', 'departure_time']})
+    stops = trip['stop_id'].tolist()
+
+    assert sorted(_hop_times(planner)) == sorted(zip(stops[1:], stops[2:]))